@@ -0,0 +1,131 @@
+from typing import Dict, Any
+
+try:
+    import httpx
+except ImportError:  # Only needed for the async server (see requirements-async.txt)
+    httpx = None
+
+from agents.chat_sessions import ChatSession, ChatTurn
+from agents.ollama_pool import OllamaNode
+from agents.pregnancy_assistant import LocalAIClient, OLLAMA_TIMEOUT, DEFAULT_TASK, remaining_budget, outlives_leader
+from agents.scheduler import DeadlineExceeded, DEFAULT_PRIORITY
+
+class AsyncLocalAIClient:
+    """Non-blocking counterpart of LocalAIClient for the async (ASGI) server.
+
+    Wraps a LocalAIClient and shares its Ollama node pool (breakers and health
+    monitors), response cache, single flight, scheduler and prompt handling; only
+    the HTTP calls to Ollama differ, going through an httpx.AsyncClient so a
+    waiting request costs a coroutine instead of a thread.
+    """
+
+    def __init__(self, client: LocalAIClient):
+        if httpx is None:
+            raise RuntimeError("The async server needs httpx: pip install -r requirements-async.txt")
+        self.client = client
+        connections = client.pool_size * len(client.ollama_hosts)
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            timeout=OLLAMA_TIMEOUT
+        )
+
+    @property
+    def selected_provider(self) -> str:
+        return self.client.selected_provider
+
+    def detect_language(self, text: str) -> str:
+        return self.client.detect_language(text)
+
+    def fallback_response(self, prompt: str, user_language: str = None) -> str:
+        return self.client.fallback_response(prompt, user_language)
+
+    async def generate_response(self, prompt: str, system_prompt: str = "", context: str = "", user_language: str = None,
+                                use_cache: bool = False, refresh_cache: bool = False,
+                                priority: str = DEFAULT_PRIORITY, deadline: float = None, task: str = DEFAULT_TASK,
+                                chat_turn: ChatTurn = None) -> str:
+        """Same contract as LocalAIClient.generate_response, awaitable"""
+        client = self.client
+        route = client.route(task)
+        full_prompt, multilingual_system, user_language, session = client._prepare_prompt(
+            prompt, system_prompt, context, user_language, route, chat_turn
+        )
+        generation_key, cache_key, cached = client._cache_lookup(full_prompt, multilingual_system, user_language,
+                                                                 route, use_cache, refresh_cache, session)
+        if cached is not None:
+            return cached
+
+        # Single flight shared with the sync client: identical requests on either server share one generation
+        try:
+            return await client.single_flight.do_async(
+                generation_key,
+                lambda: self._generate(full_prompt, multilingual_system, user_language, route, cache_key, priority,
+                                       deadline, session),
+                timeout=remaining_budget(deadline),
+                retry_if=outlives_leader(deadline)
+            )
+        except TimeoutError:
+            raise DeadlineExceeded("Latency budget spent waiting for the generation")
+
+    async def _generate(self, prompt: str, system_prompt: str, user_language: str, route: Dict[str, Any],
+                        cache_key: str = None, priority: str = DEFAULT_PRIORITY, deadline: float = None,
+                        session: ChatSession = None) -> str:
+        client = self.client
+        if client.ollama_available:
+            admitted_at = await client.scheduler.acquire_async(priority, timeout=remaining_budget(deadline))
+            try:
+                node = client.pool.acquire(prefer=session.host if session else None)
+                if node is not None:
+                    try:
+                        return await self._ollama_generate(node, prompt, system_prompt, user_language, route,
+                                                           cache_key, deadline, session)
+                    finally:
+                        client.pool.release(node)
+            finally:
+                client.scheduler.release(admitted_at)
+        return client._mock_generate(prompt, system_prompt, user_language)
+
+    async def _ollama_generate(self, node: OllamaNode, prompt: str, system_prompt: str, user_language: str, route: Dict[str, Any],
+                               cache_key: str = None, deadline: float = None, session: ChatSession = None) -> str:
+        client = self.client
+        remaining = remaining_budget(deadline)
+        deadline_bound = remaining is not None and remaining < OLLAMA_TIMEOUT
+        if deadline_bound and remaining <= 0:
+            node.breaker.release_trial()
+            raise DeadlineExceeded("Latency budget spent before the generation started")
+
+        try:
+            response = await self.http.post(
+                f"{node.host}/api/generate",
+                json=client._ollama_payload(prompt, system_prompt, route, stream=False, session=session),
+                timeout=remaining if deadline_bound else OLLAMA_TIMEOUT
+            )
+
+            if response.status_code == 200:
+                node.breaker.record_success()
+                data = response.json()
+                client._record_prefill(route["task"], data)
+                result = data.get("response", "").strip()
+                if result:
+                    client._save_session(session, data, node)
+                    if cache_key:
+                        client.response_cache.put(cache_key, result)
+                    return result
+                print("Empty response from Ollama, using fallback")
+            else:
+                print(f"Ollama API error (status {response.status_code}), using fallback")
+                node.breaker.record_failure()
+
+        except httpx.TimeoutException:
+            if deadline_bound:
+                node.breaker.release_trial()
+                raise DeadlineExceeded(f"No answer from Ollama within the {remaining:.1f}s budget")
+            print("Ollama request timed out, using fallback")
+            node.breaker.record_failure()
+        except Exception as e:
+            print(f"Ollama error: {e}, using fallback")
+            node.breaker.record_failure()
+
+        return client._mock_generate(prompt, system_prompt, user_language)
+
+    async def aclose(self):
+        await self.http.aclose()
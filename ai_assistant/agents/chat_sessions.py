@@ -0,0 +1,128 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+DEFAULT_MAX_SESSIONS = 256  # Users whose conversation state is kept in memory
+DEFAULT_MAX_CONTEXT_TOKENS = 2048  # Ollama's default context window; a longer conversation starts over
+DEFAULT_IDLE_TIMEOUT = 30 * 60  # Seconds a session survives without a new turn
+
+class ChatTurn(NamedTuple):
+    session_id: str  # The user the conversation belongs to
+    message: str  # Sent on its own when the session is resumed
+    history: str  # Memory context of the full prompt; the session only continues while it is unchanged
+
+class ChatSession:
+    """A user's conversation so far, as the context tokens Ollama returned with the last answer"""
+    __slots__ = ("session_id", "fingerprint", "tokens", "host", "turns", "last_used")
+
+    def __init__(self, session_id: str, fingerprint: str, tokens: List[int] = (), host: str = None, turns: int = 0):
+        self.session_id = session_id
+        self.fingerprint = fingerprint  # Hash of the history, system prompt, language and model it started from
+        self.tokens = array("I", tokens)  # 4 bytes per token instead of a list of int objects
+        self.host = host  # The Ollama server that has the conversation in its KV cache
+        self.turns = turns
+        self.last_used = time.monotonic()
+
+    @property
+    def resumed(self) -> bool:
+        """Whether earlier turns exist, so only the new message needs to be sent"""
+        return len(self.tokens) > 0
+
+class ChatSessionStore:
+    """Per-user chat sessions, bounded in count, context length and idle time.
+
+    start() returns the user's live session when it was started from the same
+    fingerprint, otherwise a new empty one; save() stores the context of the
+    answer. Sessions idle for longer than idle_timeout are dropped, the least
+    recently used ones go when max_sessions is exceeded, and a context longer
+    than max_tokens ends the session so the next turn sends the full prompt
+    again. invalidate() drops a session whose history changed.
+    """
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS, max_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.max_tokens = max_tokens
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.invalidations = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.overflows = 0
+
+    def start(self, session_id: str, fingerprint: str) -> ChatSession:
+        """The session to continue for a turn: the live one if its fingerprint matches, else a new one"""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                self.misses += 1
+                return ChatSession(session_id, fingerprint)
+            if session.fingerprint != fingerprint:
+                del self._sessions[session_id]
+                self.stale += 1
+                return ChatSession(session_id, fingerprint)
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return session
+
+    def save(self, session: ChatSession, tokens: List[int], host: str = None):
+        """Store the context Ollama returned after answering a turn of session"""
+        if self.max_sessions <= 0:
+            return
+        with self._lock:
+            if len(tokens) > self.max_tokens:
+                self._sessions.pop(session.session_id, None)
+                self.overflows += 1
+                return
+            self._sessions[session.session_id] = ChatSession(session.session_id, session.fingerprint, tokens, host,
+                                                             session.turns + 1)
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, session_id: str):
+        """Drop a user's session, e.g. after a new log changed their history"""
+        with self._lock:
+            if self._sessions.pop(session_id, None) is not None:
+                self.invalidations += 1
+
+    def _expire(self, now: float):
+        # Sessions are kept in order of last use, so the idle ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.idle_timeout:
+                break
+            self._sessions.popitem(last=False)
+            self.expirations += 1
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """The stored session of a user, if any (without counting a lookup)"""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "context_tokens": sum(len(session.tokens) for session in self._sessions.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "invalidations": self.invalidations,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "overflows": self.overflows,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,150 @@
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+
+DEFAULT_FAILURE_THRESHOLD = 3  # Consecutive failures before the breaker opens
+DEFAULT_RESET_TIMEOUT = 30.0  # Seconds an open breaker waits before letting a trial request through
+DEFAULT_HEALTH_INTERVAL = 10.0  # Seconds between background health probes
+
+class CircuitBreaker:
+    """Tracks whether Ollama is usable without probing it on every call.
+
+    - closed: requests go to Ollama; consecutive failures are counted
+    - open: Ollama is considered down and requests fail over immediately
+    - half_open: after reset_timeout one trial request is let through; its
+      outcome closes or re-opens the breaker
+
+    A successful background health probe closes the breaker right away.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT, name: str = "Ollama"):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent now; in half_open only one trial at a time"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                print(f"✅ {self.name} is healthy again, resuming AI generation")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                if self._state == self.CLOSED:
+                    print(f"⚠️  {self.name} unavailable, failing over to mock AI")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.times_opened += 1
+
+    def release_trial(self):
+        """Give back a half-open trial whose request ended without telling us anything"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def force_open(self):
+        """Open immediately, e.g. when the very first probe fails"""
+        with self._lock:
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._failures = max(self._failures, self.failure_threshold)
+            self.times_opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected
+            }
+
+    def _maybe_half_open(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+class OllamaHealthMonitor:
+    """Background thread that probes Ollama and feeds the circuit breaker.
+
+    on_recover is called whenever a probe succeeds after a failed one (or on
+    the first successful probe), e.g. to load the model again after Ollama
+    restarted.
+    """
+
+    def __init__(self, probe: Callable[[], bool], breaker: CircuitBreaker,
+                 interval: float = DEFAULT_HEALTH_INTERVAL, on_recover: Optional[Callable[[], None]] = None):
+        self.probe = probe
+        self.breaker = breaker
+        self.interval = interval
+        self.on_recover = on_recover
+        self.last_check = None
+        self.last_healthy = None
+        self._healthy = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check_once(self) -> bool:
+        """Run a single probe and record its outcome"""
+        healthy = self.probe()
+        self.last_check = time.time()
+        if healthy:
+            self.last_healthy = self.last_check
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        recovered = healthy and not self._healthy
+        self._healthy = healthy
+        if recovered and self.on_recover:
+            self.on_recover()
+        return healthy
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ollama-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check_once()
+            except Exception as e:
+                print(f"Ollama health check error: {e}")
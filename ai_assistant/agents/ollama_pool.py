@@ -0,0 +1,100 @@
+import threading
+from typing import Callable, Dict, Any, List, Optional
+
+from agents.ollama_health import (
+    CircuitBreaker, OllamaHealthMonitor,
+    DEFAULT_FAILURE_THRESHOLD, DEFAULT_RESET_TIMEOUT, DEFAULT_HEALTH_INTERVAL
+)
+
+class OllamaNode:
+    """One Ollama server with its own breaker, health monitor and load counters"""
+
+    def __init__(self, host: str, breaker: CircuitBreaker):
+        self.host = host
+        self.breaker = breaker
+        self.monitor = None
+        self.model_loaded = False
+        self.warmup_thread = None
+        self.outstanding = 0
+        self.requests = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "host": self.host,
+            **self.breaker.stats(),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "model_loaded": self.model_loaded,
+            "last_check": self.monitor.last_check if self.monitor else None,
+            "last_healthy": self.monitor.last_healthy if self.monitor else None
+        }
+
+class OllamaPool:
+    """Spreads generations over several Ollama servers.
+
+    Each request goes to the node with the fewest requests in flight among
+    those whose breaker lets it through. A node whose breaker opens is
+    ejected from routing; it is re-admitted when its health probe succeeds
+    or, after the breaker's reset timeout, its half-open trial request does.
+    """
+
+    def __init__(self, hosts: List[str], probe: Callable[[str], bool],
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+                 health_interval: float = DEFAULT_HEALTH_INTERVAL,
+                 on_recover: Optional[Callable[[OllamaNode], None]] = None):
+        if not hosts:
+            raise ValueError("OllamaPool needs at least one host")
+        self.nodes = []
+        for host in hosts:
+            node = OllamaNode(host, CircuitBreaker(failure_threshold, reset_timeout, name=f"Ollama {host}"))
+            node.monitor = OllamaHealthMonitor(
+                lambda host=host: probe(host), node.breaker, health_interval,
+                on_recover=(lambda node=node: on_recover(node)) if on_recover else None
+            )
+            self.nodes.append(node)
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """Whether any node is currently considered up"""
+        return any(node.breaker.state != CircuitBreaker.OPEN for node in self.nodes)
+
+    def acquire(self, prefer: Optional[str] = None) -> Optional[OllamaNode]:
+        """Pick the least loaded node that accepts a request and count it as outstanding.
+
+        prefer names the host that already holds the request's prefix in its
+        KV cache (a chat session); it is picked even with one request more in
+        flight than the least loaded node.
+
+        Returns None when every node is ejected; pass the node to release() when done.
+        """
+        def load(node):
+            return (node.outstanding - 1 if node.host == prefer else node.outstanding, node.requests)
+
+        with self._lock:
+            for node in sorted(self.nodes, key=load):
+                if node.breaker.allow_request():
+                    node.outstanding += 1
+                    node.requests += 1
+                    return node
+        return None
+
+    def release(self, node: OllamaNode):
+        with self._lock:
+            node.outstanding -= 1
+
+    def check_all(self) -> List[bool]:
+        """Probe every node once, e.g. at start-up"""
+        return [node.monitor.check_once() for node in self.nodes]
+
+    def start(self):
+        for node in self.nodes:
+            node.monitor.start()
+
+    def stop(self):
+        for node in self.nodes:
+            node.monitor.stop()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [node.stats() for node in self.nodes]
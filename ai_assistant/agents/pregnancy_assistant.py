@@ -1,16 +1,141 @@
 import os
 import requests
 import json
-from typing import Optional, Dict, Any
+import threading
+import time
+from collections import Counter
+from requests.adapters import HTTPAdapter
+from typing import Callable, Optional, Dict, Any, Iterator, List
+
+from agents.chat_sessions import (
+    ChatSession, ChatSessionStore, ChatTurn,
+    DEFAULT_MAX_SESSIONS, DEFAULT_MAX_CONTEXT_TOKENS, DEFAULT_IDLE_TIMEOUT
+)
+from agents.ollama_health import DEFAULT_FAILURE_THRESHOLD, DEFAULT_RESET_TIMEOUT, DEFAULT_HEALTH_INTERVAL
+from agents.ollama_pool import OllamaPool, OllamaNode
+from agents.prompt_builder import PromptBuilder, BuiltPrompt, clean_text, estimate_tokens
+from agents.response_cache import ResponseCache, make_cache_key, DEFAULT_CACHE_SIZE, DEFAULT_TTL
+from agents.script_detector import detect_language
+from agents.scheduler import (
+    GenerationScheduler, DeadlineExceeded, DEFAULT_PRIORITY,
+    DEFAULT_MAX_CONCURRENT, DEFAULT_MAX_QUEUE, DEFAULT_QUEUE_TIMEOUT
+)
+from agents.single_flight import SingleFlight
+
+DEFAULT_OLLAMA_HOST = "http://localhost:11434"
+DEFAULT_POOL_SIZE = 10  # Keep-alive connections to Ollama; match the server's request threads
+
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")  # Default model for every task; any model you have pulled
+OLLAMA_TIMEOUT = 60  # Seconds to wait for a generation when the caller has no deadline
+DEFAULT_KEEP_ALIVE = "30m"  # How long Ollama keeps the model loaded after the last request
+DEFAULT_WARMUP_TIMEOUT = 120.0  # Seconds allowed for loading the model at start-up
+GENERATION_OPTIONS = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "num_predict": 200  # Limit response length for faster generation
+}
+# Stop before the model writes the next turn of the System/User/Assistant prompt
+TURN_STOPS = ["\nUser:", "\nSystem:"]
+
+# Generation settings per task type, applied on top of GENERATION_OPTIONS.
+# Each task uses OLLAMA_MODEL unless OLLAMA_MODEL_<TASK> routes it elsewhere,
+# e.g. OLLAMA_MODEL_EXTRACTION=qwen2.5:0.5b for the structured tasks.
+TASK_ROUTES = {
+    "chat": {"num_predict": 200, "temperature": 0.7},
+    "guidance": {"num_predict": 200, "temperature": 0.7},  # Unchanged: longer answers outrun the 10s budget on CPU
+    "extraction": {"num_predict": 120, "temperature": 0.1, "stop": TURN_STOPS + ["\nTranscript:"]},
+    "reminders": {"num_predict": 160, "temperature": 0.4}  # Five one-line reminders
+}
+DEFAULT_TASK = "chat"
+# Prompt size budget per task in (estimated) tokens, system prompt included; prefill
+# time on a CPU-only Ollama grows with it, so history beyond it is trimmed
+PROMPT_BUDGETS = {
+    "chat": 1024,
+    "guidance": 1536,
+    "extraction": 768,
+    "reminders": 1024
+}
+
+# Languages without canned mock answers of their own use a related language's;
+# the rest get English. Marathi readers are served the Devanagari Hindi answers.
+MOCK_RESPONSE_LANGUAGES = {
+    "marathi": "hindi"
+}
+
+def build_task_routes() -> Dict[str, Dict[str, Any]]:
+    """Model, Ollama options and prompt budget for each task, with OLLAMA_MODEL_<TASK>
+    and PROMPT_BUDGET_<TASK> overrides applied"""
+    routes = {}
+    for task, settings in TASK_ROUTES.items():
+        routes[task] = {
+            "task": task,
+            "model": os.getenv(f"OLLAMA_MODEL_{task.upper()}", OLLAMA_MODEL),
+            "options": {**GENERATION_OPTIONS, "stop": TURN_STOPS, **settings},
+            "prompt_budget": int(os.getenv(f"PROMPT_BUDGET_{task.upper()}", PROMPT_BUDGETS[task]))
+        }
+    return routes
 
 class LocalAIClient:
-    """Client for handling different local AI providers with multilingual support"""
+    """Client for handling different local AI providers with multilingual support.
+    
+    Generations are spread over one or more Ollama servers (OLLAMA_HOSTS, a
+    comma-separated list, or OLLAMA_HOST) by an OllamaPool.
     
-    def __init__(self):
-        self.ollama_available = self._check_ollama()
-        self.selected_provider = self._select_provider()
+    Construction does not touch the network: the first health probes and the
+    model warm-up run on a background thread, and `ready` is set once they
+    are done (whether Ollama turned out to be up or not).
+    """
+    
+    def __init__(self, hosts: Optional[List[str]] = None):
+        if hosts is None:
+            hosts = os.getenv("OLLAMA_HOSTS", "").split(",")
+        hosts = [self._normalize_host(host) for host in hosts if host.strip()]
+        self.ollama_hosts = hosts or [self._normalize_host(os.getenv("OLLAMA_HOST", DEFAULT_OLLAMA_HOST))]
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", DEFAULT_KEEP_ALIVE)
+        self.warmup_timeout = float(os.getenv("OLLAMA_WARMUP_TIMEOUT", DEFAULT_WARMUP_TIMEOUT))
+        self.task_routes = build_task_routes()
+        self.pool_size = int(os.getenv("OLLAMA_POOL_SIZE", DEFAULT_POOL_SIZE))
+        self.session = self._create_session()
+        self._stream_counts = Counter(started=0, completed=0, cancelled=0)
+        self._stream_lock = threading.Lock()
+        self._prompt_sizes = {}
+        self._prompt_lock = threading.Lock()
+        self.response_cache = ResponseCache(
+            max_size=int(os.getenv("RESPONSE_CACHE_SIZE", DEFAULT_CACHE_SIZE)),
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", DEFAULT_TTL))
+        )
+        self.single_flight = SingleFlight()
+        self.chat_sessions = ChatSessionStore(
+            max_sessions=int(os.getenv("CHAT_SESSION_MAX", DEFAULT_MAX_SESSIONS)),
+            max_tokens=int(os.getenv("CHAT_SESSION_MAX_TOKENS", DEFAULT_MAX_CONTEXT_TOKENS)),
+            idle_timeout=float(os.getenv("CHAT_SESSION_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT))
+        )
+        self.scheduler = GenerationScheduler(
+            # The limit covers all nodes together
+            max_concurrent=int(os.getenv("OLLAMA_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT * len(self.ollama_hosts))),
+            max_queue=int(os.getenv("OLLAMA_MAX_QUEUE", DEFAULT_MAX_QUEUE)),
+            queue_timeout=float(os.getenv("OLLAMA_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT))
+        )
+        self.pool = OllamaPool(
+            self.ollama_hosts, self._check_ollama,
+            failure_threshold=int(os.getenv("OLLAMA_FAILURE_THRESHOLD", DEFAULT_FAILURE_THRESHOLD)),
+            reset_timeout=float(os.getenv("OLLAMA_RESET_TIMEOUT", DEFAULT_RESET_TIMEOUT)),
+            health_interval=float(os.getenv("OLLAMA_HEALTH_INTERVAL", DEFAULT_HEALTH_INTERVAL)),
+            on_recover=self._start_warm_up
+        )
+        self.ready = threading.Event()
+        self._warmup_lock = threading.Lock()
         self.supported_languages = {
             'hindi': 'हिंदी',
+            'marathi': 'मराठी',
+            'gujarati': 'ગુજરાતી',
+            'bengali': 'বাংলা',
+            'punjabi': 'ਪੰਜਾਬੀ',
+            'odia': 'ଓଡ଼ିଆ',
+            'tamil': 'தமிழ்',
+            'telugu': 'తెలుగు',
+            'kannada': 'ಕನ್ನಡ',
+            'malayalam': 'മലയാളം',
             'spanish': 'español', 
             'french': 'français',
             'german': 'deutsch',
@@ -21,123 +146,495 @@ class LocalAIClient:
             'japanese': '日本語',
             'korean': '한국어'
         }
-        print(f"✅ Local AI initialized with provider: {self.selected_provider}")
-        print(f"🌍 Multilingual support: Available for {len(self.supported_languages)} languages")
+        threading.Thread(target=self._start_up, name="ollama-startup", daemon=True).start()
+    
+    def _start_up(self):
+        """First probe and model warm-up, off the import/request path"""
+        try:
+            healthy = self.pool.check_all()
+            for node, ok in zip(self.pool.nodes, healthy):
+                if ok:
+                    node.warmup_thread.join()
+                else:
+                    node.breaker.force_open()
+                    if len(self.pool.nodes) > 1:
+                        print(f"⚠️  Ollama at {node.host} not reachable, routing around it")
+            if not any(healthy):
+                self._print_setup_hint()
+            print(f"✅ Local AI initialized with provider: {self.selected_provider}")
+            print(f"🌍 Multilingual support: Available for {len(self.supported_languages)} languages")
+        except Exception as e:
+            print(f"Local AI start-up error: {e}")
+        finally:
+            self.ready.set()
+            self.pool.start()
+    
+    def _start_warm_up(self, node: OllamaNode):
+        """Load the models on a node in the background unless its warm-up is already running"""
+        with self._warmup_lock:
+            if node.warmup_thread is not None and node.warmup_thread.is_alive():
+                return
+            node.warmup_thread = threading.Thread(target=self.warm_up, args=(node,), name="ollama-warmup", daemon=True)
+            node.warmup_thread.start()
+    
+    def warm_up(self, node: OllamaNode) -> bool:
+        """Ask a node to load every routed model into memory (an empty generate request) and keep it loaded"""
+        loaded = True
+        for model in sorted({route["model"] for route in self.task_routes.values()}):
+            started = time.monotonic()
+            try:
+                response = self.session.post(
+                    f"{node.host}/api/generate",
+                    json={"model": model, "keep_alive": self.keep_alive},
+                    timeout=self.warmup_timeout
+                )
+                ok = response.status_code == 200
+            except Exception as e:
+                print(f"Model warm-up error: {e}")
+                ok = False
+            if ok:
+                print(f"🔥 Model {model} loaded on {node.host} in {time.monotonic() - started:.1f}s "
+                      f"(keep_alive {self.keep_alive})")
+            else:
+                print(f"⚠️  Could not preload {model} on {node.host} (is it pulled? ollama pull {model}), "
+                      "the first request will load it")
+            loaded = loaded and ok
+        node.model_loaded = loaded
+        return loaded
+    
+    @property
+    def model_loaded(self) -> bool:
+        """Whether at least one node has the models loaded"""
+        return any(node.model_loaded for node in self.pool.nodes)
+    
+    def route(self, task: str) -> Dict[str, Any]:
+        """Model and options for a task type; unknown tasks use the default task's route"""
+        return self.task_routes.get(task) or self.task_routes[DEFAULT_TASK]
     
     def detect_language(self, text: str) -> str:
-        """Simple language detection based on script/characters"""
-        # Check for Devanagari script (Hindi)
-        if any('\u0900' <= char <= '\u097F' for char in text):
-            return 'hindi'
-        # Check for Arabic script
-        elif any('\u0600' <= char <= '\u06FF' for char in text):
-            return 'arabic'
-        # Check for Chinese characters
-        elif any('\u4e00' <= char <= '\u9fff' for char in text):
-            return 'chinese'
-        # Check for Japanese characters
-        elif any('\u3040' <= char <= '\u309F' or '\u30A0' <= char <= '\u30FF' for char in text):
-            return 'japanese'
-        # Check for Korean characters
-        elif any('\uAC00' <= char <= '\uD7AF' for char in text):
-            return 'korean'
-        else:
-            return 'english'  # Default to English
+        """Language of text from its dominant script (single cached pass, see agents.script_detector)"""
+        return detect_language(text)
+    
+    @staticmethod
+    def _normalize_host(host: str) -> str:
+        """Accept OLLAMA_HOST with or without a scheme, like the Ollama CLI does"""
+        host = host.strip().rstrip("/")
+        return host if "://" in host else f"http://{host}"
     
-    def _check_ollama(self) -> bool:
-        """Check if Ollama is running locally"""
+    def _create_session(self) -> requests.Session:
+        """Pooled keep-alive session so generations reuse TCP connections to Ollama"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.ollama_hosts), pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    
+    def connection_stats(self) -> Dict[str, Any]:
+        """Connection reuse statistics of the Ollama session pool"""
+        adapter = self.session.get_adapter(self.ollama_hosts[0])
+        pools = adapter.poolmanager.pools
+        requests_sent = connections_opened = 0
+        for key in pools.keys():
+            pool = pools[key]
+            requests_sent += pool.num_requests
+            connections_opened += pool.num_connections
+        return {
+            "pool_size": self.pool_size,
+            "requests": requests_sent,
+            "connections_opened": connections_opened,
+            "connections_reused": max(requests_sent - connections_opened, 0),
+            "reuse_rate": round(1 - connections_opened / requests_sent, 3) if requests_sent else 0.0
+        }
+    
+    def _check_ollama(self, host: str) -> bool:
+        """Check if an Ollama server is running"""
         try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=2)
+            response = self.session.get(f"{host}/api/tags", timeout=2)
             return response.status_code == 200
         except:
             return False
     
-    def _select_provider(self) -> str:
-        """Select the best available AI provider"""
-        if self.ollama_available:
-            return "ollama"
-        else:
-            print("⚠️  Ollama not detected. To get full AI capabilities:")
-            print("   1. Install Ollama: https://ollama.ai/")
-            print("   2. Run: ollama pull llama3.2")
-            print("   3. Restart this app")
-            print("   Using Mock AI for now...")
-            return "mock"  # Fallback to mock responses
+    @property
+    def ollama_available(self) -> bool:
+        """Whether any Ollama node is currently considered up, from the breakers' state"""
+        return self.pool.available
+    
+    @property
+    def selected_provider(self) -> str:
+        """The provider requests currently go to; switches back to Ollama once it recovers"""
+        return "ollama" if self.ollama_available else "mock"
+    
+    def health_stats(self) -> Dict[str, Any]:
+        """Breaker state, load and last health probes of each Ollama node"""
+        return {
+            "provider": self.selected_provider,
+            "ready": self.ready.is_set(),
+            "model_loaded": self.model_loaded,
+            "models": {task: route["model"] for task, route in self.task_routes.items()},
+            "nodes": self.pool.stats()
+        }
+    
+    def _print_setup_hint(self):
+        print("⚠️  Ollama not detected. To get full AI capabilities:")
+        print("   1. Install Ollama: https://ollama.ai/")
+        print("   2. Run: ollama pull llama3.2")
+        print("   3. Start Ollama, the app switches over automatically")
+        print("   Using Mock AI for now...")
+    
+    def close(self):
+        """Stop the background health monitors"""
+        self.pool.stop()
     
-    def generate_response(self, prompt: str, system_prompt: str = "", context: str = "", user_language: str = None) -> str:
-        """Generate AI response using the selected provider with multilingual support"""
+    def _prepare_prompt(self, prompt: str, system_prompt: str, context: str, user_language: Optional[str],
+                        route: Dict[str, Any], chat_turn: ChatTurn = None):
+        """Apply language detection, the multilingual instruction and memory context within the task's prompt budget
+        
+        Returns (prompt, system prompt, language, chat session or None). When
+        chat_turn continues a live session, the prompt is just its message.
+        """
         
         # Detect language if not specified
         if not user_language:
             user_language = self.detect_language(prompt)
         
-        # Add multilingual context to system prompt
-        if user_language != 'english':
-            language_name = self.supported_languages.get(user_language, user_language)
-            multilingual_system = f"{system_prompt}\n\nIMPORTANT: The user is communicating in {language_name}. Please respond in the same language ({language_name}) to ensure they can understand your guidance. Be culturally sensitive and appropriate for their language/culture."
-        else:
-            multilingual_system = system_prompt
+        multilingual_system = self.system_prompt_for(system_prompt, user_language)
+        
+        session = None
+        if chat_turn is not None:
+            fingerprint = make_cache_key(chat_turn.history, multilingual_system, user_language, route["model"],
+                                         route["options"])
+            session = self.chat_sessions.start(chat_turn.session_id, fingerprint)
+            if session.resumed:
+                # Ollama's context tokens already hold the system prompt, the memory context and earlier turns
+                built = PromptBuilder(route["prompt_budget"]).add(chat_turn.message).build()
+                self._record_prompt(route["task"], built, 0)
+                return built.text, multilingual_system, user_language, session
         
-        # Add context if provided
+        # Add context if provided; left out when the prompt already carries it
+        builder = PromptBuilder(route["prompt_budget"] - estimate_tokens(multilingual_system))
         if context:
-            full_prompt = f"CONTEXT (Previous pregnancy logs):\n{context}\n\nCURRENT QUERY: {prompt}"
+            builder.add_history(context, "CONTEXT (Previous pregnancy logs):")
+            builder.add(prompt, "CURRENT QUERY:")
         else:
-            full_prompt = prompt
+            builder.add(prompt)
+        built = builder.build()
+        self._record_prompt(route["task"], built, estimate_tokens(multilingual_system))
+        
+        return built.text, multilingual_system, user_language, session
+    
+    def system_prompt_for(self, system_prompt: str, user_language: str) -> str:
+        """The system prompt as sent: cleaned, plus the instruction to answer in a non-English user's language"""
+        system_prompt = clean_text(system_prompt)
+        if user_language == 'english':
+            return system_prompt
+        language_name = self.supported_languages.get(user_language, user_language)
+        return f"{system_prompt}\n\nIMPORTANT: The user is communicating in {language_name}. Please respond in the same language ({language_name}) to ensure they can understand your guidance. Be culturally sensitive and appropriate for their language/culture."
+    
+    def _record_prompt(self, task: str, built: BuiltPrompt, system_tokens: int):
+        """Count the size of a prompt sent for a task"""
+        tokens = built.tokens + system_tokens
+        with self._prompt_lock:
+            sizes = self._prompt_sizes.setdefault(task, Counter())
+            sizes["prompts"] += 1
+            sizes["estimated_tokens"] += tokens
+            sizes["max_estimated_tokens"] = max(sizes["max_estimated_tokens"], tokens)
+            sizes["trimmed_lines"] += built.trimmed_lines
+            sizes["duplicate_sections"] += built.duplicate_sections
+        if built.trimmed_lines:
+            print(f"✂️  {task} prompt trimmed to its {built.budget} token budget ({built.trimmed_lines} history lines dropped)")
+    
+    def _record_prefill(self, task: str, result: Dict[str, Any]):
+        """Count the prompt tokens Ollama actually evaluated and the time it took, from a finished generation"""
+        if "prompt_eval_count" not in result:
+            return  # Ollama leaves it out when the whole prompt came from its cache
+        with self._prompt_lock:
+            sizes = self._prompt_sizes.setdefault(task, Counter())
+            sizes["prefills"] += 1
+            sizes["prompt_eval_tokens"] += result["prompt_eval_count"]
+            sizes["prompt_eval_ms"] += result.get("prompt_eval_duration", 0) / 1e6
+    
+    def prompt_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Prompt sizes per task: estimated tokens sent, history trimmed, and Ollama's measured prefill"""
+        with self._prompt_lock:
+            stats = {}
+            for task, sizes in self._prompt_sizes.items():
+                stats[task] = {
+                    "prompts": sizes["prompts"],
+                    "budget": self.route(task)["prompt_budget"],
+                    "avg_estimated_tokens": round(sizes["estimated_tokens"] / sizes["prompts"]) if sizes["prompts"] else 0,
+                    "max_estimated_tokens": sizes["max_estimated_tokens"],
+                    "trimmed_lines": sizes["trimmed_lines"],
+                    "duplicate_sections": sizes["duplicate_sections"],
+                    "avg_prompt_eval_tokens": round(sizes["prompt_eval_tokens"] / sizes["prefills"]) if sizes["prefills"] else None,
+                    "avg_prompt_eval_ms": round(sizes["prompt_eval_ms"] / sizes["prefills"], 1) if sizes["prefills"] else None
+                }
+            return stats
+    
+    def generate_response(self, prompt: str, system_prompt: str = "", context: str = "", user_language: str = None,
+                          use_cache: bool = False, refresh_cache: bool = False,
+                          priority: str = DEFAULT_PRIORITY, deadline: float = None, task: str = DEFAULT_TASK,
+                          chat_turn: ChatTurn = None) -> str:
+        """Generate AI response using the selected provider with multilingual support
         
-        if self.selected_provider == "ollama":
-            return self._ollama_generate(full_prompt, multilingual_system, user_language)
+        task selects the model, token budget, stop sequences and temperature
+        from the routing table (chat, guidance, extraction, reminders).
+        
+        With chat_turn, the conversation is kept in the user's chat session:
+        Ollama's context tokens are stored after the answer, and while the
+        session is live (same history, language and model) the next turn sends
+        only chat_turn.message with them instead of the full prompt.
+        
+        Concurrent identical requests are deduplicated into one generation.
+        With use_cache, identical requests (same normalized prompt, system prompt,
+        language, model and options) are answered from the response cache;
+        refresh_cache skips the lookup but stores the new answer. Only Ollama
+        answers are cached, never mock fallbacks.
+        
+        Calls to Ollama wait for a scheduler slot in the given priority class
+        and raise GenerationRejected when the queue is full or the wait too long.
+        
+        deadline is a time.monotonic() value; queueing, waiting on a shared
+        generation and the Ollama request itself are all bounded by it, and
+        DeadlineExceeded is raised once it passes so the caller can answer
+        with a rule-based fallback. A caller sharing a generation whose leader
+        ran out of budget first runs it again within its own deadline.
+        """
+        route = self.route(task)
+        full_prompt, multilingual_system, user_language, session = self._prepare_prompt(
+            prompt, system_prompt, context, user_language, route, chat_turn
+        )
+        generation_key, cache_key, cached = self._cache_lookup(full_prompt, multilingual_system, user_language,
+                                                               route, use_cache, refresh_cache, session)
+        if cached is not None:
+            return cached
+        
+        # Identical requests already running (retries, double taps) share that
+        # generation's result instead of starting another one
+        try:
+            return self.single_flight.do(
+                generation_key,
+                lambda: self._generate(full_prompt, multilingual_system, user_language, route, cache_key, priority,
+                                       deadline, session),
+                timeout=remaining_budget(deadline),
+                retry_if=outlives_leader(deadline)
+            )
+        except TimeoutError:
+            raise DeadlineExceeded("Latency budget spent waiting for an identical generation")
+    
+    def _cache_lookup(self, prompt: str, system_prompt: str, user_language: str, route: Dict[str, Any],
+                      use_cache: bool, refresh_cache: bool, session: ChatSession = None):
+        """Returns (generation_key, cache_key, cached answer or None)"""
+        options = route["options"]
+        if session is not None:
+            # A chat turn's answer depends on the conversation so far: never shared with another user or cached
+            options = {**options, "session": session.session_id, "context_tokens": len(session.tokens)}
+            use_cache = False
+        # The same key identifies duplicate in-flight generations and cached answers
+        generation_key = make_cache_key(prompt, system_prompt, user_language, route["model"], options)
+        if not use_cache:
+            return generation_key, None, None
+        if refresh_cache:
+            self.response_cache.record_bypass()
+            return generation_key, generation_key, None
+        return generation_key, generation_key, self.response_cache.get(generation_key)
+    
+    def fallback_response(self, prompt: str, user_language: str = None) -> str:
+        """Rule-based answer used when the model can't answer in time"""
+        return self._mock_generate(prompt, "", user_language or self.detect_language(prompt))
+    
+    def _generate(self, prompt: str, system_prompt: str, user_language: str, route: Dict[str, Any],
+                  cache_key: str = None, priority: str = DEFAULT_PRIORITY, deadline: float = None,
+                  session: ChatSession = None) -> str:
+        # Each node's breaker is kept current by its health monitor and by the
+        # outcome of each generation, so no probe is needed before calling Ollama.
+        # Mock answers are instant and don't take a scheduler slot.
+        if self.ollama_available:
+            with self.scheduler.slot(priority, timeout=remaining_budget(deadline)):
+                node = self.pool.acquire(prefer=session.host if session else None)
+                if node is not None:
+                    try:
+                        return self._ollama_generate(node, prompt, system_prompt, user_language, route, cache_key,
+                                                     deadline, session)
+                    finally:
+                        self.pool.release(node)
+        return self._mock_generate(prompt, system_prompt, user_language)
+    
+    def stream_response(self, prompt: str, system_prompt: str = "", context: str = "", user_language: str = None,
+                        priority: str = DEFAULT_PRIORITY, task: str = DEFAULT_TASK,
+                        chat_turn: ChatTurn = None) -> Iterator[str]:
+        """Generate a response as a stream of text chunks.
+        
+        Ollama tokens are relayed as they arrive; the mock provider yields its
+        answer as a single chunk. Closing the generator (e.g. when the HTTP
+        client disconnects) closes the upstream request, which makes Ollama
+        stop generating.
+        
+        The scheduler slot is acquired before this returns, so GenerationRejected
+        is raised here rather than in the middle of a response, and held until
+        the stream is exhausted or closed.
+        """
+        route = self.route(task)
+        full_prompt, multilingual_system, user_language, session = self._prepare_prompt(
+            prompt, system_prompt, context, user_language, route, chat_turn
+        )
+        
+        stream = self._relay_stream(full_prompt, multilingual_system, user_language, route, priority, session)
+        next(stream)  # Runs up to admission; a started generator always releases its slot on close
+        return stream
+    
+    def _relay_stream(self, prompt: str, system_prompt: str, user_language: str, route: Dict[str, Any],
+                      priority: str, session: ChatSession = None) -> Iterator[str]:
+        admitted_at = self.scheduler.acquire(priority) if self.ollama_available else None
+        node = None
+        self._record_stream("started")
+        completed = False
+        try:
+            yield None  # Admission marker consumed by stream_response
+            node = self.pool.acquire(prefer=session.host if session else None) if admitted_at is not None else None
+            if node is not None:
+                yield from self._ollama_stream(node, prompt, system_prompt, user_language, route, session)
+            else:
+                yield self._mock_generate(prompt, system_prompt, user_language)
+            completed = True
+        finally:
+            if node is not None:
+                self.pool.release(node)
+            if admitted_at is not None:
+                self.scheduler.release(admitted_at)
+            self._record_stream("completed" if completed else "cancelled")
+    
+    def stream_stats(self) -> Dict[str, int]:
+        """Counts of streamed responses that finished or were cut off by the client"""
+        with self._stream_lock:
+            return dict(self._stream_counts)
+    
+    def _record_stream(self, outcome: str):
+        with self._stream_lock:
+            self._stream_counts[outcome] += 1
+    
+    def _ollama_payload(self, prompt: str, system_prompt: str, route: Dict[str, Any], stream: bool,
+                        session: ChatSession = None) -> Dict[str, Any]:
+        # Format the prompt properly for Ollama with language instruction
+        if session is not None and session.resumed:
+            full_prompt = f"User: {prompt}\n\nAssistant:"  # The system prompt is in the context tokens
+        elif system_prompt:
+            full_prompt = f"System: {system_prompt}\n\nUser: {prompt}\n\nAssistant:"
         else:
-            return self._mock_generate(full_prompt, multilingual_system, user_language)
+            full_prompt = prompt
+        
+        payload = {
+            "model": route["model"],
+            "prompt": full_prompt,
+            "stream": stream,
+            "options": route["options"],
+            "keep_alive": self.keep_alive
+        }
+        if session is not None and session.resumed:
+            payload["context"] = session.tokens.tolist()
+        return payload
+    
+    def _save_session(self, session: Optional[ChatSession], result: Dict[str, Any], node: OllamaNode):
+        """Keep the context Ollama returned with an answer for the user's next chat turn"""
+        if session is not None and result.get("context"):
+            self.chat_sessions.save(session, result["context"], node.host)
     
-    def _ollama_generate(self, prompt: str, system_prompt: str, user_language: str = 'english') -> str:
+    def _ollama_generate(self, node: OllamaNode, prompt: str, system_prompt: str, user_language: str, route: Dict[str, Any],
+                         cache_key: str = None, deadline: float = None, session: ChatSession = None) -> str:
         """Generate response using Ollama with language support"""
+        # A deadline shorter than the usual timeout caps the request; hitting it
+        # says nothing about Ollama's health, so it doesn't count against the breaker
+        remaining = remaining_budget(deadline)
+        deadline_bound = remaining is not None and remaining < OLLAMA_TIMEOUT
+        if deadline_bound and remaining <= 0:
+            node.breaker.release_trial()
+            raise DeadlineExceeded("Latency budget spent before the generation started")
+        
         try:
-            # Check if Ollama is still running
-            test_response = requests.get("http://localhost:11434/api/tags", timeout=2)
-            if test_response.status_code != 200:
-                print("Ollama not responding, falling back to mock AI")
-                return self._mock_generate(prompt, system_prompt, user_language)
-            
-            # Format the prompt properly for Ollama with language instruction
-            if system_prompt:
-                full_prompt = f"System: {system_prompt}\n\nUser: {prompt}\n\nAssistant:"
-            else:
-                full_prompt = prompt
-            
             # Make the API call to Ollama
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": "llama3.2",  # You can change this to any model you have
-                    "prompt": full_prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.7,
-                        "top_p": 0.9,
-                        "num_predict": 200  # Limit response length for faster generation
-                    }
-                },
-                timeout=60  # Increased timeout to 60 seconds
+            response = self.session.post(
+                f"{node.host}/api/generate",
+                json=self._ollama_payload(prompt, system_prompt, route, stream=False, session=session),
+                timeout=remaining if deadline_bound else OLLAMA_TIMEOUT
             )
             
             if response.status_code == 200:
-                result = response.json().get("response", "").strip()
+                node.breaker.record_success()
+                data = response.json()
+                self._record_prefill(route["task"], data)
+                result = data.get("response", "").strip()
                 if result:
+                    self._save_session(session, data, node)
+                    if cache_key:
+                        self.response_cache.put(cache_key, result)
                     return result
                 else:
                     print("Empty response from Ollama, using fallback")
                     return self._mock_generate(prompt, system_prompt, user_language)
             else:
                 print(f"Ollama API error (status {response.status_code}), using fallback")
+                node.breaker.record_failure()
                 return self._mock_generate(prompt, system_prompt, user_language)
                 
         except requests.exceptions.Timeout:
+            if deadline_bound:
+                # Closing the timed-out connection also stops the generation in Ollama
+                node.breaker.release_trial()
+                raise DeadlineExceeded(f"No answer from Ollama within the {remaining:.1f}s budget")
             print("Ollama request timed out, using fallback")
+            node.breaker.record_failure()
             return self._mock_generate(prompt, system_prompt, user_language)
         except Exception as e:
             print(f"Ollama error: {e}, using fallback")
+            node.breaker.record_failure()
             return self._mock_generate(prompt, system_prompt, user_language)
     
+    def _ollama_stream(self, node: OllamaNode, prompt: str, system_prompt: str, user_language: str, route: Dict[str, Any],
+                       session: ChatSession = None) -> Iterator[str]:
+        """Relay tokens from Ollama's streaming API, falling back to mock if nothing was produced"""
+        response = None
+        produced = False
+        try:
+            response = self.session.post(
+                f"{node.host}/api/generate",
+                json=self._ollama_payload(prompt, system_prompt, route, stream=True, session=session),
+                stream=True,
+                timeout=(5, 60)  # Connect timeout, then max wait between chunks
+            )
+            if response.status_code != 200:
+                print(f"Ollama API error (status {response.status_code}), using fallback")
+                node.breaker.record_failure()
+            else:
+                node.breaker.record_success()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    token = chunk.get("response", "")
+                    if token:
+                        produced = True
+                        yield token
+                    if chunk.get("done"):
+                        self._record_prefill(route["task"], chunk)
+                        if produced:
+                            self._save_session(session, chunk, node)
+                        break
+        except Exception as e:
+            node.breaker.record_failure()
+            if produced:
+                # Part of the answer is already out: fail the stream rather than end it as if complete
+                raise ConnectionError(f"Ollama stream broke off: {e}") from e
+            if isinstance(e, requests.exceptions.Timeout):
+                print("Ollama request timed out, using fallback")
+            else:
+                print(f"Ollama error: {e}, using fallback")
+        finally:
+            # Dropping the connection mid-stream is what cancels the generation upstream
+            if response is not None:
+                response.close()
+        
+        if not produced:
+            yield self._mock_generate(prompt, system_prompt, user_language)
+    
     def _mock_generate(self, prompt: str, system_prompt: str, user_language: str = 'english') -> str:
         """Generate mock responses based on keywords in the prompt with multilingual support"""
         prompt_lower = prompt.lower()
@@ -160,8 +657,11 @@ class LocalAIClient:
             }
         }
         
-        # Get responses for the detected language, fallback to English
-        lang_responses = responses.get(user_language, responses['english'])
+        # Get responses for the detected language, fallback to a related language or English
+        user_language = MOCK_RESPONSE_LANGUAGES.get(user_language, user_language)
+        if user_language not in responses:
+            user_language = 'english'
+        lang_responses = responses[user_language]
         
         # Extract week number if present
         week_num = None
@@ -198,8 +698,18 @@ class LocalAIClient:
         # Default response
         return lang_responses['default']
 
-# Initialize the local AI client
-client = LocalAIClient()
+def remaining_budget(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until a time.monotonic() deadline, or None without one"""
+    return None if deadline is None else deadline - time.monotonic()
+
+def outlives_leader(deadline: Optional[float]) -> Callable[[BaseException], bool]:
+    """SingleFlight retry_if for a caller: the shared generation ran out of the
+    leader's latency budget, but this caller's own deadline has not passed yet"""
+    return lambda error: isinstance(error, DeadlineExceeded) and (deadline is None or remaining_budget(deadline) > 0)
+
+# The local AI client, created on first use by get_local_assistant()
+_client = None
+_client_lock = threading.Lock()
 
 def create_pregnancy_assistant():
     """
@@ -214,13 +724,18 @@ def create_pregnancy_assistant():
         Always prioritize user safety and recommend consulting healthcare professionals for 
         serious symptoms.
         """,
-        "provider": client.selected_provider,
+        "provider": get_local_assistant().selected_provider,
         "tools": ["symptom_checker", "emergency_escalator"]
     }
     return assistant_config
 
 def get_local_assistant():
     """
-    Returns the local AI assistant client
+    Returns the local AI assistant client, creating it on first call
     """
-    return client
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LocalAIClient()
+    return _client
@@ -0,0 +1,121 @@
+import re
+from typing import List, NamedTuple, Optional
+
+CHARS_PER_TOKEN = 4  # English text, roughly, for Llama-style tokenizers
+NON_ASCII_CHARS_PER_TOKEN = 2  # Indic and other scripts split into far more tokens per character
+DEFAULT_PROMPT_BUDGET = 1024  # Tokens
+
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of text, without loading a tokenizer"""
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    non_ascii = len(text) - ascii_chars
+    return -(-ascii_chars // CHARS_PER_TOKEN) - (-non_ascii // NON_ASCII_CHARS_PER_TOKEN)
+
+def clean_text(text: str) -> str:
+    """Strip the indentation triple-quoted templates leave on every line and collapse blank-line runs"""
+    lines = [line.strip() for line in (text or "").splitlines()]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+class BuiltPrompt(NamedTuple):
+    text: str
+    tokens: int  # Estimated
+    budget: int
+    trimmed_lines: int  # History lines dropped to fit the budget
+    duplicate_sections: int  # Sections dropped because another section already contains them
+
+class _Section:
+    def __init__(self, text: str, title: Optional[str], history: bool, header_lines: int):
+        self.title = title
+        self.lines = clean_text(text).splitlines()
+        if history:
+            self.lines = [line for line in self.lines if line]  # One entry per line
+        self.history = history
+        self.header_lines = header_lines
+
+    @property
+    def body(self) -> str:
+        return "\n".join(self.lines)
+
+    def render(self) -> str:
+        return f"{self.title}\n{self.body}" if self.title else self.body
+
+    def copy(self) -> "_Section":
+        section = _Section("", self.title, self.history, self.header_lines)
+        section.lines = list(self.lines)
+        return section
+
+class PromptBuilder:
+    """Assembles a prompt from sections within a token budget.
+
+    Every section is cleaned of template whitespace. A history section whose
+    text is already part of another section (e.g. a journey summary that both
+    the prompt and the caller's context carry) is left out; other sections are
+    always kept. If the result is still over
+    the budget, history sections lose their oldest lines first, after any
+    header lines, and finally the whole section; other sections are never cut.
+
+        prompt = (PromptBuilder(budget)
+                  .add("A user at week 24 of pregnancy...")
+                  .add_history(journey_summary, header_lines=2)
+                  .add(instructions)
+                  .build())
+    """
+
+    def __init__(self, budget: int = DEFAULT_PROMPT_BUDGET):
+        self.budget = budget
+        self.sections: List[_Section] = []
+
+    def add(self, text: str, title: str = None) -> "PromptBuilder":
+        if text and text.strip():
+            self.sections.append(_Section(text, title, history=False, header_lines=0))
+        return self
+
+    def add_history(self, text: str, title: str = None, header_lines: int = 0) -> "PromptBuilder":
+        """Add a section of past entries, oldest line first, that may be trimmed to fit the budget"""
+        if text and text.strip():
+            self.sections.append(_Section(text, title, history=True, header_lines=header_lines))
+        return self
+
+    def build(self) -> BuiltPrompt:
+        sections = self._without_duplicates()
+        duplicates = len(self.sections) - len(sections)
+
+        text = self._render(sections)
+        tokens = estimate_tokens(text)
+        trimmed = 0
+        for section in [section for section in sections if section.history]:
+            while tokens > self.budget and len(section.lines) > section.header_lines:
+                section.lines.pop(section.header_lines)
+                trimmed += 1
+                text = self._render(sections)
+                tokens = estimate_tokens(text)
+            if tokens > self.budget:
+                sections.remove(section)
+                trimmed += len(section.lines)
+                text = self._render(sections)
+                tokens = estimate_tokens(text)
+            if tokens <= self.budget:
+                break
+        return BuiltPrompt(text, tokens, self.budget, trimmed, duplicates)
+
+    def _without_duplicates(self) -> List[_Section]:
+        # Only history is ever dropped: a query that happens to appear in the
+        # history (a repeated concern, a one-word question) must still be sent
+        kept = []
+        for index, section in enumerate(self.sections):
+            body = section.body
+            contained = section.history and any(
+                body in other.body and (body != other.body or not other.history or other_index < index)
+                for other_index, other in enumerate(self.sections) if other_index != index
+            )
+            if not contained:
+                kept.append(section.copy())  # Trimming must not change the builder's own sections
+        return kept
+
+    @staticmethod
+    def _render(sections: List[_Section]) -> str:
+        return "\n\n".join(section.render() for section in sections)
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+DEFAULT_CACHE_SIZE = 512  # Cached responses kept in memory
+DEFAULT_TTL = 6 * 60 * 60  # Seconds a cached response stays valid
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so indentation differences in prompt templates don't change the key"""
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+def make_cache_key(prompt: str, system_prompt: str, language: str, model: str, options: Dict) -> str:
+    """Hash of everything that determines the model's output"""
+    material = json.dumps(
+        [normalize_text(prompt), normalize_text(system_prompt), language, model, options],
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Size-bounded LRU cache of generated responses with a time-to-live.
+
+    Entries expire ttl seconds after they were stored; expired entries are
+    dropped when they are looked up or pushed out by the LRU bound.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE, ttl: float = DEFAULT_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.bypasses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response if present and not expired, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, response = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return response
+
+    def put(self, key: str, response: str):
+        """Store a response, evicting the least recently used entries when full"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "bypasses": self.bypasses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,236 @@
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any
+
+# Lower rank is served first
+PRIORITY_CLASSES = {
+    "urgent": 0,       # Voice logs, which may carry symptoms that need escalation
+    "interactive": 1,  # Chat and guidance with a user waiting on the screen
+    "background": 2    # Reminder generation and other batch work
+}
+DEFAULT_PRIORITY = "interactive"
+
+DEFAULT_MAX_CONCURRENT = 2  # Generations sent to Ollama at once
+DEFAULT_MAX_QUEUE = 32  # Requests allowed to wait for a slot
+DEFAULT_QUEUE_TIMEOUT = 30.0  # Seconds a request may wait before giving up
+
+class GenerationRejected(Exception):
+    """The scheduler could not admit a generation; retry_after is a hint in seconds"""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class QueueFullError(GenerationRejected):
+    status_code = 429
+
+class QueueTimeoutError(GenerationRejected):
+    status_code = 503
+
+class DeadlineExceeded(Exception):
+    """The caller's latency budget ran out before the model produced an answer"""
+
+class _Waiter:
+    def __init__(self, rank: int, seq: int, priority: str, loop: asyncio.AbstractEventLoop = None):
+        self.rank = rank
+        self.seq = seq
+        self.priority = priority
+        self.loop = loop
+        # Threads block on an Event, coroutines await a Future on their loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+        self.evicted = False
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+    def __lt__(self, other):
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+class GenerationScheduler:
+    """Bounded admission control in front of the model.
+
+    At most max_concurrent generations run at once; further requests wait in
+    a priority queue of at most max_queue entries, ordered by priority class
+    and then arrival. When the queue is full a newcomer displaces the newest
+    waiter of a lower class, otherwise it is rejected immediately
+    (QueueFullError). Waiting longer than queue_timeout raises QueueTimeoutError;
+    a caller-supplied timeout that ends the wait sooner raises DeadlineExceeded.
+
+    Threads use acquire() and coroutines acquire_async(); both wait in the
+    same queue, so one scheduler can front the sync and the async server.
+    """
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT, max_queue: int = DEFAULT_MAX_QUEUE,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_service = 0.0
+        self._completed = 0
+
+    @contextmanager
+    def slot(self, priority: str = DEFAULT_PRIORITY, timeout: float = None):
+        """Hold a generation slot for the duration of the block"""
+        admitted_at = self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def acquire(self, priority: str = DEFAULT_PRIORITY, timeout: float = None) -> float:
+        """Wait for a slot; returns the admission time to pass to release()"""
+        arrived = time.monotonic()
+        waiter = self._enqueue(priority, arrived)
+        if waiter is None:
+            return arrived
+
+        deadline_bound = timeout is not None and timeout < self.queue_timeout
+        waiter.event.wait(max(timeout, 0) if deadline_bound else self.queue_timeout)
+        return self._finish_wait(waiter, arrived, deadline_bound)
+
+    async def acquire_async(self, priority: str = DEFAULT_PRIORITY, timeout: float = None) -> float:
+        """Coroutine version of acquire(); waiting does not hold a thread"""
+        arrived = time.monotonic()
+        waiter = self._enqueue(priority, arrived, asyncio.get_running_loop())
+        if waiter is None:
+            return arrived
+
+        deadline_bound = timeout is not None and timeout < self.queue_timeout
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future),
+                                   max(timeout, 0) if deadline_bound else self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # The client went away: give back a slot we were just handed, or leave the queue
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    heapq.heapify(self._waiters)
+                    return_slot = False
+                else:
+                    return_slot = waiter.granted
+            if return_slot:
+                self.release(time.monotonic())
+            raise
+        return self._finish_wait(waiter, arrived, deadline_bound)
+
+    def release(self, admitted_at: float):
+        """Free a slot, handing it straight to the best waiting request"""
+        with self._lock:
+            self._total_service += time.monotonic() - admitted_at
+            self._completed += 1
+            if self._waiters:
+                waiter = heapq.heappop(self._waiters)
+                waiter.granted = True
+                waiter.wake()
+            else:
+                self._active -= 1
+
+    def check_admission(self, priority: str = DEFAULT_PRIORITY):
+        """Raise QueueFullError now if a request of this class could not even queue.
+
+        Lets endpoints reject before doing side effects such as saving a log.
+        """
+        rank = PRIORITY_CLASSES.get(priority, PRIORITY_CLASSES[DEFAULT_PRIORITY])
+        with self._lock:
+            if len(self._waiters) >= self.max_queue and not any(w.rank > rank for w in self._waiters):
+                self.rejected += 1
+                raise QueueFullError("Generation queue is full", self._retry_after())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued_by_class = {name: 0 for name in PRIORITY_CLASSES}
+            for waiter in self._waiters:
+                queued_by_class[waiter.priority] = queued_by_class.get(waiter.priority, 0) + 1
+            return {
+                "active": self._active,
+                "max_concurrent": self.max_concurrent,
+                "queue_depth": len(self._waiters),
+                "max_queue": self.max_queue,
+                "queued_by_class": queued_by_class,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_wait_ms": round(self._total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 1)
+            }
+
+    def _enqueue(self, priority: str, arrived: float, loop: asyncio.AbstractEventLoop = None):
+        """Take a free slot (returns None) or join the queue (returns the waiter)"""
+        rank = PRIORITY_CLASSES.get(priority, PRIORITY_CLASSES[DEFAULT_PRIORITY])
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                self._admitted(arrived)
+                return None
+
+            if len(self._waiters) >= self.max_queue:
+                self._make_room(rank)
+            waiter = _Waiter(rank, next(self._seq), priority, loop)
+            heapq.heappush(self._waiters, waiter)
+            return waiter
+
+    def _finish_wait(self, waiter: _Waiter, arrived: float, deadline_bound: bool) -> float:
+        with self._lock:
+            if waiter.granted:
+                return self._admitted(arrived)
+            if waiter.evicted:
+                raise QueueFullError("Generation queue is full", self._retry_after())
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+            self.timed_out += 1
+            if deadline_bound:
+                raise DeadlineExceeded("Latency budget spent waiting for a generation slot")
+            raise QueueTimeoutError(f"No generation slot within {self.queue_timeout:g}s", self._retry_after())
+
+    def _admitted(self, arrived: float) -> float:
+        now = time.monotonic()
+        wait = now - arrived
+        self.admitted += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        return now
+
+    def _make_room(self, rank: int):
+        """Evict the newest waiter of a lower class than rank, or reject the newcomer"""
+        victims = [w for w in self._waiters if w.rank > rank]
+        self.rejected += 1
+        if not victims:
+            raise QueueFullError("Generation queue is full", self._retry_after())
+        victim = max(victims, key=lambda w: (w.rank, w.seq))
+        self._waiters.remove(victim)
+        heapq.heapify(self._waiters)
+        victim.evicted = True
+        victim.wake()
+
+    def _retry_after(self) -> int:
+        """Seconds until the current backlog should have drained, from the average generation time"""
+        avg_service = self._total_service / self._completed if self._completed else 5.0
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(avg_service * backlog / max(self.max_concurrent, 1)))
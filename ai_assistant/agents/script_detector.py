@@ -0,0 +1,124 @@
+import re
+from typing import Dict, NamedTuple
+
+# Scripts told apart by the detector and the language each one implies.
+# Devanagari is Hindi unless Marathi function words outnumber Hindi ones.
+SCRIPT_LANGUAGES = {
+    "latin": "english",
+    "devanagari": "hindi",
+    "gujarati": "gujarati",
+    "bengali": "bengali",
+    "gurmukhi": "punjabi",
+    "oriya": "odia",
+    "tamil": "tamil",
+    "telugu": "telugu",
+    "kannada": "kannada",
+    "malayalam": "malayalam",
+    "arabic": "arabic",
+    "cyrillic": "russian",
+    "han": "chinese",
+    "kana": "japanese",
+    "hangul": "korean"
+}
+
+SCRIPT_RANGES = [
+    ("latin", 0x0041, 0x005A), ("latin", 0x0061, 0x007A), ("latin", 0x00C0, 0x024F),
+    ("cyrillic", 0x0400, 0x04FF),
+    ("arabic", 0x0600, 0x06FF), ("arabic", 0x0750, 0x077F),
+    ("devanagari", 0x0900, 0x097F), ("devanagari", 0xA8E0, 0xA8FF),
+    ("bengali", 0x0980, 0x09FF),
+    ("gurmukhi", 0x0A00, 0x0A7F),
+    ("gujarati", 0x0A80, 0x0AFF),
+    ("oriya", 0x0B00, 0x0B7F),
+    ("tamil", 0x0B80, 0x0BFF),
+    ("telugu", 0x0C00, 0x0C7F),
+    ("kannada", 0x0C80, 0x0CFF),
+    ("malayalam", 0x0D00, 0x0D7F),
+    ("hangul", 0x1100, 0x11FF), ("hangul", 0x3130, 0x318F), ("hangul", 0xAC00, 0xD7AF),
+    ("kana", 0x3040, 0x30FF),
+    ("han", 0x3400, 0x4DBF), ("han", 0x4E00, 0x9FFF)
+]
+
+# Spaces, digits and punctuation belong to whichever script's run they are in
+NEUTRAL_CHARACTERS = "\\s\\d!-/:-@\\[-`{-~\u00a0-\u00bf\u2000-\u206f\u0964\u0965"
+
+def _script_runs_pattern() -> re.Pattern:
+    """One regex whose alternatives match a run of text in each script, named after the script"""
+    classes = {}
+    for name, first, last in SCRIPT_RANGES:
+        classes[name] = classes.get(name, "") + f"\\u{first:04x}-\\u{last:04x}"
+    alternatives = [f"(?P<neutral>[{NEUTRAL_CHARACTERS}]+)"]
+    alternatives += [f"(?P<{name}>[{ranges}{NEUTRAL_CHARACTERS}]+)" for name, ranges in classes.items()]
+    return re.compile("|".join(alternatives))
+
+# The codepoint ranges compiled into a single pass over the text: the regex
+# engine classifies characters in C and Python only sees one match per run
+_SCRIPT_RUNS = _script_runs_pattern()
+
+MARKER_SAMPLE = 300  # Characters of Devanagari text searched for Marathi/Hindi function words
+_DEVANAGARI_WORD_END = "(?![ऀ-ॿ])"
+_MARATHI_WORDS = re.compile(
+    f"(?<![ऀ-ॿ])(?:आहे|आहेत|नाही|मला|आणि|माझा|माझी|माझे|खूप|काय|झाला|झाली|झाले){_DEVANAGARI_WORD_END}"
+)
+_HINDI_WORDS = re.compile(
+    f"(?<![ऀ-ॿ])(?:है|हैं|हूँ|हूं|नहीं|मुझे|और|मेरा|मेरी|बहुत|क्या|में){_DEVANAGARI_WORD_END}"
+)
+
+class ScriptProfile(NamedTuple):
+    script: str  # Dominant script, "latin" when no other script was found
+    language: str
+    confidence: float  # Share of the dominant script among the competing scripts
+    histogram: Dict[str, int]  # Characters per script (up to the early exit), spaces within a run included
+    scanned: int  # Characters examined
+
+def detect_script(text: str) -> ScriptProfile:
+    """Classify text by writing system in one pass.
+
+    Text in any non-Latin script outranks Latin, so a user's Hindi message
+    inside an English prompt template is still detected as Hindi. The scan
+    stops once the leading script's lead can no longer be overtaken by the
+    characters that remain.
+    """
+    if text.isascii():
+        return ScriptProfile("latin", "english", 1.0 if text.strip() else 0.0,
+                             {"latin": len(text)} if text.strip() else {}, len(text))
+
+    histogram = {}
+    first_run = {}
+    scanned = 0
+    for run in _SCRIPT_RUNS.finditer(text):
+        scanned = run.end()
+        script = run.lastgroup
+        if script == "neutral":
+            continue
+        first_run.setdefault(script, run.start())
+        histogram[script] = histogram.get(script, 0) + scanned - run.start()
+        if _decided(histogram, len(text) - scanned):
+            break
+    scanned = scanned or len(text)
+
+    if "kana" in histogram and "han" in histogram:
+        histogram["kana"] += histogram.pop("han")  # Kanji in Japanese text
+    others = {script: count for script, count in histogram.items() if script != "latin"}
+    if not others:
+        return ScriptProfile("latin", "english", 1.0 if histogram else 0.0, histogram, scanned)
+
+    script = max(others, key=others.get)
+    language = SCRIPT_LANGUAGES[script]
+    if script == "devanagari":
+        sample = text[first_run[script]:first_run[script] + MARKER_SAMPLE]
+        if len(_MARATHI_WORDS.findall(sample)) > len(_HINDI_WORDS.findall(sample)):
+            language = "marathi"
+    return ScriptProfile(script, language, round(others[script] / sum(others.values()), 3), histogram, scanned)
+
+def _decided(histogram: Dict[str, int], remaining: int) -> bool:
+    """Whether the leading non-Latin script stays ahead whatever the remaining characters are"""
+    ranked = sorted(((count, script) for script, count in histogram.items() if script != "latin"), reverse=True)
+    if not ranked or ranked[0][1] == "han":
+        return False  # Nothing but Latin yet, or Kanji that kana further on would make Japanese
+    runner_up = ranked[1][0] if len(ranked) > 1 else 0
+    return ranked[0][0] > runner_up + remaining
+
+def detect_language(text: str) -> str:
+    """Language implied by the dominant script of text ("english" when there is none)"""
+    return detect_script(text or "").language
@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Any
+
+class _Call:
+    """One in-flight execution that followers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def finish(self, result=None, error: BaseException = None):
+        self.result = result
+        self.error = error
+        with self._lock:
+            self.done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_done_callback(self, callback: Callable[[], None]):
+        """Run callback once the call is done (right away if it already is)"""
+        with self._lock:
+            if not self.done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def outcome(self) -> Any:
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    async def wait_async(self, timeout: float = None) -> bool:
+        """Coroutine version of done.wait(); waiting does not hold a thread"""
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: finished.done() or finished.set_result(None))
+
+        self.add_done_callback(wake)
+        try:
+            await asyncio.wait_for(finished, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait and receive the same result, or the same
+    exception. Once the leader finishes the key is forgotten, so later calls
+    run again (caching finished results is the response cache's job).
+
+    Threads use do() and coroutines do_async() on the same instance, so a
+    request on the async server can follow one running on a worker thread
+    and the other way round.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.deduplicated = 0
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: float = None,
+           retry_if: Callable[[BaseException], bool] = None) -> Any:
+        """Run fn, or wait for the identical call already running.
+
+        A follower that is still waiting after timeout seconds raises
+        TimeoutError; the leader itself is never interrupted. When the leader
+        fails with an error retry_if accepts (e.g. the leader's own deadline
+        ran out), a follower runs fn itself instead of taking that error.
+        """
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            if not call.done.wait(_remaining(give_up_at)):
+                raise TimeoutError(f"Shared call for {key} still running after {timeout}s")
+            if not _retry(call, retry_if):
+                return call.outcome()
+
+        result = error = None
+        try:
+            result = fn()
+            return result
+        except Exception as e:
+            error = e
+            raise
+        except BaseException:
+            # KeyboardInterrupt, SystemExit or GeneratorExit belong to the leader's thread only
+            error = RuntimeError(f"Shared call for {key} was interrupted")
+            raise
+        finally:
+            # Always release the key and wake the followers, or they would wait on it forever
+            self._finish(key, call, result, error)
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]], timeout: float = None,
+                       retry_if: Callable[[BaseException], bool] = None) -> Any:
+        """Coroutine version of do(): fn returns an awaitable.
+
+        The leader's work runs as a separate task, so a caller giving up on
+        its timeout (or being cancelled) never cancels it for the others.
+        """
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                self._start(key, call, fn)
+            if not await call.wait_async(_remaining(give_up_at)):
+                raise TimeoutError(f"Shared call for {key} still running after {timeout}s")
+            if leader or not _retry(call, retry_if):
+                return call.outcome()
+
+    def _start(self, key: str, call: _Call, fn: Callable[[], Awaitable[Any]]):
+        task = asyncio.ensure_future(fn())
+
+        def finished(task: asyncio.Task):
+            if task.cancelled():
+                self._finish(key, call, error=RuntimeError(f"Shared call for {key} was cancelled"))
+            elif task.exception() is not None:
+                self._finish(key, call, error=task.exception())
+            else:
+                self._finish(key, call, task.result())
+
+        task.add_done_callback(finished)
+
+    def _join(self, key: str):
+        """(call, whether this caller leads it)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.deduplicated += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            self.executions += 1
+            return call, True
+
+    def _finish(self, key: str, call: _Call, result=None, error: BaseException = None):
+        with self._lock:
+            del self._calls[key]
+        call.finish(result, error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "deduplicated": self.deduplicated
+            }
+
+def _remaining(give_up_at: float = None):
+    return None if give_up_at is None else max(give_up_at - time.monotonic(), 0)
+
+def _retry(call: _Call, retry_if: Callable[[BaseException], bool] = None) -> bool:
+    return call.error is not None and retry_if is not None and retry_if(call.error)
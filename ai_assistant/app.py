@@ -1,20 +1,164 @@
-from flask import Flask, request, jsonify
+import json
+import os
+import time
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from agents.chat_sessions import ChatTurn
 from agents.pregnancy_assistant import create_pregnancy_assistant, get_local_assistant
+from agents.prompt_builder import PromptBuilder, estimate_tokens
+from agents.scheduler import GenerationRejected, DeadlineExceeded, DEFAULT_PRIORITY
 from services.symptom_checker import check_symptoms
 from services.emergency_escalator import escalate
-from services.pregnancy_memory import PregnancyMemory
+from services.pregnancy_memory import PregnancyMemory, SUMMARY_HEADER_LINES
+from services.transcript_extractor import extract_daily_log, low_confidence_fields, merge_llm_fields
 
 app = Flask(__name__)
 assistant_config = create_pregnancy_assistant()
 local_ai = get_local_assistant()
 memory = PregnancyMemory()  # Initialize memory system
+memory.add_save_listener(local_ai.chat_sessions.invalidate)  # A new log changes the chat context
+
+# Lifecycle of this serving process; serve.py sets "draining" on SIGTERM so
+# /readyz fails while in-flight requests finish
+SERVER_STATE = {
+    "started": time.time(),
+    "draining": False
+}
+
+# Durability of memory writes per endpoint when MEMORY_WRITE_BEHIND is on:
+# "async" returns once the log is queued, "sync" waits for the fsynced group commit
+MEMORY_DURABILITY = {
+    "guidance": os.getenv("MEMORY_DURABILITY_GUIDANCE"),
+    "voice-guidance": os.getenv("MEMORY_DURABILITY_VOICE_GUIDANCE")
+}
+
+# Endpoints (view function names) whose AI responses may be served from the response cache
+RESPONSE_CACHE_ENDPOINTS = {
+    name.strip() for name in os.getenv("RESPONSE_CACHE_ENDPOINTS", "generate_reminders,test_multilingual").split(",")
+    if name.strip()
+}
+
+# Ask the AI model for transcript fields the rule-based extractor could only partly read
+TRANSCRIPT_LLM_FALLBACK = os.getenv("TRANSCRIPT_LLM_FALLBACK", "false").lower() == "true"
+
+# What the AI model is asked for per daily log field when extracting from a transcript
+EXTRACTION_FIELD_HINTS = {
+    "mood": "(happy, anxious, tired, excited, worried, etc.)",
+    "energy_level": "(high, medium, low)",
+    "symptoms": "(array of mentioned symptoms like nausea, back pain, headache, etc.)",
+    "sleep_hours": "(number if mentioned)",
+    "water_intake": "(description if mentioned)",
+    "exercise": "(description if mentioned)",
+    "concerns": "(array of specific worries or questions mentioned)"
+}
+
+# Scheduler priority class per endpoint (view function name); others are "interactive".
+# Voice logs are "urgent" only when they carry an alert (see voice_log_priority).
+GENERATION_PRIORITY = {
+    "generate_reminders": "background",
+    "test_multilingual": "background"
+}
+
+# Latency budget in seconds per endpoint (view function name). When it runs out
+# the endpoint answers with its rule-based fallback and marks the response degraded.
+LATENCY_BUDGETS = {
+    "chat": float(os.getenv("LATENCY_BUDGET_CHAT", 3)),
+    "guidance": float(os.getenv("LATENCY_BUDGET_GUIDANCE", 10)),
+    "voice_guidance": float(os.getenv("LATENCY_BUDGET_VOICE_GUIDANCE", 10)),
+    "generate_reminders": float(os.getenv("LATENCY_BUDGET_REMINDERS", 30))
+}
+
+def request_deadline(endpoint, headers):
+    """The endpoint's latency budget as a time.monotonic() deadline, shortened by an X-Deadline-Ms header"""
+    budget = LATENCY_BUDGETS.get(endpoint)
+    header = headers.get("X-Deadline-Ms")
+    if header:
+        try:
+            caller_budget = max(float(header), 0) / 1000
+            budget = caller_budget if budget is None else min(budget, caller_budget)
+        except ValueError:
+            pass
+    return time.monotonic() + budget if budget is not None else None
+
+def voice_log_priority(symptom_check):
+    """Voice logs jump the generation queue only when the symptom check raised an alert"""
+    return "urgent" if symptom_check.get("status") == "alert" else DEFAULT_PRIORITY
+
+def endpoint_generation_options(endpoint, headers, deadline, priority=None):
+    """Cache and scheduling settings for generate_response calls made by an endpoint.
+    
+    Clients can skip the cached answer with "Cache-Control: no-cache" or
+    "X-Cache-Bypass: 1"; the fresh answer still replaces the cached one.
+    priority overrides the endpoint's class for this request.
+    """
+    bypass = ("no-cache" in headers.get("Cache-Control", "").lower()
+              or headers.get("X-Cache-Bypass") == "1")
+    return {
+        "use_cache": endpoint in RESPONSE_CACHE_ENDPOINTS,
+        "refresh_cache": bypass,
+        "priority": priority or GENERATION_PRIORITY.get(endpoint, DEFAULT_PRIORITY),
+        "deadline": deadline
+    }
+
+@app.before_request
+def start_latency_budget():
+    g.deadline = request_deadline(request.endpoint, request.headers)
+    g.degraded = False
+
+def mark_degraded():
+    g.degraded = True
+
+def response_source():
+    """Where the answer came from, for the "source" field"""
+    if g.get("degraded"):
+        return "rule-based (latency budget exceeded or queue full)"
+    return f"AI-powered ({local_ai.selected_provider})"
+
+def generation_options():
+    """Settings for the current request's generate_response calls"""
+    return endpoint_generation_options(request.endpoint, request.headers, g.get("deadline"), g.get("priority"))
+
+def check_generation_admission():
+    """Reject early, before saving anything, when the generation queue has no room for this request"""
+    local_ai.scheduler.check_admission(generation_options()["priority"])
+
+def rejection_response(error):
+    """429/503 with Retry-After for a request the generation scheduler turned away"""
+    response = jsonify({
+        "error": "The assistant is busy right now",
+        "message": str(error),
+        "retry_after": error.retry_after
+    })
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, error.status_code
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "ok", "uptime_seconds": round(time.time() - SERVER_STATE["started"], 1)})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: whether this worker should receive new traffic.
+    
+    Not ready until the AI client has finished start-up (model loaded, or
+    Ollama found unavailable and Mock AI in use), and again while draining.
+    """
+    ready = local_ai.ready.is_set() and not SERVER_STATE["draining"]
+    return jsonify({
+        "ready": ready,
+        "draining": SERVER_STATE["draining"],
+        "provider": local_ai.selected_provider,
+        "model_loaded": local_ai.model_loaded,
+        "active_generations": local_ai.scheduler.stats()["active"]
+    }), 200 if ready else 503
 
 @app.route('/monitor', methods=['POST'])
 def monitor():
     data = request.get_json()
     symptoms = data.get('symptoms', [])
+    text = data.get('text')  # Optional free text, e.g. a transcript
 
-    check = check_symptoms(symptoms)
+    check = check_symptoms(symptoms, text)
     escalate_result = escalate(check)
 
     return jsonify({
@@ -56,11 +200,15 @@ def guidance():
         user_id = data.get('user_id', 'anonymous')  # Default user ID
         language = data.get('language', None)  # Auto-detect if not specified
         
-        # Save current log to memory
-        memory.save_log(user_id, week, daily_log, user_profile)
+        check_generation_admission()
+        symptom_check, escalation = screen_daily_log(daily_log)
+        
+        # Save current log to memory; the returned snapshot carries everything we need below
+        snapshot = memory.save_log(user_id, week, daily_log, user_profile,
+                                   durability=MEMORY_DURABILITY["guidance"])
         
         # Get context from previous logs
-        context = memory.get_pregnancy_journey_summary(user_id)
+        context = snapshot.get_pregnancy_journey_summary()
         
         # Generate personalized guidance with memory and language support
         guidance_text = generate_ai_guidance_with_memory(week, daily_log, user_profile, context, language)
@@ -68,34 +216,41 @@ def guidance():
         return jsonify({
             "week": week,
             "guidance": guidance_text,
-            "source": f"AI-powered ({local_ai.selected_provider})",
+            "source": response_source(),
+            "degraded": g.degraded,
             "personalized": True,
-            "has_memory": len(memory.get_recent_logs(user_id)) > 1,
+            "has_memory": len(snapshot.get_recent_logs()) > 1,
+            "symptom_analysis": symptom_check,
+            "escalation": escalation,
             "language": local_ai.detect_language(guidance_text) if language else "auto-detected"
         })
             
+    except GenerationRejected as e:
+        return rejection_response(e)
     except Exception as e:
         return jsonify({
             "error": "Failed to generate guidance",
             "message": str(e)
         }), 500
 
-def generate_ai_guidance_with_memory(week, daily_log, user_profile, context, language=None):
-    """Generate personalized guidance using local AI with memory context and language support"""
+def build_guidance_prompt(week, daily_log, user_profile, context, language=None):
+    """Prompt and system prompt for memory-aware guidance"""
     
     # Construct a detailed prompt with memory context
     system_prompt = "You are an empathetic pregnancy health assistant providing personalized guidance. Use the context from previous logs to provide continuity and track progress."
     
-    prompt = f"""
+    builder = PromptBuilder()
+    builder.add(f"""
     A user at week {week} of pregnancy has shared their daily log.
     
     User Profile:
     - Age: {user_profile.get('age', 'not specified')}
     - First pregnancy: {user_profile.get('first_pregnancy', 'not specified')}
     - Health conditions: {user_profile.get('health_conditions', 'none specified')}
-    
-    {context}
-    
+    """)
+    # The journey summary is the part that grows; its oldest weeks go first when over budget
+    builder.add_history(context, header_lines=SUMMARY_HEADER_LINES)
+    builder.add(f"""
     Today's Log (Week {week}):
     - Mood: {daily_log.get('mood', 'not specified')}
     - Energy level: {daily_log.get('energy_level', 'not specified')}
@@ -113,11 +268,28 @@ def generate_ai_guidance_with_memory(week, daily_log, user_profile, context, lan
     5. Positive encouragement noting their progress
     
     Keep the response caring, informative, and under 200 words.
+    """)
+    
+    return build_within_budget(builder, "guidance", system_prompt, language), system_prompt
+
+def generate_ai_guidance_with_memory(week, daily_log, user_profile, context, language=None):
+    """Generate personalized guidance using local AI with memory context and language support
+    
+    Called once the daily log is saved: a scheduler rejection now degrades to
+    the rule-based answer instead of a 429/503, whose retry would save the log again.
     """
     
+    prompt, system_prompt = build_guidance_prompt(week, daily_log, user_profile, context, language)
+    
     try:
-        return local_ai.generate_response(prompt, system_prompt, context, language)
+        # The prompt already carries the context
+        return local_ai.generate_response(prompt, system_prompt, "", language, task="guidance",
+                                          **generation_options())
         
+    except (DeadlineExceeded, GenerationRejected) as e:
+        print(f"AI guidance degraded to rule-based: {e}")
+        mark_degraded()
+        return generate_fallback_guidance(week, daily_log)
     except Exception as e:
         print(f"AI guidance error: {e}")
         return generate_fallback_guidance(week, daily_log)
@@ -156,7 +328,7 @@ def generate_ai_guidance(week, daily_log, user_profile):
     """
     
     try:
-        return local_ai.generate_response(prompt, system_prompt)
+        return local_ai.generate_response(prompt, system_prompt, task="guidance")
         
     except Exception as e:
         print(f"Local AI error: {e}")
@@ -239,23 +411,14 @@ def voice_guidance():
                 "message": "Please provide a voice transcript"
             }), 400
         
-        # Extract daily log information from transcript using AI
-        daily_log = extract_daily_log_from_transcript(transcript)
-        
-        # Get context from previous logs
-        context = memory.get_pregnancy_journey_summary(user_id)
-        
-        # Save the extracted log to memory
-        memory.save_log(user_id, week, daily_log, {})
+        g.priority = voice_log_priority(check_symptoms([], transcript))
+        check_generation_admission()
+        daily_log, snapshot, symptom_check, escalation = process_voice_log(user_id, transcript, week)
+        context = snapshot.get_pregnancy_journey_summary()
         
         # Generate AI-powered guidance
         guidance_text = generate_ai_guidance_with_memory(week, daily_log, {}, context, language)
         
-        # Check for any concerning symptoms
-        symptoms = daily_log.get('symptoms', [])
-        symptom_check = check_symptoms(symptoms) if symptoms else {"severity": "normal", "recommendations": []}
-        escalation = escalate(symptom_check)
-        
         return jsonify({
             "user_id": user_id,
             "transcript": transcript,
@@ -264,61 +427,103 @@ def voice_guidance():
             "symptom_analysis": symptom_check,
             "escalation": escalation,
             "language": local_ai.detect_language(guidance_text) if language else "auto-detected",
-            "has_memory": len(memory.get_recent_logs(user_id)) > 1
+            "has_memory": len(snapshot.get_recent_logs()) > 1,
+            "degraded": g.degraded
         })
         
+    except GenerationRejected as e:
+        return rejection_response(e)
     except Exception as e:
         return jsonify({
             "error": "Failed to process voice guidance",
             "message": str(e)
         }), 500
 
-def extract_daily_log_from_transcript(transcript):
-    """Extract structured daily log information from voice transcript using AI"""
-    system_prompt = """Extract structured information from this pregnancy voice log transcript. 
-    Return a JSON-like structure with mood, energy_level, symptoms, sleep_hours, water_intake, exercise, and concerns.
+def process_voice_log(user_id, transcript, week):
+    """Extract, save and screen a voice log; returns (daily_log, snapshot, symptom_check, escalation)"""
+    # Extract daily log information from the transcript
+    daily_log = extract_daily_log_from_transcript(transcript)
+    
+    # Save the extracted log to memory; the snapshot provides the context for guidance
+    snapshot = memory.save_log(user_id, week, daily_log, {},
+                               durability=MEMORY_DURABILITY["voice-guidance"])
+    
+    # Check for any concerning symptoms, including ones only said in passing
+    symptom_check, escalation = screen_daily_log(daily_log, transcript)
+    g.priority = voice_log_priority(symptom_check)
+    
+    return daily_log, snapshot, symptom_check, escalation
+
+def screen_daily_log(daily_log, transcript=None):
+    """Symptom check and escalation for a daily log's symptoms and concerns (and the transcript it came from)"""
+    texts = [str(concern) for concern in daily_log.get('concerns') or []]
+    if transcript:
+        texts.append(transcript)
+    symptom_check = check_symptoms(daily_log.get('symptoms', []), "\n".join(texts))
+    return symptom_check, escalate(symptom_check)
+
+def prompt_budget(task, system_prompt, language="english"):
+    """Token budget left for a task's prompt once its system prompt, as sent to a user of language, is counted"""
+    return local_ai.route(task)["prompt_budget"] - estimate_tokens(local_ai.system_prompt_for(system_prompt, language))
+
+def build_within_budget(builder, task, system_prompt, language=None):
+    """Build a prompt within the task's budget.
+    
+    Without a language, the client detects it from the prompt and a
+    non-English user's system prompt gets a longer instruction, so the
+    prompt is built again within the smaller budget that leaves.
+    """
+    builder.budget = prompt_budget(task, system_prompt, language or "english")
+    built = builder.build()
+    if not language:
+        detected = local_ai.detect_language(built.text)
+        if detected != "english":
+            builder.budget = prompt_budget(task, system_prompt, detected)
+            built = builder.build()
+    return built.text
+
+def build_extraction_prompt(transcript, fields=None):
+    """Prompt and system prompt for extracting a daily log (or only the given fields) from a voice transcript"""
+    fields = fields or list(EXTRACTION_FIELD_HINTS)
+    system_prompt = f"""Extract structured information from this pregnancy voice log transcript. 
+    Return only a JSON object with the keys {", ".join(fields)}.
     Be precise and only extract information that is clearly mentioned."""
     
+    field_lines = "\n".join(f"    - {field}: {EXTRACTION_FIELD_HINTS[field]}" for field in fields)
     extraction_prompt = f"""
     Please analyze this voice transcript from a pregnant woman and extract the following information:
     
     Transcript: "{transcript}"
     
     Extract and structure this information:
-    - mood: (happy, anxious, tired, excited, worried, etc.)
-    - energy_level: (high, medium, low)
-    - symptoms: (array of mentioned symptoms like nausea, back pain, headache, etc.)
-    - sleep_hours: (number if mentioned)
-    - water_intake: (description if mentioned)
-    - exercise: (description if mentioned)
-    - concerns: (array of specific worries or questions mentioned)
+{field_lines}
     
     Only include information that is clearly stated. Use "not mentioned" for missing information.
     """
     
+    return extraction_prompt, system_prompt
+
+def extract_daily_log_from_transcript(transcript):
+    """Extract structured daily log information from a voice transcript.
+
+    The rule-based extractor reads every field; with TRANSCRIPT_LLM_FALLBACK on,
+    fields it could only partly read are asked of the AI model.
+    """
+    daily_log, confidence = extract_daily_log(transcript)
+    fields = low_confidence_fields(confidence)
+    if not TRANSCRIPT_LLM_FALLBACK or not fields:
+        return daily_log
+    
+    extraction_prompt, system_prompt = build_extraction_prompt(transcript, fields)
     try:
-        response = local_ai.generate_response(extraction_prompt, system_prompt)
-        # For now, return a basic structure with the transcript as concern
-        return {
-            "mood": "not specified",
-            "energy_level": "not specified",
-            "symptoms": [],
-            "sleep_hours": None,
-            "water_intake": "not specified",
-            "exercise": "not specified",
-            "concerns": [transcript]
-        }
+        response = local_ai.generate_response(extraction_prompt, system_prompt, task="extraction",
+                                              **generation_options())
+        return merge_llm_fields(daily_log, response, fields)
+    except GenerationRejected:
+        raise  # Surfaced to the client as 429/503
     except Exception as e:
-        return {
-            "mood": "not specified",
-            "energy_level": "not specified", 
-            "symptoms": [],
-            "sleep_hours": None,
-            "water_intake": "not specified",
-            "exercise": "not specified",
-            "concerns": [transcript],
-            "extraction_error": str(e)
-        }
+        print(f"Transcript extraction fallback failed, keeping rule-based fields: {e}")
+        return daily_log
 
 @app.route('/guidance/basic', methods=['GET'])
 def basic_guidance():
@@ -335,8 +540,9 @@ def basic_guidance():
 def get_pregnancy_history(user_id):
     """Get pregnancy history for a user"""
     try:
-        logs = memory.get_recent_logs(user_id, limit=10)
-        profile = memory.get_user_profile(user_id)
+        snapshot = memory.load_snapshot(user_id)
+        logs = snapshot.get_recent_logs(limit=10)
+        profile = snapshot.get_user_profile()
         
         return jsonify({
             "user_id": user_id,
@@ -350,6 +556,22 @@ def get_pregnancy_history(user_id):
             "message": str(e)
         }), 500
 
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """Runtime counters for monitoring"""
+    return jsonify({
+        "memory_cache": memory.cache_stats(),
+        "memory_write_queue": memory.write_queue_stats(),
+        "ollama_connections": local_ai.connection_stats(),
+        "ollama_health": local_ai.health_stats(),
+        "streams": local_ai.stream_stats(),
+        "prompts": local_ai.prompt_stats(),
+        "chat_sessions": local_ai.chat_sessions.stats(),
+        "response_cache": local_ai.response_cache.stats(),
+        "single_flight": local_ai.single_flight.stats(),
+        "generation_queue": local_ai.scheduler.stats()
+    })
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """
@@ -375,20 +597,24 @@ def chat():
             }), 400
         
         # Get user's pregnancy context from memory
-        context = memory.get_pregnancy_journey_summary(user_id)
-        recent_logs = memory.get_recent_logs(user_id, limit=3)
+        snapshot = memory.load_snapshot(user_id)
+        context = snapshot.get_pregnancy_journey_summary()
+        recent_logs = snapshot.get_recent_logs(limit=3)
         
         # Generate contextual chat response
-        guidance_text = generate_chat_response(message, context, recent_logs, language)
+        guidance_text = generate_chat_response(message, context, recent_logs, language, user_id)
         
         return jsonify({
             "guidance": guidance_text,
-            "source": f"AI-powered ({local_ai.selected_provider})",
+            "source": response_source(),
+            "degraded": g.degraded,
             "has_memory": len(recent_logs) > 0,
             "language": local_ai.detect_language(guidance_text) if language else "auto-detected",
             "user_id": user_id
         })
         
+    except GenerationRejected as e:
+        return rejection_response(e)
     except Exception as e:
         print(f"Chat error: {str(e)}")
         return jsonify({
@@ -397,8 +623,8 @@ def chat():
             "message": str(e)
         }), 500
 
-def generate_chat_response(message, context, recent_logs, language=None):
-    """Generate contextual chat response using AI with pregnancy context"""
+def build_chat_prompt(message, context, recent_logs, language=None):
+    """Prompt and system prompt for a chat message with pregnancy context"""
     
     system_prompt = """You are a caring and knowledgeable pregnancy health assistant. 
     Provide helpful, empathetic responses to pregnancy-related questions. 
@@ -406,26 +632,38 @@ def generate_chat_response(message, context, recent_logs, language=None):
     Keep responses concise but informative."""
     
     # Build context from user's pregnancy journey
-    context_info = ""
+    builder = PromptBuilder()
     if context and context.strip():
-        context_info = f"\nUser's pregnancy context: {context}"
-    
-    if recent_logs:
-        context_info += "\nRecent activity: "
+        builder.add_history(context, "User's pregnancy context:", header_lines=SUMMARY_HEADER_LINES)
+    elif recent_logs:
+        # The journey summary already lists the recent logs; without it, name the last two
+        activity = ""
         for log in recent_logs[-2:]:  # Last 2 logs
             week = log.get('week', 'Unknown')
             mood = log.get('daily_log', {}).get('mood', 'not specified')
             symptoms = log.get('daily_log', {}).get('symptoms', [])
-            context_info += f"Week {week} - Mood: {mood}, Symptoms: {', '.join(symptoms) if symptoms else 'none'}. "
-    
-    full_prompt = f"""
-    {context_info}
+            activity += f"Week {week} - Mood: {mood}, Symptoms: {', '.join(symptoms) if symptoms else 'none'}. "
+        builder.add(activity, "Recent activity:")
     
+    builder.add(f"""
     User's question: {message}
     
     Please provide a helpful, empathetic response. If this seems like a medical concern, 
     recommend consulting a healthcare provider. Keep the response under 150 words.
-    """
+    """)
+    
+    return build_within_budget(builder, "chat", system_prompt, language), system_prompt
+
+def chat_turn(user_id, message, context):
+    """Chat session turn for a user, so follow-ups only send the new message; None for anonymous users"""
+    if not user_id or user_id == 'anonymous':
+        return None  # Different people share this id
+    return ChatTurn(user_id, message, context)
+
+def generate_chat_response(message, context, recent_logs, language=None, user_id=None):
+    """Generate contextual chat response using AI with pregnancy context"""
+    
+    full_prompt, system_prompt = build_chat_prompt(message, context, recent_logs, language)
     
     try:
         # Generate AI response with context
@@ -433,11 +671,20 @@ def generate_chat_response(message, context, recent_logs, language=None):
             prompt=full_prompt,
             system_prompt=system_prompt,
             context="",
-            user_language=language
+            user_language=language,
+            task="chat",
+            chat_turn=chat_turn(user_id, message, context),
+            **generation_options()
         )
         
         return response.strip()
         
+    except DeadlineExceeded as e:
+        print(f"Chat degraded to rule-based: {e}")
+        mark_degraded()
+        return local_ai.fallback_response(message, language)
+    except GenerationRejected:
+        raise  # Surfaced to the client as 429/503
     except Exception as e:
         print(f"AI generation error: {str(e)}")
         # Fallback response
@@ -580,8 +827,8 @@ def parse_ai_reminders_response(ai_response, symptoms, conditions):
     
     return reminders[:5]
 
-def generate_personalized_reminders(voice_logs, user_profile, user_id):
-    """Generate personalized weekly reminders using AI analysis"""
+def build_reminders_prompt(voice_logs, user_profile):
+    """Prompt for weekly reminders; returns (prompt, system_prompt, symptoms, conditions, pregnancy_week)"""
     
     # Extract symptoms and concerns from voice logs
     all_symptoms = []
@@ -647,13 +894,22 @@ def generate_personalized_reminders(voice_logs, user_profile, user_id):
     - "Schedule weekly prenatal checkup"
     """
     
+    return prompt, system_prompt, all_symptoms, conditions, pregnancy_week
+
+def generate_personalized_reminders(voice_logs, user_profile, user_id):
+    """Generate personalized weekly reminders using AI analysis"""
+    
+    prompt, system_prompt, all_symptoms, conditions, pregnancy_week = build_reminders_prompt(voice_logs, user_profile)
+    
     try:
         # Generate AI response
         ai_response = local_ai.generate_response(
             prompt=prompt,
             system_prompt=system_prompt,
             context="",
-            user_language=None
+            user_language=None,
+            task="reminders",
+            **generation_options()
         )
         
         # Parse AI response into structured reminders
@@ -661,6 +917,12 @@ def generate_personalized_reminders(voice_logs, user_profile, user_id):
         
         return reminders
         
+    except DeadlineExceeded as e:
+        print(f"Reminders degraded to defaults: {e}")
+        mark_degraded()
+        return get_default_reminders_for_symptoms(all_symptoms, conditions, pregnancy_week)
+    except GenerationRejected:
+        raise  # Surfaced to the client as 429/503
     except Exception as e:
         print(f"AI reminder generation error: {str(e)}")
         return get_default_reminders_for_symptoms(all_symptoms, conditions, pregnancy_week)
@@ -710,9 +972,12 @@ def generate_reminders():
             "user_id": user_id,
             "week_generated": user_profile.get('pregnancy_week', 20),
             "based_on_logs": len(voice_logs),
-            "ai_confidence": "high"
+            "ai_confidence": "low" if g.degraded else "high",
+            "degraded": g.degraded
         })
         
+    except GenerationRejected as e:
+        return rejection_response(e)
     except Exception as e:
         print(f"Reminder generation error: {str(e)}")
         return jsonify({
@@ -721,7 +986,186 @@ def generate_reminders():
             "message": str(e)
         }), 500
 
-# The rest of the code remains unchanged.
+def sse_event(data, event=None):
+    """Format one server-sent event"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_ai_response(endpoint, started, meta, task, prompt, system_prompt, context="", language=None,
+                       chat_turn=None, fallback=None):
+    """Relay a streamed AI response as server-sent events.
+    
+    Events: "meta" (request info), unnamed data events with {"token": ...},
+    then "done" with the full text and timings, or "error". When the client
+    disconnects the generator is closed, which closes the Ollama request.
+    
+    Endpoints that already saved a log pass fallback: a scheduler rejection
+    then streams its rule-based answer, marked degraded, instead of a 429/503.
+    """
+    # Admission happens here, so a full queue still becomes a 429/503 instead of a broken stream
+    degraded = False
+    try:
+        tokens = local_ai.stream_response(prompt, system_prompt, context, language,
+                                          priority=generation_options()["priority"], task=task, chat_turn=chat_turn)
+    except GenerationRejected as e:
+        if fallback is None:
+            raise
+        print(f"{endpoint} degraded to rule-based: {e}")
+        tokens = (text for text in [fallback()])
+        degraded = True
+    
+    def generate():
+        yield sse_event(meta, "meta")
+        
+        parts = []
+        first_token_ms = None
+        try:
+            for token in tokens:
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+                    print(f"⚡ {endpoint}: first token after {first_token_ms} ms")
+                parts.append(token)
+                yield sse_event({"token": token})
+        except Exception as e:
+            print(f"Streaming error on {endpoint}: {e}")
+            yield sse_event({"message": str(e)}, "error")
+            return
+        
+        text = "".join(parts).strip()
+        yield sse_event({
+            "guidance": text,
+            "source": "rule-based (latency budget exceeded or queue full)" if degraded else f"AI-powered ({local_ai.selected_provider})",
+            "degraded": degraded,
+            "language": local_ai.detect_language(text) if language else "auto-detected",
+            "time_to_first_token_ms": first_token_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        }, "done")
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Don't let proxies buffer tokens
+    )
+    response.call_on_close(tokens.close)  # Frees the scheduler slot even if generate() never ran
+    return response
+
+@app.route('/guidance/stream', methods=['POST'])
+def guidance_stream():
+    """Streaming variant of /guidance; same JSON input, responds with server-sent events"""
+    started = time.perf_counter()
+    try:
+        data = request.get_json()
+        week = data.get('week', 20)
+        daily_log = data.get('daily_log', {})
+        user_profile = data.get('user_profile', {})
+        user_id = data.get('user_id', 'anonymous')
+        language = data.get('language', None)
+        
+        check_generation_admission()
+        symptom_check, escalation = screen_daily_log(daily_log)
+        snapshot = memory.save_log(user_id, week, daily_log, user_profile,
+                                   durability=MEMORY_DURABILITY["guidance"])
+        context = snapshot.get_pregnancy_journey_summary()
+        prompt, system_prompt = build_guidance_prompt(week, daily_log, user_profile, context, language)
+        
+        meta = {
+            "week": week,
+            "personalized": True,
+            "has_memory": len(snapshot.get_recent_logs()) > 1,
+            "symptom_analysis": symptom_check,
+            "escalation": escalation
+        }
+        return stream_ai_response('/guidance/stream', started, meta, "guidance", prompt, system_prompt, "", language,
+                                  fallback=lambda: generate_fallback_guidance(week, daily_log))
+        
+    except GenerationRejected as e:
+        return rejection_response(e)
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to generate guidance",
+            "message": str(e)
+        }), 500
+
+@app.route('/voice-guidance/stream', methods=['POST'])
+def voice_guidance_stream():
+    """Streaming variant of /voice-guidance; symptom analysis is sent before the guidance tokens"""
+    started = time.perf_counter()
+    try:
+        data = request.get_json()
+        transcript = data.get('transcript', '')
+        user_id = data.get('user_id', 'anonymous')
+        language = data.get('language', None)
+        week = data.get('week', 20)
+        
+        if not transcript:
+            return jsonify({
+                "error": "Transcript is required",
+                "message": "Please provide a voice transcript"
+            }), 400
+        
+        g.priority = voice_log_priority(check_symptoms([], transcript))
+        check_generation_admission()
+        daily_log, snapshot, symptom_check, escalation = process_voice_log(user_id, transcript, week)
+        context = snapshot.get_pregnancy_journey_summary()
+        prompt, system_prompt = build_guidance_prompt(week, daily_log, {}, context, language)
+        
+        meta = {
+            "user_id": user_id,
+            "transcript": transcript,
+            "extracted_info": daily_log,
+            "symptom_analysis": symptom_check,
+            "escalation": escalation,
+            "has_memory": len(snapshot.get_recent_logs()) > 1
+        }
+        return stream_ai_response('/voice-guidance/stream', started, meta, "guidance", prompt, system_prompt, "", language,
+                                  fallback=lambda: generate_fallback_guidance(week, daily_log))
+        
+    except GenerationRejected as e:
+        return rejection_response(e)
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to process voice guidance",
+            "message": str(e)
+        }), 500
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming variant of /chat; same JSON input, responds with server-sent events"""
+    started = time.perf_counter()
+    try:
+        data = request.get_json()
+        user_id = data.get('user_id', 'anonymous')
+        message = data.get('message', '')
+        language = data.get('language', None)
+        
+        if not message.strip():
+            return jsonify({
+                "error": "Message is required",
+                "guidance": "Please provide a message to get assistance."
+            }), 400
+        
+        snapshot = memory.load_snapshot(user_id)
+        context = snapshot.get_pregnancy_journey_summary()
+        recent_logs = snapshot.get_recent_logs(limit=3)
+        full_prompt, system_prompt = build_chat_prompt(message, context, recent_logs, language)
+        
+        meta = {
+            "user_id": user_id,
+            "has_memory": len(recent_logs) > 0
+        }
+        return stream_ai_response('/chat/stream', started, meta, "chat", full_prompt, system_prompt, "", language,
+                                  chat_turn(user_id, message, context))
+        
+    except GenerationRejected as e:
+        return rejection_response(e)
+    except Exception as e:
+        print(f"Chat error: {str(e)}")
+        return jsonify({
+            "error": "Failed to generate chat response",
+            "message": str(e)
+        }), 500
+
+@app.route('/test/multilingual', methods=['POST'])
 def test_multilingual():
     """Test endpoint for multilingual support"""
     try:
@@ -733,7 +1177,7 @@ def test_multilingual():
         
         # Generate response
         system_prompt = "You are a caring pregnancy health assistant."
-        response = local_ai.generate_response(text, system_prompt, "", detected_lang)
+        response = local_ai.generate_response(text, system_prompt, "", detected_lang, **generation_options())
         
         return jsonify({
             "input_text": text,
@@ -742,6 +1186,8 @@ def test_multilingual():
             "supported_languages": list(local_ai.supported_languages.keys())
         })
         
+    except GenerationRejected as e:
+        return rejection_response(e)
     except Exception as e:
         return jsonify({
             "error": "Multilingual test failed",
@@ -761,9 +1207,11 @@ if __name__ == '__main__':
     print("  POST /guidance - AI-powered pregnancy guidance with memory")
     print("  POST /voice-guidance - Process voice logs and provide AI guidance")
     print("  POST /chat - Conversational AI assistant for pregnancy questions") 
+    print("  POST /guidance/stream, /voice-guidance/stream, /chat/stream - Token streaming (server-sent events)")
     print("  POST /generate-reminders - Generate personalized weekly reminders")
     print()
     
     # Start the server on port 5002 to avoid conflict with Node.js backend
+    # (development server; use serve.py in production)
     print("Starting server on http://localhost:5002")
     app.run(debug=True, host='0.0.0.0', port=5002)
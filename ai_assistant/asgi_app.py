@@ -0,0 +1,318 @@
+"""Async (ASGI) server for the pregnancy assistant.
+
+Serves the main routes of app.py with the same request and response format,
+but each waiting request is a coroutine instead of a thread: Ollama is called
+through httpx, and memory reads/writes run in worker threads. Prompts,
+fallbacks, caches, the circuit breaker and the generation scheduler are shared
+with app.py.
+
+    pip install -r requirements-async.txt
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5002
+"""
+import asyncio
+import contextlib
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from agents.async_client import AsyncLocalAIClient
+from agents.scheduler import GenerationRejected, DeadlineExceeded
+from services.symptom_checker import check_symptoms
+from services.emergency_escalator import escalate
+from services.transcript_extractor import extract_daily_log, low_confidence_fields, merge_llm_fields
+from app import (
+    local_ai, memory, MEMORY_DURABILITY, screen_daily_log, chat_turn,
+    request_deadline, endpoint_generation_options, voice_log_priority,
+    build_guidance_prompt, build_chat_prompt, build_extraction_prompt, build_reminders_prompt,
+    TRANSCRIPT_LLM_FALLBACK, generate_fallback_guidance, parse_ai_reminders_response,
+    get_default_reminders, get_default_reminders_for_symptoms
+)
+
+ai = AsyncLocalAIClient(local_ai)
+
+def generation_options(endpoint, request: Request, priority=None):
+    """Cache, priority and deadline for an endpoint, with the deadline starting now"""
+    return endpoint_generation_options(endpoint, request.headers, request_deadline(endpoint, request.headers),
+                                       priority)
+
+def rejection_response(error):
+    """429/503 with Retry-After for a request the generation scheduler turned away"""
+    return JSONResponse({
+        "error": "The assistant is busy right now",
+        "message": str(error),
+        "retry_after": error.retry_after
+    }, status_code=error.status_code, headers={"Retry-After": str(error.retry_after)})
+
+async def generate(options, task, fallback, prompt, system_prompt, context="", language=None, turn=None,
+                   saved=False):
+    """Generate with the endpoint's options and the task's model route; returns (text, degraded)
+
+    With saved (the request's log is already stored) a scheduler rejection
+    degrades to the fallback as well, so the client has no reason to retry
+    and save the log twice.
+    """
+    try:
+        text = await ai.generate_response(prompt, system_prompt, context, language, task=task, chat_turn=turn,
+                                          **options)
+        return text, False
+    except DeadlineExceeded as e:
+        print(f"Generation degraded to rule-based: {e}")
+        return fallback(), True
+    except GenerationRejected as e:
+        if not saved:
+            raise
+        print(f"Generation degraded to rule-based: {e}")
+        return fallback(), True
+    except Exception as e:
+        print(f"AI generation error: {e}")
+        return fallback(), False
+
+def source(degraded):
+    if degraded:
+        return "rule-based (latency budget exceeded or queue full)"
+    return f"AI-powered ({ai.selected_provider})"
+
+async def monitor(request: Request):
+    data = await request.json()
+    symptoms = data.get('symptoms', [])
+    text = data.get('text')
+
+    check = check_symptoms(symptoms, text)
+    escalate_result = escalate(check)
+
+    return JSONResponse({
+        "check": check,
+        "escalation": escalate_result
+    })
+
+async def guidance(request: Request):
+    """Async variant of app.guidance"""
+    try:
+        data = await request.json()
+        week = data.get('week', 20)
+        daily_log = data.get('daily_log', {})
+        user_profile = data.get('user_profile', {})
+        user_id = data.get('user_id', 'anonymous')
+        language = data.get('language', None)
+
+        options = generation_options("guidance", request)
+        local_ai.scheduler.check_admission(options["priority"])
+        symptom_check, escalation = screen_daily_log(daily_log)
+        snapshot = await asyncio.to_thread(memory.save_log, user_id, week, daily_log, user_profile,
+                                           durability=MEMORY_DURABILITY["guidance"])
+        context = snapshot.get_pregnancy_journey_summary()
+
+        prompt, system_prompt = build_guidance_prompt(week, daily_log, user_profile, context, language)
+        guidance_text, degraded = await generate(options, "guidance", lambda: generate_fallback_guidance(week, daily_log),
+                                                 prompt, system_prompt, "", language, saved=True)
+
+        return JSONResponse({
+            "week": week,
+            "guidance": guidance_text,
+            "source": source(degraded),
+            "degraded": degraded,
+            "personalized": True,
+            "has_memory": len(snapshot.get_recent_logs()) > 1,
+            "symptom_analysis": symptom_check,
+            "escalation": escalation,
+            "language": ai.detect_language(guidance_text) if language else "auto-detected"
+        })
+
+    except GenerationRejected as e:
+        return rejection_response(e)
+    except Exception as e:
+        return JSONResponse({
+            "error": "Failed to generate guidance",
+            "message": str(e)
+        }, status_code=500)
+
+async def voice_guidance(request: Request):
+    """Async variant of app.voice_guidance"""
+    try:
+        data = await request.json()
+        transcript = data.get('transcript', '')
+        user_id = data.get('user_id', 'anonymous')
+        language = data.get('language', None)
+        week = data.get('week', 20)
+
+        if not transcript:
+            return JSONResponse({
+                "error": "Transcript is required",
+                "message": "Please provide a voice transcript"
+            }, status_code=400)
+
+        options = generation_options("voice_guidance", request, voice_log_priority(check_symptoms([], transcript)))
+        local_ai.scheduler.check_admission(options["priority"])
+
+        daily_log, confidence = extract_daily_log(transcript)
+        fields = low_confidence_fields(confidence)
+        if TRANSCRIPT_LLM_FALLBACK and fields:
+            extraction_prompt, extraction_system = build_extraction_prompt(transcript, fields)
+            response, _ = await generate(options, "extraction", lambda: "", extraction_prompt, extraction_system)
+            daily_log = merge_llm_fields(daily_log, response, fields)
+
+        snapshot = await asyncio.to_thread(memory.save_log, user_id, week, daily_log, {},
+                                           durability=MEMORY_DURABILITY["voice-guidance"])
+        context = snapshot.get_pregnancy_journey_summary()
+
+        symptom_check, escalation = screen_daily_log(daily_log, transcript)
+        options["priority"] = voice_log_priority(symptom_check)
+
+        prompt, system_prompt = build_guidance_prompt(week, daily_log, {}, context, language)
+        guidance_text, degraded = await generate(options, "guidance", lambda: generate_fallback_guidance(week, daily_log),
+                                                 prompt, system_prompt, "", language, saved=True)
+
+        return JSONResponse({
+            "user_id": user_id,
+            "transcript": transcript,
+            "extracted_info": daily_log,
+            "guidance": guidance_text,
+            "symptom_analysis": symptom_check,
+            "escalation": escalation,
+            "language": ai.detect_language(guidance_text) if language else "auto-detected",
+            "has_memory": len(snapshot.get_recent_logs()) > 1,
+            "degraded": degraded
+        })
+
+    except GenerationRejected as e:
+        return rejection_response(e)
+    except Exception as e:
+        return JSONResponse({
+            "error": "Failed to process voice guidance",
+            "message": str(e)
+        }, status_code=500)
+
+async def chat(request: Request):
+    """Async variant of app.chat"""
+    try:
+        data = await request.json()
+        user_id = data.get('user_id', 'anonymous')
+        message = data.get('message', '')
+        language = data.get('language', None)
+
+        if not message.strip():
+            return JSONResponse({
+                "error": "Message is required",
+                "guidance": "Please provide a message to get assistance."
+            }, status_code=400)
+
+        snapshot = await asyncio.to_thread(memory.load_snapshot, user_id)
+        context = snapshot.get_pregnancy_journey_summary()
+        recent_logs = snapshot.get_recent_logs(limit=3)
+        full_prompt, system_prompt = build_chat_prompt(message, context, recent_logs, language)
+
+        guidance_text, degraded = await generate(generation_options("chat", request), "chat",
+                                                 lambda: ai.fallback_response(message, language),
+                                                 full_prompt, system_prompt, "", language,
+                                                 chat_turn(user_id, message, context))
+
+        return JSONResponse({
+            "guidance": guidance_text.strip(),
+            "source": source(degraded),
+            "degraded": degraded,
+            "has_memory": len(recent_logs) > 0,
+            "language": ai.detect_language(guidance_text) if language else "auto-detected",
+            "user_id": user_id
+        })
+
+    except GenerationRejected as e:
+        return rejection_response(e)
+    except Exception as e:
+        print(f"Chat error: {str(e)}")
+        return JSONResponse({
+            "error": "Failed to generate chat response",
+            "guidance": "I apologize, but I'm having trouble processing your message right now. Please try again or contact your healthcare provider if you have urgent concerns.",
+            "message": str(e)
+        }, status_code=500)
+
+async def generate_reminders(request: Request):
+    """Async variant of app.generate_reminders"""
+    try:
+        data = await request.json()
+        user_id = data.get('user_id', 'anonymous')
+        voice_logs = data.get('voice_logs', [])
+        user_profile = data.get('user_profile', {})
+
+        if not voice_logs:
+            return JSONResponse({
+                "error": "No voice logs provided",
+                "reminders": [],
+                "compliance_percentage": 0
+            }, status_code=400)
+
+        prompt, system_prompt, symptoms, conditions, pregnancy_week = build_reminders_prompt(voice_logs, user_profile)
+        ai_response, degraded = await generate(generation_options("generate_reminders", request), "reminders",
+                                               lambda: None, prompt, system_prompt)
+        if ai_response is None:
+            reminders = get_default_reminders_for_symptoms(symptoms, conditions, pregnancy_week)
+        else:
+            reminders = parse_ai_reminders_response(ai_response, symptoms, conditions)
+
+        return JSONResponse({
+            "reminders": reminders,
+            "user_id": user_id,
+            "week_generated": user_profile.get('pregnancy_week', 20),
+            "based_on_logs": len(voice_logs),
+            "ai_confidence": "low" if degraded else "high",
+            "degraded": degraded
+        })
+
+    except GenerationRejected as e:
+        return rejection_response(e)
+    except Exception as e:
+        print(f"Reminder generation error: {str(e)}")
+        return JSONResponse({
+            "error": "Failed to generate reminders",
+            "reminders": get_default_reminders(),
+            "message": str(e)
+        }, status_code=500)
+
+async def get_pregnancy_history(request: Request):
+    """Get pregnancy history for a user"""
+    user_id = request.path_params["user_id"]
+    try:
+        snapshot = await asyncio.to_thread(memory.load_snapshot, user_id)
+        logs = snapshot.get_recent_logs(limit=10)
+
+        return JSONResponse({
+            "user_id": user_id,
+            "user_profile": snapshot.get_user_profile(),
+            "logs": logs,
+            "total_logs": len(logs)
+        })
+    except Exception as e:
+        return JSONResponse({
+            "error": "Failed to retrieve history",
+            "message": str(e)
+        }, status_code=500)
+
+async def get_stats(request: Request):
+    """Runtime counters for monitoring"""
+    return JSONResponse({
+        "memory_cache": memory.cache_stats(),
+        "memory_write_queue": memory.write_queue_stats(),
+        "ollama_health": local_ai.health_stats(),
+        "prompts": local_ai.prompt_stats(),
+        "chat_sessions": local_ai.chat_sessions.stats(),
+        "response_cache": local_ai.response_cache.stats(),
+        "single_flight": local_ai.single_flight.stats(),
+        "generation_queue": local_ai.scheduler.stats()
+    })
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    await ai.aclose()
+    await asyncio.to_thread(memory.close)
+
+app = Starlette(routes=[
+    Route('/monitor', monitor, methods=['POST']),
+    Route('/guidance', guidance, methods=['POST']),
+    Route('/voice-guidance', voice_guidance, methods=['POST']),
+    Route('/chat', chat, methods=['POST']),
+    Route('/generate-reminders', generate_reminders, methods=['POST']),
+    Route('/history/{user_id}', get_pregnancy_history, methods=['GET']),
+    Route('/stats', get_stats, methods=['GET'])
+], lifespan=lifespan)
@@ -0,0 +1,77 @@
+"""Production entry point: the Flask app behind gunicorn with preforked workers.
+
+    pip install -r requirements-serve.txt
+    python serve.py
+
+Settings (environment):
+    HOST, PORT           Bind address (default 0.0.0.0:5002)
+    WEB_CONCURRENCY      Worker processes (default 2)
+    WORKER_THREADS       Request threads per worker (default 8)
+    GRACEFUL_TIMEOUT     Seconds in-flight requests get to finish on SIGTERM (default 90)
+    WORKER_TIMEOUT       Seconds before a silent worker is restarted (default 120)
+
+The app is not preloaded: every worker imports app.py after the fork, so the
+Ollama client, its health monitor thread and the memory write-behind queue
+are created once per worker. On SIGTERM a worker fails /readyz, stops
+accepting connections, finishes its in-flight generations and then drains
+queued memory writes before exiting.
+"""
+import os
+import signal
+
+from gunicorn.app.base import BaseApplication
+
+# An Ollama generation may take up to OLLAMA_TIMEOUT (60s); let it finish when draining
+DEFAULT_GRACEFUL_TIMEOUT = 90
+DEFAULT_WORKER_TIMEOUT = 120
+
+def post_worker_init(worker):
+    """Mark the worker as draining before gunicorn's own SIGTERM handling"""
+    from app import SERVER_STATE
+
+    def drain(sig, frame):
+        SERVER_STATE["draining"] = True
+        print(f"🛑 Worker {worker.pid} draining in-flight requests")
+        worker.handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, drain)
+    signal.siginterrupt(signal.SIGTERM, False)
+
+def worker_exit(server, worker):
+    """Flush memory writes and stop background threads once the worker has drained"""
+    from app import local_ai, memory
+    memory.close()
+    local_ai.close()
+    print(f"👋 Worker {worker.pid} stopped")
+
+class PregnancyAssistantServer(BaseApplication):
+    def __init__(self, options=None):
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import app
+        return app
+
+def server_options():
+    return {
+        "bind": f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5002')}",
+        "workers": int(os.getenv("WEB_CONCURRENCY", 2)),
+        "threads": int(os.getenv("WORKER_THREADS", 8)),
+        "worker_class": "gthread",
+        "preload_app": False,
+        "graceful_timeout": int(os.getenv("GRACEFUL_TIMEOUT", DEFAULT_GRACEFUL_TIMEOUT)),
+        "timeout": int(os.getenv("WORKER_TIMEOUT", DEFAULT_WORKER_TIMEOUT)),
+        "post_worker_init": post_worker_init,
+        "worker_exit": worker_exit
+    }
+
+if __name__ == "__main__":
+    options = server_options()
+    print("🏥 Pregnancy Health Assistant API (production)")
+    print(f"Starting {options['workers']} worker(s) x {options['threads']} thread(s) on http://{options['bind']}")
+    PregnancyAssistantServer(options).run()
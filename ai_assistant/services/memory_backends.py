@@ -0,0 +1,628 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+TAIL_BLOCK_SIZE = 8192  # Bytes read per backward step when tailing a JSONL file
+SQLITE_STATEMENT_CACHE_SIZE = 64  # Prepared statements kept per SQLite connection
+STALE_TEMP_FILE_SECONDS = 60  # Temp files older than this were left by a crashed writer
+TEMP_FILE_PREFIXES = ("user_", "summary_")  # Every file _atomic_write replaces in a data directory
+
+class MemoryBackend:
+    """Storage interface behind PregnancyMemory.
+
+    A backend persists log entries, the merged user profile and the
+    materialized journey summary state, and answers the reads PregnancyMemory
+    needs: the most recent logs, the profile and the stored summary.
+    state_signature() must change whenever a user's data changes; it is what
+    the snapshot cache validates against.
+
+    lock_user() serializes writers for one user across threads and processes
+    through an advisory lock file, so several workers can share a data
+    directory. It is re-entrant within a thread.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._held_locks = threading.local()
+
+    def get_lock_file(self, user_id: str) -> str:
+        """Path of the advisory lock file guarding a user's data"""
+        raise NotImplementedError
+
+    @contextmanager
+    def lock_user(self, user_id: str):
+        """Hold the user's exclusive write lock for the duration of the block"""
+        held = getattr(self._held_locks, "users", None)
+        if held is None:
+            held = self._held_locks.users = {}
+
+        if user_id in held:
+            held[user_id] += 1
+            try:
+                yield
+            finally:
+                held[user_id] -= 1
+            return
+
+        with _exclusive_file_lock(self.get_lock_file(user_id)):
+            held[user_id] = 1
+            try:
+                yield
+            finally:
+                del held[user_id]
+
+    def append_log(self, user_id: str, log_entry: Dict, user_profile: Optional[Dict] = None,
+                   summary_state: Optional[Dict] = None):
+        """Persist a log entry, plus the merged profile when it changed and the updated summary"""
+        self.append_logs(user_id, [(log_entry, user_profile)], summary_state=summary_state)
+
+    def append_logs(self, user_id: str, writes: List[Tuple[Dict, Optional[Dict]]], fsync: bool = False,
+                    summary_state: Optional[Dict] = None):
+        """Persist several (log_entry, user_profile) writes for one user as a group commit.
+
+        summary_state is the journey summary after the last write. With
+        fsync=True the data is on stable storage when this returns.
+        """
+        raise NotImplementedError
+
+    def read_recent_logs(self, user_id: str, limit: int) -> List[Dict]:
+        """Return up to `limit` most recent log entries, oldest first"""
+        raise NotImplementedError
+
+    def read_profile(self, user_id: str) -> Dict:
+        """Return the merged user profile"""
+        raise NotImplementedError
+
+    def read_summary(self, user_id: str) -> Optional[Dict]:
+        """Return the stored journey summary state, if any"""
+        return None
+
+    def read_snapshot(self, user_id: str, limit: int) -> Tuple[Dict, List[Dict], Optional[Dict]]:
+        """Return (profile, recent logs, summary state) for a user"""
+        return self.read_profile(user_id), self.read_recent_logs(user_id, limit), self.read_summary(user_id)
+
+    def state_signature(self, user_id: str) -> tuple:
+        """Cheap token that changes whenever the user's stored data changes"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the backend"""
+        pass
+
+class FileBackend(MemoryBackend):
+    """Base for the per-user file layouts under a data directory"""
+
+    def __init__(self, data_dir: str):
+        super().__init__()
+        self.data_dir = data_dir
+        os.makedirs(os.path.join(data_dir, "locks"), exist_ok=True)
+        _remove_stale_temp_files(data_dir)
+
+    def get_user_file(self, user_id: str) -> str:
+        """Get the file path for a user's single-document (legacy) log file"""
+        return os.path.join(self.data_dir, f"user_{user_id}.json")
+
+    def get_lock_file(self, user_id: str) -> str:
+        return os.path.join(self.data_dir, "locks", f"user_{user_id}.lock")
+
+class JSONFileBackend(FileBackend):
+    """The original layout: one user_<id>.json document rewritten on every save"""
+
+    name = "json"
+
+    def append_logs(self, user_id: str, writes: List[Tuple[Dict, Optional[Dict]]], fsync: bool = False,
+                    summary_state: Optional[Dict] = None):
+        with self.lock_user(user_id):
+            data = self._load_document(user_id, repair=True)
+            for log_entry, user_profile in writes:
+                data["logs"].append(log_entry)
+                if user_profile is not None:
+                    data["user_profile"] = user_profile
+            if summary_state is not None:
+                data["journey_summary"] = summary_state
+
+            # The temp file is always fsynced before the rename
+            _atomic_write(self.get_user_file(user_id), json.dumps(data, indent=2, ensure_ascii=False))
+
+    def read_recent_logs(self, user_id: str, limit: int) -> List[Dict]:
+        logs = self._load_document(user_id)["logs"]
+        return logs[-limit:] if logs else []
+
+    def read_profile(self, user_id: str) -> Dict:
+        return self._load_document(user_id).get("user_profile", {})
+
+    def read_summary(self, user_id: str) -> Optional[Dict]:
+        return self._load_document(user_id).get("journey_summary")
+
+    def read_snapshot(self, user_id: str, limit: int) -> Tuple[Dict, List[Dict], Optional[Dict]]:
+        data = self._load_document(user_id)
+        return data.get("user_profile", {}), data["logs"][-limit:], data.get("journey_summary")
+
+    def state_signature(self, user_id: str) -> tuple:
+        return (_file_signature(self.get_user_file(user_id)),)
+
+    def _load_document(self, user_id: str, repair: bool = False) -> Dict:
+        """Load a user's document; an unreadable file is treated as empty.
+
+        Files written by this backend are always complete, but one truncated by
+        the old in-place writer cannot be parsed. With repair=True (callers
+        holding the user lock) it is moved aside as user_<id>.json.corrupt-<ts>
+        so the next save starts a fresh document.
+        """
+        file_path = self.get_user_file(user_id)
+
+        if not os.path.exists(file_path):
+            return {"user_profile": {}, "logs": []}
+
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            print(f"⚠️  Unreadable memory file {file_path}: {e}")
+            if repair:
+                os.replace(file_path, f"{file_path}.corrupt-{int(time.time())}")
+            return {"user_profile": {}, "logs": []}
+
+class JSONLFileBackend(FileBackend):
+    """Append-only layout.
+
+    Each log entry is one line in user_<id>.jsonl and every profile change is
+    one line in user_<id>.profile.jsonl holding the merged profile, so a write
+    costs the same no matter how long the history is. The materialized
+    journey summary is a small summary_<id>.json rewritten on each save.
+    Reads seek backward from the end of the file.
+
+    Legacy user_<id>.json documents are converted by an explicit one-shot
+    migrate_all() (python -m services.pregnancy_memory). Until then the
+    backend refuses to open a directory that still holds them, rather than
+    serving those users an empty history; with auto_migrate
+    (MEMORY_AUTO_MIGRATE=true) each user is migrated when first touched.
+    """
+
+    name = "jsonl"
+
+    def __init__(self, data_dir: str, auto_migrate: bool = None):
+        super().__init__(data_dir)
+        if auto_migrate is None:
+            auto_migrate = os.getenv("MEMORY_AUTO_MIGRATE", "false").lower() == "true"
+        self.auto_migrate = auto_migrate
+        if not auto_migrate and self.legacy_users():
+            raise RuntimeError(
+                f"{data_dir} holds legacy user_<id>.json files; migrate them first with "
+                f"'python -m services.pregnancy_memory {data_dir}', set MEMORY_AUTO_MIGRATE=true, "
+                f"or keep MEMORY_BACKEND=json"
+            )
+
+    def get_log_file(self, user_id: str) -> str:
+        """Get the append-only log file path for a user"""
+        return os.path.join(self.data_dir, f"user_{user_id}.jsonl")
+
+    def get_profile_file(self, user_id: str) -> str:
+        """Get the append-only profile file path for a user"""
+        return os.path.join(self.data_dir, f"user_{user_id}.profile.jsonl")
+
+    def get_summary_file(self, user_id: str) -> str:
+        """Get the materialized journey summary file path for a user"""
+        return os.path.join(self.data_dir, f"summary_{user_id}.json")
+
+    def append_logs(self, user_id: str, writes: List[Tuple[Dict, Optional[Dict]]], fsync: bool = False,
+                    summary_state: Optional[Dict] = None):
+        with self.lock_user(user_id):
+            self._ensure_migrated(user_id)
+            _append_records(self.get_log_file(user_id), [log_entry for log_entry, _ in writes], fsync)
+
+            # Only the latest merged profile of the batch needs to be recorded
+            profile_updates = [(log_entry, profile) for log_entry, profile in writes if profile is not None]
+            if profile_updates:
+                log_entry, user_profile = profile_updates[-1]
+                _append_records(self.get_profile_file(user_id), [{
+                    "timestamp": log_entry["timestamp"],
+                    "user_profile": user_profile
+                }], fsync)
+
+            # Written last: if we crash before this, the stale summary no longer
+            # covers the newest log and readers rebuild it
+            if summary_state is not None:
+                _atomic_write(self.get_summary_file(user_id), json.dumps(summary_state, ensure_ascii=False), fsync)
+
+    def read_recent_logs(self, user_id: str, limit: int) -> List[Dict]:
+        self._ensure_migrated(user_id)
+        return _tail_records(self.get_log_file(user_id), limit)
+
+    def read_profile(self, user_id: str) -> Dict:
+        """The latest profile record holds the fully merged profile"""
+        self._ensure_migrated(user_id)
+        records = _tail_records(self.get_profile_file(user_id), 1)
+        return records[-1].get("user_profile", {}) if records else {}
+
+    def read_summary(self, user_id: str) -> Optional[Dict]:
+        try:
+            with open(self.get_summary_file(user_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, UnicodeDecodeError, json.JSONDecodeError):
+            return None
+
+    def state_signature(self, user_id: str) -> tuple:
+        self._ensure_migrated(user_id)
+        return (
+            _file_signature(self.get_log_file(user_id)),
+            _file_signature(self.get_profile_file(user_id))
+        )
+
+    def migrate_user(self, user_id: str) -> bool:
+        """Convert a legacy user_<id>.json document into the JSONL layout.
+
+        The legacy file is renamed to user_<id>.json.migrated once both JSONL
+        files are in place, so an interrupted migration is simply redone. One
+        that cannot be read is moved aside as user_<id>.json.corrupt-<ts> and
+        the user starts with an empty history.
+        """
+        legacy_path = self.get_user_file(user_id)
+        if not os.path.exists(legacy_path):
+            return False
+
+        with self.lock_user(user_id):
+            # Another worker may have finished the migration while we waited
+            if not os.path.exists(legacy_path):
+                return False
+
+            try:
+                with open(legacy_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, UnicodeDecodeError, json.JSONDecodeError) as e:
+                print(f"⚠️  Unreadable legacy memory file {legacy_path}: {e}")
+                try:
+                    os.replace(legacy_path, f"{legacy_path}.corrupt-{int(time.time())}")
+                except OSError as e:
+                    print(f"⚠️  Could not move aside {legacy_path}: {e}")
+                return False
+
+            logs = data.get("logs", [])
+            profile = data.get("user_profile", {})
+            profile_records = []
+            if profile:
+                profile_records.append({
+                    "timestamp": logs[-1]["timestamp"] if logs else datetime.now().isoformat(),
+                    "user_profile": profile
+                })
+
+            _write_records(self.get_log_file(user_id), logs)
+            _write_records(self.get_profile_file(user_id), profile_records)
+            if data.get("journey_summary"):
+                _atomic_write(self.get_summary_file(user_id), json.dumps(data["journey_summary"], ensure_ascii=False))
+            os.replace(legacy_path, legacy_path + ".migrated")
+            return True
+
+    def legacy_users(self) -> List[str]:
+        """Ids of the users that still have a legacy user_<id>.json document"""
+        return [file_name[len("user_"):-len(".json")] for file_name in sorted(os.listdir(self.data_dir))
+                if file_name.startswith("user_") and file_name.endswith(".json")]
+
+    def migrate_all(self) -> int:
+        """One-shot migration of every legacy user file in the data directory"""
+        return sum(1 for user_id in self.legacy_users() if self.migrate_user(user_id))
+
+    def _ensure_migrated(self, user_id: str):
+        """Migrate a user's legacy JSON file on first access, with auto_migrate"""
+        if self.auto_migrate and os.path.exists(self.get_user_file(user_id)):
+            self.migrate_user(user_id)
+
+class SQLiteBackend(MemoryBackend):
+    """SQLite storage with indexed per-user and cross-user queries.
+
+    Runs in WAL mode so readers never block the writer. Each thread gets its
+    own connection with a prepared-statement cache; every save is a single
+    transaction that also bumps the user's version, which doubles as the
+    cache signature.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            user_profile TEXT NOT NULL DEFAULT '{}',
+            journey_summary TEXT,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            week INTEGER,
+            daily_log TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_logs_user_timestamp ON logs (user_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_logs_user_week ON logs (user_id, week);
+    """
+
+    def __init__(self, db_path: str):
+        super().__init__()
+        self.db_path = db_path
+        self.lock_dir = os.path.join(os.path.dirname(db_path) or ".", "locks")
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        connection = self._connection()
+        connection.executescript(self.SCHEMA)
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(users)")}
+        if "journey_summary" not in columns:
+            connection.execute("ALTER TABLE users ADD COLUMN journey_summary TEXT")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection; sqlite3 connections must not be shared across threads"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.db_path,
+                timeout=30,
+                cached_statements=SQLITE_STATEMENT_CACHE_SIZE,
+                check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def get_lock_file(self, user_id: str) -> str:
+        return os.path.join(self.lock_dir, f"user_{user_id}.lock")
+
+    def append_logs(self, user_id: str, writes: List[Tuple[Dict, Optional[Dict]]], fsync: bool = False,
+                    summary_state: Optional[Dict] = None):
+        connection = self._connection()
+        # NORMAL only syncs the WAL at checkpoints; FULL syncs it on this commit
+        connection.execute(f"PRAGMA synchronous={'FULL' if fsync else 'NORMAL'}")
+        with connection:
+            connection.executemany(
+                "INSERT INTO logs (user_id, timestamp, week, daily_log) VALUES (?, ?, ?, ?)",
+                [(user_id, log_entry["timestamp"], log_entry["week"],
+                  json.dumps(log_entry["daily_log"], ensure_ascii=False)) for log_entry, _ in writes]
+            )
+            connection.execute(
+                "INSERT INTO users (user_id, version, updated_at) VALUES (?, 1, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at",
+                (user_id, writes[-1][0]["timestamp"])
+            )
+            profiles = [user_profile for _, user_profile in writes if user_profile is not None]
+            if profiles:
+                connection.execute(
+                    "UPDATE users SET user_profile = ? WHERE user_id = ?",
+                    (json.dumps(profiles[-1], ensure_ascii=False), user_id)
+                )
+            if summary_state is not None:
+                connection.execute(
+                    "UPDATE users SET journey_summary = ? WHERE user_id = ?",
+                    (json.dumps(summary_state, ensure_ascii=False), user_id)
+                )
+
+    def read_recent_logs(self, user_id: str, limit: int) -> List[Dict]:
+        rows = self._connection().execute(
+            "SELECT timestamp, week, daily_log FROM logs WHERE user_id = ? "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (user_id, limit)
+        ).fetchall()
+        return [_row_to_log(row) for row in reversed(rows)]
+
+    def read_profile(self, user_id: str) -> Dict:
+        row = self._connection().execute(
+            "SELECT user_profile FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def read_summary(self, user_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT journey_summary FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def read_snapshot(self, user_id: str, limit: int) -> Tuple[Dict, List[Dict], Optional[Dict]]:
+        # All reads in one transaction so the profile, logs and summary are consistent
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN")
+            return self.read_profile(user_id), self.read_recent_logs(user_id, limit), self.read_summary(user_id)
+
+    def state_signature(self, user_id: str) -> tuple:
+        row = self._connection().execute(
+            "SELECT version FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return (row[0] if row else 0,)
+
+    def find_logs(self, week: int = None, since: str = None, limit: int = 100) -> List[Dict]:
+        """Query logs across all users, optionally by week and/or timestamp lower bound"""
+        conditions, params = [], []
+        if week is not None:
+            conditions.append("week = ?")
+            params.append(week)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        rows = self._connection().execute(
+            f"SELECT timestamp, week, daily_log, user_id FROM logs {where}ORDER BY timestamp DESC LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+        return [{**_row_to_log(row), "user_id": row[3]} for row in rows]
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+BACKENDS = ("jsonl", "json", "sqlite")
+
+def create_backend(name: str, data_dir: str) -> MemoryBackend:
+    """Build a storage backend by name ("jsonl", "json" or "sqlite")"""
+    if name == "jsonl":
+        return JSONLFileBackend(data_dir)
+    if name == "json":
+        return JSONFileBackend(data_dir)
+    if name == "sqlite":
+        return SQLiteBackend(os.getenv("MEMORY_SQLITE_PATH", os.path.join(data_dir, "pregnancy_memory.db")))
+    raise ValueError(f"Unknown memory backend '{name}', expected one of {BACKENDS}")
+
+def _row_to_log(row) -> Dict:
+    return {"timestamp": row[0], "week": row[1], "daily_log": json.loads(row[2])}
+
+def _file_signature(file_path: str):
+    """mtime and size of a file, or None when it does not exist"""
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+@contextmanager
+def _exclusive_file_lock(lock_path: str):
+    """Exclusive advisory lock on a lock file, blocking until it is acquired"""
+    with open(lock_path, 'a+b') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after ~10 seconds; keep waiting
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _atomic_write(file_path: str, content: str, fsync: bool = True):
+    """Write a file through a uniquely named temp file, optionally fsync, and rename.
+
+    Readers see either the old or the new file, never a partial one, and a
+    crash mid-write leaves only a stray temp file behind.
+    """
+    directory = os.path.dirname(file_path) or "."
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(file_path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def _remove_stale_temp_files(directory: str):
+    """Clean up temp files left behind by writers that crashed before renaming"""
+    cutoff = time.time() - STALE_TEMP_FILE_SECONDS
+    for file_name in os.listdir(directory):
+        if file_name.startswith(TEMP_FILE_PREFIXES) and file_name.endswith(".tmp"):
+            path = os.path.join(directory, file_name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def _repair_torn_tail(file_path: str):
+    """Truncate a partial last line left by a writer that died mid-append"""
+    try:
+        f = open(file_path, 'rb+')
+    except FileNotFoundError:
+        return
+
+    with f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+
+        position = end
+        while position > 0:
+            read_size = min(TAIL_BLOCK_SIZE, position)
+            position -= read_size
+            f.seek(position)
+            newline = f.read(read_size).rfind(b"\n")
+            if newline != -1:
+                f.truncate(position + newline + 1)
+                return
+        f.truncate(0)
+
+def _append_records(file_path: str, records: List[Dict], fsync: bool = False):
+    """Append JSON records one per line in a single write (caller holds the user lock)"""
+    _repair_torn_tail(file_path)
+    lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    with open(file_path, 'a', encoding='utf-8') as f:
+        f.write(lines)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+def _write_records(file_path: str, records: List[Dict]):
+    """Atomically replace a JSONL file with the given records"""
+    _atomic_write(file_path, "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+
+def _tail_records(file_path: str, count: int) -> List[Dict]:
+    """Read the last `count` records of a JSONL file by seeking backward from the end.
+
+    Only the blocks holding those lines are read and decoded, so the cost
+    depends on `count`, not on the length of the history. A torn trailing
+    line left by an interrupted write is skipped.
+    """
+    if count <= 0 or not os.path.exists(file_path):
+        return []
+
+    with open(file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        buffer = b""
+        # One extra newline guarantees the oldest wanted line is complete,
+        # a second one leaves room for skipping a torn line
+        while position > 0 and buffer.count(b"\n") <= count + 1:
+            read_size = min(TAIL_BLOCK_SIZE, position)
+            position -= read_size
+            f.seek(position)
+            buffer = f.read(read_size) + buffer
+
+    lines = buffer.split(b"\n")
+    if position > 0:
+        lines = lines[1:]  # Starts mid-line
+
+    records = []
+    for line in reversed(lines):
+        if len(records) == count:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line.decode('utf-8')))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            continue
+    records.reverse()
+    return records
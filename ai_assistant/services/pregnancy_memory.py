@@ -1,93 +1,348 @@
-import json
+import atexit
 import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional
+
+from services.memory_backends import JSONLFileBackend, create_backend
+from services.write_behind import WriteBehindQueue, DEFAULT_FLUSH_INTERVAL_MS
+
+SNAPSHOT_LOG_WINDOW = 10  # Recent logs held by a snapshot, enough for the journey summary
+DEFAULT_CACHE_SIZE = 256  # Users whose snapshots are kept in memory
+DURABILITY_LEVELS = ("async", "sync")
+DEFAULT_SYNC_TIMEOUT = 5.0  # Seconds a "sync" save waits for the flusher before writing the entry itself
+
+FIRST_ENTRY_SUMMARY = "This is the user's first log entry."
+SUMMARY_HEADER_LINES = 2  # "User Profile: ..." and "Recent Pregnancy Journey:" precede one line per log
+
+def render_journey_line(log: Dict) -> str:
+    """One line of the journey summary for a single log entry"""
+    daily_log = log["daily_log"]
+    timestamp = log["timestamp"][:10]  # Just the date
+    return (
+        f"Week {log['week']} ({timestamp}): "
+        f"Mood: {daily_log.get('mood', 'N/A')}, "
+        f"Energy: {daily_log.get('energy_level', 'N/A')}, "
+        f"Symptoms: {daily_log.get('symptoms', [])}, "
+        f"Concerns: {daily_log.get('concerns', [])}\n"
+    )
+
+def _summary_state(lines: List[str], profile: Dict, through: Optional[str]) -> Dict:
+    if not lines:
+        text = FIRST_ENTRY_SUMMARY
+    else:
+        text = f"User Profile: {profile}\n\nRecent Pregnancy Journey:\n" + "".join(lines)
+    return {"through": through, "lines": lines, "text": text}
+
+def build_summary_state(logs: List[Dict], profile: Dict) -> Dict:
+    """Materialize the journey summary from scratch.
+
+    The state holds the rendered lines of the last SNAPSHOT_LOG_WINDOW logs,
+    the finished text and the timestamp of the newest log it covers.
+    """
+    window = logs[-SNAPSHOT_LOG_WINDOW:]
+    return _summary_state(
+        [render_journey_line(log) for log in window],
+        profile,
+        window[-1]["timestamp"] if window else None
+    )
+
+def advance_summary_state(state: Dict, log_entry: Dict, profile: Dict) -> Dict:
+    """Roll the materialized summary forward by one log entry"""
+    lines = (state["lines"] + [render_journey_line(log_entry)])[-SNAPSHOT_LOG_WINDOW:]
+    return _summary_state(lines, profile, log_entry["timestamp"])
+
+def build_journey_summary(logs: List[Dict], profile: Dict) -> str:
+    """Render the pregnancy journey summary used as AI context"""
+    return build_summary_state(logs, profile)["text"]
+
+class MemorySnapshot:
+    """A user's memory state loaded once per request.
+
+    Holds the profile, the most recent logs and the materialized journey
+    summary so a handler can derive everything it needs without going back
+    to disk. A stored summary that does not cover the newest log (missing,
+    or left behind by an interrupted write) is rebuilt from the logs.
+    Snapshots are read-only; save_log returns a new one.
+    """
+
+    def __init__(self, user_id: str, user_profile: Dict, logs: List[Dict], summary_state: Dict = None):
+        self.user_id = user_id
+        self.user_profile = user_profile
+        self.logs = logs[-SNAPSHOT_LOG_WINDOW:]
+
+        newest = self.logs[-1]["timestamp"] if self.logs else None
+        if not summary_state or summary_state.get("through") != newest:
+            summary_state = build_summary_state(self.logs, user_profile)
+        self.summary_state = summary_state
+
+    def get_recent_logs(self, limit: int = 5) -> List[Dict]:
+        """Get recent logs for context"""
+        return self.logs[-limit:] if self.logs else []
+
+    def get_user_profile(self) -> Dict:
+        """Get user profile information"""
+        return self.user_profile
+
+    def get_pregnancy_journey_summary(self) -> str:
+        """Summary of the pregnancy journey for AI context"""
+        return self.summary_state["text"]
+
+    def with_log(self, log_entry: Dict, user_profile: Dict) -> "MemorySnapshot":
+        """Return the snapshot as it looks after appending a log entry"""
+        return MemorySnapshot(
+            self.user_id,
+            user_profile,
+            self.logs + [log_entry],
+            advance_summary_state(self.summary_state, log_entry, user_profile)
+        )
+
+class SnapshotCache:
+    """Size-bounded LRU cache of user snapshots.
+
+    Each entry remembers the file signature (mtime and size) it was read at;
+    a lookup with a different signature is a miss, so writes made by another
+    worker process are picked up on the next read.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str, signature: tuple):
+        """Return the cached snapshot if it is still current, else None"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != signature:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id: str, signature: tuple, snapshot: MemorySnapshot):
+        """Store a snapshot, evicting the least recently used users when full"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (signature, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
 
 class PregnancyMemory:
-    """Handles storing and retrieving pregnancy logs for context-aware responses"""
-    
-    def __init__(self, data_dir: str = "pregnancy_data"):
+    """Handles storing and retrieving pregnancy logs for context-aware responses
+
+    Storage is delegated to a pluggable backend (see services/memory_backends.py)
+    chosen with the MEMORY_BACKEND setting:
+    - "json" (default): the original single user_<id>.json document per user
+    - "jsonl": append-only per-user files (migrate existing json data first)
+    - "sqlite": one SQLite database in WAL mode with indexed queries
+
+    Decoded snapshots are kept in an LRU cache (MEMORY_CACHE_SIZE users, 0 to
+    disable) that is written through on save_log.
+
+    With MEMORY_WRITE_BEHIND enabled, save_log only queues the entry and a
+    background flusher group-commits it a few milliseconds later. Each call
+    picks a durability level: "async" returns once queued, "sync" waits for
+    the fsynced commit (at most MEMORY_SYNC_TIMEOUT seconds, then it writes
+    the entry directly). Reads in this process include queued entries, and
+    close() (also run at exit) drains the queue. The flusher re-merges the
+    profile and rolls the summary forward from storage at commit time, so
+    workers sharing the data directory don't overwrite each other's updates.
+
+    Callbacks registered with add_save_listener() are called with the user id
+    after every save_log, so state derived from a user's history elsewhere
+    (e.g. chat sessions) can be dropped.
+    """
+
+    def __init__(self, data_dir: str = "pregnancy_data", backend=None, cache_size: int = None,
+                 write_behind: bool = None, durability: str = None):
         self.data_dir = data_dir
-        os.makedirs(data_dir, exist_ok=True)
-    
-    def get_user_file(self, user_id: str) -> str:
-        """Get the file path for a user's pregnancy logs"""
-        return os.path.join(self.data_dir, f"user_{user_id}.json")
-    
-    def save_log(self, user_id: str, week: int, daily_log: Dict, user_profile: Dict = None):
-        """Save a new pregnancy log entry"""
-        file_path = self.get_user_file(user_id)
-        
-        # Load existing data
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        else:
-            data = {
-                "user_profile": user_profile or {},
-                "logs": []
-            }
-        
-        # Add new log entry
+        if backend is None or isinstance(backend, str):
+            backend = create_backend(backend or os.getenv("MEMORY_BACKEND", "json"), data_dir)
+        self.backend = backend
+        if cache_size is None:
+            cache_size = int(os.getenv("MEMORY_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+        self.cache = SnapshotCache(cache_size)
+        self._save_listeners: List[Callable[[str], None]] = []
+
+        if write_behind is None:
+            write_behind = os.getenv("MEMORY_WRITE_BEHIND", "false").lower() == "true"
+        self.durability = durability or os.getenv("MEMORY_DURABILITY", "async")
+        if self.durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability '{self.durability}', expected one of {DURABILITY_LEVELS}")
+        self.write_queue = None
+        if write_behind:
+            flush_interval_ms = float(os.getenv("MEMORY_FLUSH_INTERVAL_MS", DEFAULT_FLUSH_INTERVAL_MS))
+            self.write_queue = WriteBehindQueue(backend, flush_interval_ms, rebase=self._rebase)
+            self.sync_timeout = float(os.getenv("MEMORY_SYNC_TIMEOUT", DEFAULT_SYNC_TIMEOUT))
+            atexit.register(self.close)
+
+    def save_log(self, user_id: str, week: int, daily_log: Dict, user_profile: Dict = None,
+                 durability: str = None) -> MemorySnapshot:
+        """Save a new pregnancy log entry and return the user's updated snapshot.
+
+        durability ("async" or "sync") only matters in write-behind mode and
+        defaults to the memory-wide setting.
+        """
+        durability = durability or self.durability
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability '{durability}', expected one of {DURABILITY_LEVELS}")
+
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "week": week,
             "daily_log": daily_log
         }
-        data["logs"].append(log_entry)
-        
-        # Update user profile if provided
-        if user_profile:
-            data["user_profile"].update(user_profile)
-        
-        # Save back to file
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-    
+
+        # Hold the user's lock so the profile merge and the cache signature
+        # cannot interleave with a concurrent writer in another thread or worker
+        with self.backend.lock_user(user_id):
+            snapshot = self.load_snapshot(user_id)
+
+            # Only pass the profile on when it actually changed
+            merged_profile = {**snapshot.user_profile, **(user_profile or {})}
+            profile_update = merged_profile if merged_profile != snapshot.user_profile else None
+
+            # The summary is rolled forward here and stored alongside the log
+            snapshot = snapshot.with_log(log_entry, merged_profile)
+            pending_write = None
+            if self.write_queue:
+                pending_write = self.write_queue.enqueue(user_id, log_entry, profile_update, snapshot.summary_state,
+                                                         profile_changes=user_profile)
+            else:
+                self.backend.append_log(user_id, log_entry, profile_update, snapshot.summary_state)
+
+            # In write-behind mode this caches the new snapshot under the pre-flush
+            # signature, so it is served until the flusher changes the file
+            self.cache.put(user_id, self.backend.state_signature(user_id), snapshot)
+
+        for listener in self._save_listeners:
+            listener(user_id)
+        if pending_write and durability == "sync" and not pending_write.wait(self.sync_timeout):
+            self._write_directly(pending_write)
+        return snapshot
+
+    def _write_directly(self, write):
+        """Commit a queued entry without the flusher, after a "sync" save timed out waiting for it"""
+        # Only possible while the entry is still queued; a commit already holding it will finish it
+        if not self.write_queue.cancel(write):
+            print(f"⚠️  Memory flush for {write.user_id} is slow; entry stays with the committing flusher")
+            return
+        print(f"⚠️  Memory flusher did not commit within {self.sync_timeout}s, writing {write.user_id}'s log directly")
+        with self.backend.lock_user(write.user_id):
+            writes, summary_state = self._rebase(write.user_id, [write])
+            self.backend.append_logs(write.user_id, writes, fsync=True, summary_state=summary_state)
+
+    def _rebase(self, user_id: str, batch) -> tuple:
+        """Queued entries replayed on top of what is in storage now (called with the user lock held).
+
+        Another worker may have saved logs or profile changes since the
+        entries were queued: profile changes are merged into the stored
+        profile, the summary is rolled forward from the stored one, and an
+        entry older than the newest stored log is restamped so logs stay in
+        time order.
+        """
+        profile, logs, summary_state = self.backend.read_snapshot(user_id, SNAPSHOT_LOG_WINDOW)
+        snapshot = MemorySnapshot(user_id, profile, logs, summary_state)
+        writes = []
+        for write in batch:
+            log_entry = write.log_entry
+            if snapshot.logs and log_entry["timestamp"] <= snapshot.logs[-1]["timestamp"]:
+                log_entry = {**log_entry, "timestamp": datetime.now().isoformat()}
+            merged_profile = {**snapshot.user_profile, **(write.profile_changes or {})}
+            writes.append((log_entry, merged_profile if merged_profile != snapshot.user_profile else None))
+            snapshot = snapshot.with_log(log_entry, merged_profile)
+        return writes, snapshot.summary_state
+
+    def add_save_listener(self, listener: Callable[[str], None]):
+        """Call listener(user_id) whenever a log is saved for a user"""
+        self._save_listeners.append(listener)
+
+    def load_snapshot(self, user_id: str) -> MemorySnapshot:
+        """Load a user's profile and recent logs, from the cache when the stored data is unchanged"""
+        if self.write_queue and self.write_queue.has_pending(user_id):
+            # Queued entries only move to storage under the user lock
+            with self.backend.lock_user(user_id):
+                return self._load_snapshot(user_id)
+        return self._load_snapshot(user_id)
+
+    def _load_snapshot(self, user_id: str) -> MemorySnapshot:
+        signature = self.backend.state_signature(user_id)
+        snapshot = self.cache.get(user_id, signature)
+        if snapshot is None:
+            profile, logs, summary_state = self._read(user_id, SNAPSHOT_LOG_WINDOW)
+            snapshot = MemorySnapshot(user_id, profile, logs, summary_state)
+            self.cache.put(user_id, signature, snapshot)
+        return snapshot
+
+    def _read(self, user_id: str, limit: int):
+        """Read (profile, recent logs, summary state) from the backend, overlaying writes still queued"""
+        profile, logs, summary_state = self.backend.read_snapshot(user_id, limit)
+        if self.write_queue:
+            logs = list(logs)
+            for write in self.write_queue.pending_for(user_id):
+                logs.append(write.log_entry)
+                summary_state = write.summary_state
+                if write.user_profile is not None:
+                    profile = write.user_profile
+        return profile, logs[-limit:], summary_state
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit, miss and eviction counters of the snapshot cache"""
+        return self.cache.stats()
+
+    def write_queue_stats(self) -> Optional[Dict[str, Any]]:
+        """Counters of the write-behind queue, or None when it is disabled"""
+        return self.write_queue.stats() if self.write_queue else None
+
     def get_recent_logs(self, user_id: str, limit: int = 5) -> List[Dict]:
         """Get recent logs for context"""
-        file_path = self.get_user_file(user_id)
-        
-        if not os.path.exists(file_path):
-            return []
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Return the most recent logs
-        return data["logs"][-limit:] if data["logs"] else []
-    
+        if 0 < limit <= SNAPSHOT_LOG_WINDOW:
+            return self.load_snapshot(user_id).get_recent_logs(limit)
+        if self.write_queue and self.write_queue.has_pending(user_id):
+            with self.backend.lock_user(user_id):
+                return self._read(user_id, limit)[1]
+        return self.backend.read_recent_logs(user_id, limit)
+
     def get_user_profile(self, user_id: str) -> Dict:
         """Get user profile information"""
-        file_path = self.get_user_file(user_id)
-        
-        if not os.path.exists(file_path):
-            return {}
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        return data.get("user_profile", {})
-    
+        return self.load_snapshot(user_id).get_user_profile()
+
     def get_pregnancy_journey_summary(self, user_id: str) -> str:
         """Generate a summary of the pregnancy journey for AI context"""
-        logs = self.get_recent_logs(user_id, limit=10)
-        profile = self.get_user_profile(user_id)
-        
-        if not logs:
-            return "This is the user's first log entry."
-        
-        summary = f"User Profile: {profile}\n\nRecent Pregnancy Journey:\n"
-        
-        for log in logs:
-            week = log["week"]
-            daily_log = log["daily_log"]
-            timestamp = log["timestamp"][:10]  # Just the date
-            
-            summary += f"Week {week} ({timestamp}): "
-            summary += f"Mood: {daily_log.get('mood', 'N/A')}, "
-            summary += f"Energy: {daily_log.get('energy_level', 'N/A')}, "
-            summary += f"Symptoms: {daily_log.get('symptoms', [])}, "
-            summary += f"Concerns: {daily_log.get('concerns', [])}\n"
-        
-        return summary
+        return self.load_snapshot(user_id).get_pregnancy_journey_summary()
+
+    def close(self):
+        """Drain queued writes and release backend resources"""
+        if self.write_queue:
+            self.write_queue.close()
+        self.backend.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # One-shot migration: python -m services.pregnancy_memory [data_dir]
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "pregnancy_data"
+    count = JSONLFileBackend(data_dir, auto_migrate=True).migrate_all()
+    print(f"✅ Migrated {count} user file(s) in {data_dir} to the JSONL layout")
@@ -1,15 +1,30 @@
-def check_symptoms(symptoms):
-    risky_symptoms = ['heavy bleeding', 'blurred vision', 'severe abdominal pain', 'high fever']
-    alerts = [sym for sym in symptoms if sym.lower() in risky_symptoms]
+from services.symptom_matcher import find_symptoms, ALERT_SEVERITY
+
+def check_symptoms(symptoms, text=None):
+    """Screen a symptom list and, optionally, free text (a transcript or concerns) for danger signs.
+
+    Both are matched against the multilingual symptom lexicon, so "bleeding
+    heavily" or "पेट में तेज़ दर्द" count as well as exact symptom names.
+    """
+    texts = [str(symptom) for symptom in symptoms or []]
+    if text:
+        texts.append(text)
+    matches = find_symptoms(*texts)
+    severity = max((match.severity for match in matches), default=0)
+    alerts = [match.symptom for match in matches if match.severity >= ALERT_SEVERITY]
     
     if alerts:
         return {
             "status": "alert",
             "message": "Potentially dangerous symptoms detected.",
-            "symptoms": alerts
+            "symptoms": alerts,
+            "severity": severity,
+            "detected": [match.symptom for match in matches]
         }
     return {
         "status": "normal",
         "message": "No risky symptoms detected.",
-        "symptoms": symptoms
+        "symptoms": symptoms,
+        "severity": severity,
+        "detected": [match.symptom for match in matches]
     }
@@ -0,0 +1,273 @@
+import re
+import unicodedata
+from collections import deque
+from typing import Dict, List, Any, Iterable, NamedTuple
+
+# Letters of the Devanagari (Hindi, Marathi) and Gujarati scripts. Python's \b
+# splits these words at vowel signs, so Indic phrases use a "not preceded by a
+# letter" boundary instead and may carry inflection suffixes.
+INDIC_LETTER = "ऀ-ॿ઀-૿"
+_INDIC = re.compile(f"[{INDIC_LETTER}]")
+
+# Severity weights run from 1 (common discomfort) to 10 (emergency); a symptom
+# at or above ALERT_SEVERITY triggers an alert and escalation
+ALERT_SEVERITY = 7
+
+# Canonical symptom -> severity weight and synonyms in English, Hindi, Marathi and
+# Gujarati. "refines" names the general symptom a more specific one replaces.
+SYMPTOM_LEXICON = {
+    "nausea": {"severity": 2, "synonyms": [
+        "nausea", "nauseous", "nauseated", "morning sickness", "feel sick", "feeling sick",
+        "मतली", "जी मिचला", "मिचली", "मळमळ", "ઉબકા"]},
+    "vomiting": {"severity": 3, "synonyms": [
+        "vomiting", "vomited", "throwing up", "threw up", "उल्टी", "उलटी", "ઉલટી"]},
+    "headache": {"severity": 3, "synonyms": [
+        "headache", "head ache", "head hurts", "सिरदर्द", "सिर दर्द", "सिर में दर्द", "डोकेदुखी", "डोके दुख",
+        "માથાનો દુખાવો", "માથું દુખ"]},
+    "severe headache": {"severity": 7, "refines": "headache", "synonyms": [
+        "severe headache", "bad headache", "terrible headache", "worst headache", "तेज सिरदर्द",
+        "सिर में तेज दर्द", "बहुत सिरदर्द", "खूप डोकेदुखी", "डोके खूप दुख", "માથામાં સખત દુખાવો",
+        "માથું ખૂબ દુખ"]},
+    "back pain": {"severity": 2, "synonyms": [
+        "back pain", "backache", "back ache", "back hurts", "lower back", "कमर दर्द", "कमर में दर्द", "पीठ दर्द",
+        "पीठ में दर्द", "पाठदुखी", "कंबरदुखी", "पाठ दुख", "કમરનો દુખાવો", "કમરમાં દુખાવો", "પીઠનો દુખાવો"]},
+    "swelling": {"severity": 3, "synonyms": [
+        "swelling", "swollen", "puffy", "सूजन", "सूज", "સોજો", "સોજા"]},
+    "facial swelling": {"severity": 7, "refines": "swelling", "synonyms": [
+        "swollen face", "face is swollen", "puffy face", "sudden swelling", "चेहरे पर सूजन", "चेहरा सूज",
+        "चेहऱ्यावर सूज", "ચહેરા પર સોજો", "ચહેરો સૂજ"]},
+    "heartburn": {"severity": 1, "synonyms": [
+        "heartburn", "acidity", "acid reflux", "सीने में जलन", "एसिडिटी", "छातीत जळजळ", "ऍसिडिटी",
+        "अॅसिडिटी", "છાતીમાં બળતરા", "એસિડિટી"]},
+    "constipation": {"severity": 1, "synonyms": [
+        "constipation", "constipated", "कब्ज", "बद्धकोष्ठ", "કબજિયાત"]},
+    "dizziness": {"severity": 4, "synonyms": [
+        "dizzy", "dizziness", "lightheaded", "light headed", "चक्कर", "ચક્કર"]},
+    "fainting": {"severity": 8, "refines": "dizziness", "synonyms": [
+        "fainted", "fainting", "passed out", "blacked out", "बेहोश", "बेशुद्ध", "બેભાન"]},
+    "cramps": {"severity": 4, "synonyms": [
+        "cramps", "cramping", "ऐंठन", "मरोड़", "पेटके", "ખેંચાણ"]},
+    "fatigue": {"severity": 1, "synonyms": [
+        "fatigue", "exhausted", "थकान", "थकवा", "થાક"]},
+    "insomnia": {"severity": 1, "synonyms": [
+        "insomnia", "can't sleep", "cannot sleep", "couldn't sleep", "trouble sleeping", "not sleeping well",
+        "नींद नहीं", "नींद नही", "झोप येत नाही", "झोप लागत नाही", "ઊંઘ નથી આવતી", "ઊંઘ આવતી નથી"]},
+    "bleeding": {"severity": 6, "synonyms": [
+        "bleeding", "spotting", "खून", "रक्तस्राव", "रक्तस्त्राव", "રક્તસ્રાવ", "લોહી"]},
+    "heavy bleeding": {"severity": 10, "refines": "bleeding", "synonyms": [
+        "heavy bleeding", "bleeding heavily", "a lot of blood", "lots of blood", "बहुत खून", "ज्यादा खून",
+        "अत्यधिक रक्तस्राव", "जास्त रक्तस्त्राव", "खूप रक्तस्त्राव", "ભારે રક્તસ્રાવ", "વધુ રક્તસ્રાવ", "ખૂબ લોહી"]},
+    "leaking fluid": {"severity": 8, "synonyms": [
+        "leaking fluid", "fluid leaking", "water broke", "waters broke", "water has broken", "पानी की थैली फट",
+        "पानी निकल रहा", "पाणमोट फुट", "પાણીની થેલી ફૂટ"]},
+    "blurred vision": {"severity": 8, "synonyms": [
+        "blurred vision", "blurry vision", "vision is blurry", "seeing spots", "धुंधला दिख", "धुंधली नजर",
+        "अंधुक दिस", "ઝાંખું દેખાય", "ઝાંખી દ્રષ્ટિ"]},
+    "abdominal pain": {"severity": 5, "synonyms": [
+        "abdominal pain", "stomach pain", "stomach ache", "tummy pain", "belly pain", "पेट दर्द", "पेट में दर्द",
+        "पोटदुखी", "पोटात दुख", "પેટમાં દુખાવો", "પેટનો દુખાવો"]},
+    "severe abdominal pain": {"severity": 9, "refines": "abdominal pain", "synonyms": [
+        "severe abdominal pain", "severe stomach pain", "severe pain in my stomach", "sharp stomach pain",
+        "पेट में तेज दर्द", "पेट में बहुत दर्द", "पोटात तीव्र वेदना", "पोटात खूप दुख", "પેટમાં તીવ્ર દુખાવો",
+        "પેટમાં ખૂબ દુખાવો"]},
+    "chest pain": {"severity": 8, "synonyms": [
+        "chest pain", "pain in my chest", "सीने में दर्द", "छाती में दर्द", "छातीत दुख", "છાતીમાં દુખાવો"]},
+    "fever": {"severity": 5, "synonyms": [
+        "fever", "बुखार", "ताप", "તાવ"]},
+    "high fever": {"severity": 8, "refines": "fever", "synonyms": [
+        "high fever", "high temperature", "तेज बुखार", "बहुत बुखार", "जास्त ताप", "तीव्र ताप", "ઊંચો તાવ",
+        "ખૂબ તાવ", "સખત તાવ"]},
+    "seizure": {"severity": 10, "synonyms": [
+        "seizure", "convulsion", "convulsions", "मिर्गी", "झटके आ", "आकडी", "આંચકી"]},
+    "shortness of breath": {"severity": 6, "synonyms": [
+        "shortness of breath", "short of breath", "breathless", "hard to breathe", "सांस फूल", "सांस लेने में",
+        "श्वास घेण्यास त्रास", "दम लाग", "શ્વાસ લેવામાં તકલીફ", "શ્વાસ ચડ"]},
+    "frequent urination": {"severity": 1, "synonyms": [
+        "frequent urination", "peeing a lot", "बार-बार पेशाब", "बार बार पेशाब", "वारंवार लघवी", "વારંવાર પેશાબ"]},
+    "reduced fetal movement": {"severity": 9, "synonyms": [
+        "baby isn't moving", "baby is not moving", "baby stopped moving", "less movement", "reduced movement",
+        "बच्चा कम हिल", "बच्चे की हलचल कम", "बाळाची हालचाल कमी", "બાળકની હલનચલન ઓછી"]}
+}
+
+# Negation only counts right next to the phrase: voice transcripts have no
+# punctuation, so a cue a few words away ("not feeling well heavy bleeding")
+# usually belongs to another statement.
+NEGATION_CUES = r"no|not|never|without|nor|don't|didn't|haven't|hasn't|isn't|wasn't|aren't|can't|cannot|won't"
+INDIC_NEGATIVES = r"नहीं|नही|नाही|नव्हता|नव्हती|नसल\S*|નથી|નહોતો|નહોતી|નહીં"
+# A cue before an English phrase, at most a have/feel/get verb and a determiner between
+# ("no bleeding", "don't have a headache", "did not feel any nausea"); red flags only take a touching cue
+NEGATION_VERBS = r"have|has|had|having|feel|felt|feeling|get|got|getting"
+NEGATION_BEFORE = re.compile(
+    rf"\b(?:{NEGATION_CUES})(?:\s+(?:{NEGATION_VERBS}))?(?:\s+(?:any|a|an|the|some|much))?\s*$", re.IGNORECASE
+)
+# A negative directly after an Indic phrase and its suffix ("खून नहीं आया", "ताप नाही", "તાવ નથી")
+NEGATION_AFTER = re.compile(rf"^[{INDIC_LETTER}]*\s+(?:(?:भी|बिल्कुल|बिलकुल|अजिबात|જરાય)\s+)?(?:{INDIC_NEGATIVES})")
+INDIC_NEGATION_BEFORE = re.compile(r"(?:बिना|विना|વગર)\s*$")
+# A negated stop or continue verb after the phrase says it persists ("बहुत खून रुक नहीं रहा",
+# "the bleeding won't stop", "रक्तस्त्राव थांबत नाही") and overrides any negation before it
+STOP_VERBS = r"stop\w*|end\w*|go(?:ing)? away|ease\w*|settl\w*|रुक\S*|थम\S*|थांब\S*|बंद|બંધ|અટક\S*"
+PERSISTS_AFTER = re.compile(
+    rf"^\S*(?:\s+\S+){{0,2}}?\s+(?:(?:{NEGATION_CUES})\s+(?:\S+\s+)?(?:{STOP_VERBS})"
+    rf"|(?:{STOP_VERBS})\s+(?:\S+\s+)?(?:{INDIC_NEGATIVES})|keeps?\b|kept\b|continu\w*)",
+    re.IGNORECASE
+)
+# A negated mention carries over to the next one only through "or"/"nor"/a comma ("no bleeding or cramps")
+NEGATED_LIST = re.compile(r"^\s*(?:,\s*)?(?:or|nor|या|किंवा|અથવા)?\s*$")
+CLAUSE_SPLIT = re.compile(r"[.!?।॥\n,;]+|\s+(?:but|however|लेकिन|पर|पण|परंतु|પણ|પરંતુ)\s+")
+NEGATION_WINDOW = 40  # Characters after a match searched for a stop/continue verb
+
+_WHITESPACE = re.compile(r"\s+")
+_APOSTROPHES = str.maketrans({"’": "'", "‘": "'", "`": "'"})
+
+def normalize(text: str) -> str:
+    """Lowercase, single-spaced text with Indic spelling variants folded together.
+
+    Devanagari nukta and chandrabindu are folded (ज़्यादा/ज्यादा, पाँच/पांच) and
+    curly apostrophes straightened, so the lexicon needs one spelling per word.
+    """
+    text = unicodedata.normalize("NFC", text).lower().translate(_APOSTROPHES)
+    text = text.replace("़", "").replace("ँ", "ं")
+    return _WHITESPACE.sub(" ", text).strip()
+
+class SymptomMatch(NamedTuple):
+    symptom: str
+    severity: int
+    phrase: str
+    start: int
+    end: int
+    negated: bool
+
+class SymptomMatcher:
+    """Aho-Corasick automaton over every synonym in a symptom lexicon.
+
+    The automaton is built once; scanning a text is a single pass over its
+    characters regardless of how many synonyms the lexicon holds. Matches are
+    kept at word boundaries, overlapping ones resolve to the longest phrase
+    ("severe abdominal pain" over "abdominal pain"), and each match records
+    whether it is negated ("no bleeding", "ताप नाही"); see negated().
+    """
+
+    def __init__(self, lexicon: Dict[str, Dict[str, Any]] = None):
+        self.lexicon = lexicon or SYMPTOM_LEXICON
+        self.phrases = []  # (phrase, symptom)
+        seen = set()
+        for symptom, entry in self.lexicon.items():
+            for synonym in entry["synonyms"]:
+                phrase = normalize(synonym)
+                if phrase and phrase not in seen:
+                    seen.add(phrase)
+                    self.phrases.append((phrase, symptom))
+        self._build()
+
+    def _build(self):
+        """Trie transitions, failure links and output sets"""
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # Phrase indices ending in each state
+        for index, (phrase, _) in enumerate(self.phrases):
+            state = 0
+            for char in phrase:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._out[state].append(index)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def scan(self, text: str, normalized: bool = False) -> List[SymptomMatch]:
+        """Symptom mentions in text, left to right, including negated ones"""
+        if not normalized:
+            text = normalize(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        candidates = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in out[state]:
+                phrase = self.phrases[index][0]
+                start = position + 1 - len(phrase)
+                if self._at_boundary(text, phrase, start, position + 1):
+                    candidates.append((start, -len(phrase), index))
+
+        matches = []
+        covered = 0
+        for start, length, index in sorted(candidates):
+            if start < covered:
+                continue  # Inside a longer phrase already taken
+            end = start - length
+            phrase, symptom = self.phrases[index]
+            severity = self.lexicon[symptom]["severity"]
+            is_negated = negated(text, start, end, severity)
+            if not is_negated and matches and matches[-1].negated and severity < ALERT_SEVERITY:
+                previous = matches[-1]
+                is_negated = (NEGATED_LIST.match(text[previous.end:start]) is not None
+                              and not PERSISTS_AFTER.match(text[end:end + NEGATION_WINDOW]))
+            matches.append(SymptomMatch(symptom, severity, phrase, start, end, is_negated))
+            covered = end
+        return matches
+
+    @staticmethod
+    def _at_boundary(text: str, phrase: str, start: int, end: int) -> bool:
+        before = text[start - 1] if start else " "
+        if _INDIC.match(phrase):
+            return not _INDIC.match(before)  # Indic words may carry suffixes
+        after = text[end] if end < len(text) else " "
+        return not (before.isalnum() or before == "_" or after.isalnum() or after == "_")
+
+    def symptoms(self, texts: Iterable[str]) -> List[SymptomMatch]:
+        """Mentions that are not negated, one per symptom in order of appearance, across several texts.
+
+        A specific symptom replaces the general one it refines ("heavy bleeding" over "bleeding").
+        """
+        found = {}
+        for text in texts:
+            for match in self.scan(text or ""):
+                if not match.negated and match.symptom not in found:
+                    found[match.symptom] = match
+        for symptom in list(found):
+            general = self.lexicon[symptom].get("refines")
+            if general in found:
+                del found[general]
+        return list(found.values())
+
+def negated(text: str, start: int, end: int, severity: int = 0) -> bool:
+    """Whether the phrase at text[start:end] (normalized, lowercase text) is negated.
+
+    Only a cue next to the phrase counts (with at most a have/feel/get verb
+    and a determiner between), and never when the phrase is followed by a
+    negated stop/continue verb ("खून रुक नहीं रहा"). Red-flag phrases
+    (severity >= ALERT_SEVERITY) are only negated by a cue directly touching
+    them, so an ambiguous sentence still alerts.
+    """
+    if PERSISTS_AFTER.match(text[end:end + NEGATION_WINDOW]):
+        return False
+    before = text[max(0, start - NEGATION_WINDOW):start]
+    if severity >= ALERT_SEVERITY:
+        before_negated = re.search(rf"\b(?:{NEGATION_CUES})\s+$", before, re.IGNORECASE)
+    else:
+        before_negated = NEGATION_BEFORE.search(before)
+    if before_negated or INDIC_NEGATION_BEFORE.search(before):
+        return True
+    if _INDIC.match(text[start:end]):
+        return NEGATION_AFTER.match(text[end:end + NEGATION_WINDOW]) is not None
+    return False
+
+_matcher = SymptomMatcher()
+
+def find_symptoms(*texts: str) -> List[SymptomMatch]:
+    """Symptoms mentioned (and not negated) in any of the texts, using SYMPTOM_LEXICON"""
+    return _matcher.symptoms(texts)
@@ -0,0 +1,330 @@
+import bisect
+import json
+import re
+from typing import Dict, List, Tuple, Any, Optional
+
+from services.symptom_matcher import find_symptoms, negated, INDIC_LETTER, CLAUSE_SPLIT
+
+FIELDS = ("mood", "energy_level", "symptoms", "sleep_hours", "water_intake", "exercise", "concerns")
+LOW_CONFIDENCE_THRESHOLD = 0.7
+
+EXPLICIT = 0.9  # The field was stated outright
+INFERRED = 0.6  # Conflicting or indirect statements
+VAGUE = 0.5  # The topic came up but the rules could not read a value
+UNSUPPORTED_SCRIPT = 0.3  # Text in a script the phrase tables do not cover
+
+_SUPPORTED_SCRIPTS = re.compile(f"[A-Za-z{INDIC_LETTER}]")
+_OTHER_LETTERS = re.compile(f"[^\\W\\dA-Za-z_{INDIC_LETTER}]")
+
+MOOD_PHRASES = {
+    "happy": ["happy", "feeling good", "feel good", "feeling great", "feel great", "doing well", "joyful", "खुश", "अच्छा लग", "आनंदी", "छान वाटत", "ખુશ", "સારું લાગ"],
+    "excited": ["excited", "thrilled", "उत्साहित", "उत्सुक", "ઉત્સાહિત"],
+    "calm": ["calm", "relaxed", "peaceful", "शांत", "શાંત"],
+    "anxious": ["anxious", "nervous", "anxiety", "चिंतित", "घबराहट", "घबरा", "अस्वस्थ", "ચિંતિત", "ગભરાટ"],
+    "worried": ["worried", "scared", "afraid", "fear", "डर", "काळजी", "भीती", "ડર", "ચિંતા"],
+    "stressed": ["stressed", "stress", "tense", "overwhelmed", "तनाव", "ताण", "તણાવ"],
+    "sad": ["sad", "feeling down", "feel down", "depressed", "crying", "low mood", "उदास", "दुखी", "दुःखी", "ઉદાસ", "દુઃખી"],
+    "irritable": ["irritable", "irritated", "angry", "cranky", "चिड़चिड़", "चिडचिड", "ચીડિયા"],
+    "tired": ["tired", "exhausted", "थकी", "थका", "थकलेली", "थकले", "થાકેલી", "થાકી"]
+}
+
+ENERGY_PHRASES = {
+    "high": ["energetic", "full of energy", "lots of energy", "more energy", "refreshed",
+             "ऊर्जावान", "ताजगी", "ताज़गी", "उत्साही", "ઊર્જાવાન", "તાજગી"],
+    "medium": ["a bit tired", "a little tired", "bit tired", "okay energy", "some energy",
+               "थोड़ी थकान", "थोड़ा थका", "थोड़ी थकी", "थोडा थकवा", "थोडी थकले", "થોડો થાક", "થોડી થાકેલી"],
+    "low": ["tired", "exhausted", "fatigue", "fatigued", "no energy", "low energy", "weak", "drained", "sleepy",
+            "थकान", "थकी", "थका", "कमजोरी", "कमज़ोरी", "सुस्ती", "थकवा", "थकले", "थकलेली", "अशक्तपणा",
+            "થાક", "થાકેલી", "નબળાઈ", "સુસ્તી"]
+}
+
+EXERCISE_PHRASES = {
+    "walking": ["walk", "walked", "walking", "stroll", "टहल", "सैर", "पैदल", "चालायला", "चाललो", "चालले",
+                "फिरायला", "ચાલવા", "ચાલી", "ફરવા"],
+    "yoga": ["yoga", "योग", "योगा", "યોગ"],
+    "swimming": ["swim", "swam", "swimming", "तैराकी", "पोहणे", "પોહવા", "તરવા"],
+    "stretching": ["stretch", "stretched", "stretching", "स्ट्रेच"],
+    "prenatal class": ["prenatal class", "pregnancy class", "antenatal class"],
+    "exercise": ["exercise", "exercised", "workout", "worked out", "व्यायाम", "कसरत", "કસરત", "વ્યાયામ"]
+}
+
+SLEEP_WORDS = ["sleep", "slept", "nap", "नींद", "सोई", "सोया", "सो गई", "झोप", "झोपले", "झोपलो",
+               "ઊંઘ", "સૂતી", "સૂઈ"]
+WATER_WORDS = ["water", "पानी", "पाणी", "પાણી"]
+LOW_WATER_PHRASES = ["not enough water", "not drinking enough", "less water", "very little water", "कम पानी",
+                     "पानी कम", "पाणी कमी", "कमी पाणी", "ઓછું પાણી", "પાણી ઓછું"]
+CONCERN_MARKERS = ["worried", "worry", "concerned", "anxious", "scared", "afraid", "is it normal", "is this normal",
+                   "should i", "what if", "चिंता", "चिंतित", "डर", "क्या यह सामान्य", "क्या ये सामान्य", "क्या मुझे",
+                   "काळजी", "भीती", "सामान्य आहे का", "ચિંતા", "ડર", "સામાન્ય છે", "શું મારે"]
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+    "ten": 10, "eleven": 11, "twelve": 12, "half": 0.5,
+    "एक": 1, "दो": 2, "तीन": 3, "चार": 4, "पांच": 5, "पाँच": 5, "छह": 6, "छः": 6, "सात": 7, "आठ": 8,
+    "नौ": 9, "दस": 10, "दोन": 2, "पाच": 5, "सहा": 6, "नऊ": 9, "दहा": 10,
+    "એક": 1, "બે": 2, "ત્રણ": 3, "ચાર": 4, "પાંચ": 5, "છ": 6, "સાત": 7, "આઠ": 8, "નવ": 9, "દસ": 10
+}
+_NUMBER = "(\\d+(?:\\.\\d+)?|" + "|".join(sorted(map(re.escape, NUMBER_WORDS), key=len, reverse=True)) + ")"
+_RANGE = f"{_NUMBER}(?:\\s*(?:-|to|or|से|ते|થી)\\s*{_NUMBER})?"
+
+SLEEP_HOURS = re.compile(f"{_RANGE}\\s*(?:hours?|hrs?|h\\b|घंटे|घंटा|घण्टे|तास|કલાક)", re.IGNORECASE)
+WATER_AMOUNT = re.compile(
+    f"{_RANGE}\\s*(glasses|glass|cups?|litres?|liters?|l\\b|bottles?|गिलास|ग्लास|लीटर|लिटर|बोतल|बाटली|"
+    f"ગ્લાસ|લિટર|બોટલ)",
+    re.IGNORECASE
+)
+DURATION_UNITS = {
+    "मिनट": "minutes", "मिनिटे": "minutes", "मिनिट": "minutes", "મિનિટ": "minutes",
+    "घंटे": "hours", "तास": "hours", "કલાક": "hours"
+}
+DURATION = re.compile(f"{_NUMBER}\\s*(minutes?|mins?|hours?|hrs?|मिनट|मिनिटे|मिनिट|घंटे|तास|મિનિટ|કલાક)",
+                      re.IGNORECASE)
+
+WATER_UNITS = {
+    "glass": "glasses", "glasses": "glasses", "गिलास": "glasses", "ग्लास": "glasses", "ગ્લાસ": "glasses",
+    "cup": "cups", "cups": "cups",
+    "l": "liters", "liter": "liters", "liters": "liters", "litre": "liters", "litres": "liters",
+    "लीटर": "liters", "लिटर": "liters", "લિટર": "liters",
+    "bottle": "bottles", "bottles": "bottles", "बोतल": "bottles", "बाटली": "bottles", "બોટલ": "bottles"
+}
+
+_SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s*|\n+")
+
+def _spans(text: str, separator: re.Pattern) -> List[Tuple[int, int]]:
+    """(start, end) of the pieces of text between separators, including empty text as one piece"""
+    spans = []
+    start = 0
+    for match in separator.finditer(text):
+        if match.start() > start:
+            spans.append((start, match.start()))
+        start = max(start, match.end())
+    if start < len(text) or not spans:
+        spans.append((start, len(text)))
+    return spans
+
+def _trie_regex(phrases: List[str], end: str) -> str:
+    """Regex for a set of phrases shaped as a character trie, longest continuation first.
+
+    A flat alternation makes the regex engine try every phrase at every
+    position; the trie shares prefixes, so most positions fail on one
+    character. end is appended where a phrase may stop (e.g. a word boundary).
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = []
+        for char in sorted(node, key=lambda c: c == ""):
+            if char == "":
+                branches.append(end)
+            else:
+                branches.append(("\\s+" if char == " " else re.escape(char)) + build(node[char]))
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return build(trie)
+
+class PhraseTable:
+    """Phrases compiled into one trie-shaped regex; the longest phrase wins where several match.
+
+    Matching is case-sensitive on lowercase phrases, so callers lowercase the text once.
+    """
+
+    def __init__(self, phrases: Dict[str, List[str]]):
+        self.labels = {}
+        for label, variants in phrases.items():
+            for phrase in variants:
+                self.labels.setdefault(phrase.lower(), label)
+        indic = [phrase for phrase in self.labels if re.search(f"[{INDIC_LETTER}]", phrase)]
+        latin = [phrase for phrase in self.labels if phrase not in indic]
+        alternatives = []
+        if latin:
+            alternatives.append("\\b" + _trie_regex(latin, "\\b"))
+        if indic:
+            alternatives.append(f"(?<![{INDIC_LETTER}])" + _trie_regex(indic, ""))
+        self.pattern = re.compile("|".join(alternatives))
+
+    def matches(self, text: str) -> List[Tuple[str, int, int]]:
+        """(label, start, end) for every phrase in text, which must already be lowercased"""
+        return [(self.labels[" ".join(match.group(0).split())], match.start(), match.end())
+                for match in self.pattern.finditer(text)]
+
+    def contains(self, text: str) -> bool:
+        return self.pattern.search(text) is not None
+
+def _number(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    return float(NUMBER_WORDS.get(value.lower()) or value)
+
+def _amount(match: re.Match) -> float:
+    """Single value, or the middle of a range such as "6-7" """
+    low, high = _number(match.group(1)), _number(match.group(2))
+    return (low + high) / 2 if high is not None else low
+
+def _format_number(value: float) -> str:
+    return f"{value:g}"
+
+class TranscriptExtractor:
+    """Rule-based extraction of the daily log fields from a voice transcript.
+
+    Covers English, Hindi, Marathi and Gujarati with compiled phrase tables,
+    so a log takes microseconds instead of an LLM round trip. Every field
+    gets a confidence; fields the rules could only partly read (e.g. "slept
+    badly" without a number, or a script the tables don't cover) can be
+    sent to the LLM as an opt-in fallback, see low_confidence_fields().
+    """
+
+    def __init__(self):
+        self.moods = PhraseTable(MOOD_PHRASES)
+        self.energy = PhraseTable(ENERGY_PHRASES)
+        self.exercise = PhraseTable(EXERCISE_PHRASES)
+        self.sleep_words = PhraseTable({"sleep": SLEEP_WORDS})
+        self.water_words = PhraseTable({"water": WATER_WORDS})
+        self.low_water = PhraseTable({"low": LOW_WATER_PHRASES})
+        self.concern_markers = PhraseTable({"concern": CONCERN_MARKERS})
+
+    def extract(self, transcript: str) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Returns (daily_log, confidence per field between 0 and 1)"""
+        transcript = transcript or ""
+        text = transcript.lower()
+        if len(text) != len(transcript):
+            transcript = text  # Lowercasing changed offsets (rare characters); quote lowercased text
+        clauses = _spans(text, CLAUSE_SPLIT)
+        daily_log = {}
+        confidence = {}
+
+        daily_log["mood"], confidence["mood"] = self._pick_one(self.moods, text, clauses)
+        daily_log["energy_level"], confidence["energy_level"] = self._pick_one(self.energy, text, clauses)
+        daily_log["symptoms"], confidence["symptoms"] = self._symptoms(text)
+        daily_log["sleep_hours"], confidence["sleep_hours"] = self._sleep_hours(text, clauses)
+        daily_log["water_intake"], confidence["water_intake"] = self._water_intake(text, clauses)
+        daily_log["exercise"], confidence["exercise"] = self._exercise(text, clauses)
+        daily_log["concerns"], confidence["concerns"] = self._concerns(transcript, text)
+
+        if _OTHER_LETTERS.search(text) and not _SUPPORTED_SCRIPTS.search(text):
+            confidence = {field: UNSUPPORTED_SCRIPT for field in FIELDS}
+        return daily_log, confidence
+
+    def _positive_matches(self, table: PhraseTable, text: str, clauses: List[Tuple[int, int]]):
+        """(label, clause) for the phrases that are not negated, with the symptom matcher's rules"""
+        found = []
+        for label, start, end in table.matches(text):
+            if negated(text, start, end):
+                continue
+            clause = clauses[bisect.bisect_right(clauses, (start, len(text))) - 1]
+            found.append((label, clause))
+        return found
+
+    def _pick_one(self, table: PhraseTable, text: str, clauses: List[Tuple[int, int]]):
+        """The most frequently stated label (the first one on a tie)"""
+        labels = [label for label, _ in self._positive_matches(table, text, clauses)]
+        if not labels:
+            return "not specified", 0.0
+        counts = {}
+        for label in labels:
+            counts[label] = counts.get(label, 0) + 1
+        best = max(counts, key=lambda label: (counts[label], -labels.index(label)))
+        return best, EXPLICIT if len(counts) == 1 else INFERRED
+
+    def _symptoms(self, text: str):
+        """Canonical symptom names from the symptom matcher's lexicon, so red flags escalate"""
+        found = [match.symptom for match in find_symptoms(text)]
+        return found, EXPLICIT if found else 0.0
+
+    def _clauses_mentioning(self, table: PhraseTable, text: str, clauses: List[Tuple[int, int]]):
+        mentioned = []
+        for _, start, _ in table.matches(text):
+            clause = clauses[bisect.bisect_right(clauses, (start, len(text))) - 1]
+            if clause not in mentioned:
+                mentioned.append(clause)
+        return mentioned
+
+    def _sleep_hours(self, text: str, clauses: List[Tuple[int, int]]):
+        mentioned = self._clauses_mentioning(self.sleep_words, text, clauses)
+        for start, end in mentioned:
+            match = SLEEP_HOURS.search(text, start, end)
+            if match:
+                hours = _amount(match)
+                if 0 < hours <= 16:
+                    return hours, EXPLICIT
+        return None, VAGUE if mentioned else 0.0
+
+    def _water_intake(self, text: str, clauses: List[Tuple[int, int]]):
+        if self.low_water.contains(text):
+            return "low", INFERRED
+        mentioned = self._clauses_mentioning(self.water_words, text, clauses)
+        for start, end in mentioned:
+            match = WATER_AMOUNT.search(text, start, end)
+            if match:
+                unit = WATER_UNITS.get(match.group(3), match.group(3))
+                return f"{_format_number(_amount(match))} {unit}", EXPLICIT
+        return "not specified", VAGUE if mentioned else 0.0
+
+    def _exercise(self, text: str, clauses: List[Tuple[int, int]]):
+        positive = self._positive_matches(self.exercise, text, clauses)
+        activities = {}
+        for label, (start, end) in positive:
+            if label in activities:
+                continue
+            duration = DURATION.search(text, start, end)
+            if duration:
+                unit = DURATION_UNITS.get(duration.group(2), duration.group(2))
+                activities[label] = f"{label} ({_format_number(_number(duration.group(1)))} {unit})"
+            else:
+                activities[label] = label
+        if activities:
+            return ", ".join(activities.values()), EXPLICIT
+        if self.exercise.contains(text):
+            return "none", EXPLICIT  # Only negated mentions ("didn't exercise")
+        return "not specified", 0.0
+
+    def _concerns(self, transcript: str, text: str):
+        sentences = _spans(text, _SENTENCE_END)
+        flagged = set(self._clauses_mentioning(self.concern_markers, text, sentences))
+        concerns = [transcript[start:end].strip() for start, end in sentences
+                    if (start, end) in flagged or text[start:end].rstrip().endswith("?")]
+        if concerns:
+            return concerns, EXPLICIT
+        # Nothing flagged: keep what she said so guidance still sees it
+        return [transcript] if transcript.strip() else [], 0.0
+
+def low_confidence_fields(confidence: Dict[str, float], threshold: float = LOW_CONFIDENCE_THRESHOLD) -> List[str]:
+    """Fields the rules touched on but could not read with confidence (unmentioned fields are not included)"""
+    return [field for field in FIELDS if 0 < confidence.get(field, 0) < threshold]
+
+def merge_llm_fields(daily_log: Dict[str, Any], response: str, fields: List[str]) -> Dict[str, Any]:
+    """Fill the given fields from an LLM's JSON answer, keeping the rule-based value where it has none"""
+    match = re.search(r"\{.*\}", response or "", re.S)
+    if not match:
+        return daily_log
+    try:
+        answer = json.loads(match.group(0))
+    except ValueError:
+        return daily_log
+    if not isinstance(answer, dict):
+        return daily_log
+
+    merged = dict(daily_log)
+    for field in fields:
+        value = answer.get(field)
+        if value in (None, "", [], "not mentioned", "not specified"):
+            continue
+        if field == "sleep_hours":
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+        elif field in ("symptoms", "concerns") and not isinstance(value, list):
+            value = [value]
+        merged[field] = value
+    return merged
+
+_extractor = TranscriptExtractor()
+
+def extract_daily_log(transcript: str) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """Daily log and per-field confidence for a voice transcript (English, Hindi, Marathi, Gujarati)"""
+    return _extractor.extract(transcript)
@@ -0,0 +1,182 @@
+import threading
+import time
+from typing import Callable, List, Dict, Any, Optional, Tuple
+
+DEFAULT_FLUSH_INTERVAL_MS = 5  # How long the flusher lets a batch fill before committing it
+FLUSH_RETRY_DELAY = 1.0  # Seconds to back off after a failed group commit
+
+class PendingWrite:
+    """A log entry waiting in the write-behind queue"""
+
+    def __init__(self, user_id: str, log_entry: Dict, user_profile: Optional[Dict], summary_state: Optional[Dict],
+                 profile_changes: Optional[Dict] = None):
+        self.user_id = user_id
+        self.log_entry = log_entry
+        self.user_profile = user_profile  # Merged profile as seen at enqueue time
+        self.summary_state = summary_state
+        self.profile_changes = profile_changes  # What the caller asked to update, re-merged at commit time
+        self.taken = False  # Part of a batch being committed
+        self._committed = threading.Event()
+
+    @property
+    def committed(self) -> bool:
+        return self._committed.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until the entry has been fsynced by a group commit"""
+        return self._committed.wait(timeout)
+
+class WriteBehindQueue:
+    """In-memory queue of memory writes drained by a background flusher.
+
+    save_log enqueues and returns; every few milliseconds the flusher takes
+    everything queued, writes each user's entries with a single append and
+    fsync (a group commit) and marks them committed. Pending entries are
+    exposed per user so readers in this process still see their own writes.
+
+    The flusher takes the backend's user lock around each commit, and readers
+    overlay pending_for() while holding the same lock, so an entry is always
+    visible exactly once: either still pending or already on disk.
+
+    Profile and summary were computed at enqueue time from this process's
+    view; another worker may have written since. With a rebase callback the
+    flusher recomputes them from storage under the user lock:
+    rebase(user_id, batch) returns the (log_entry, profile update) pairs and
+    the summary state to write.
+    """
+
+    def __init__(self, backend, flush_interval_ms: float = DEFAULT_FLUSH_INTERVAL_MS,
+                 rebase: Callable[[str, List[PendingWrite]], Tuple[List[Tuple[Dict, Optional[Dict]]], Dict]] = None):
+        self.backend = backend
+        self.rebase = rebase
+        self.flush_interval = flush_interval_ms / 1000
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._has_work = threading.Event()
+        self._closing = False
+        self.enqueued = 0
+        self.committed = 0
+        self.batches = 0
+        self.failures = 0
+        self._flusher = threading.Thread(target=self._run, name="memory-write-behind", daemon=True)
+        self._flusher.start()
+
+    def enqueue(self, user_id: str, log_entry: Dict, user_profile: Optional[Dict] = None,
+                summary_state: Optional[Dict] = None, profile_changes: Optional[Dict] = None) -> PendingWrite:
+        """Queue a write; the caller must hold the backend's lock for this user"""
+        write = PendingWrite(user_id, log_entry, user_profile, summary_state, profile_changes)
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("Write-behind queue is closed")
+            self._pending.setdefault(user_id, []).append(write)
+            self.enqueued += 1
+        self._has_work.set()
+        return write
+
+    def pending_for(self, user_id: str) -> List[PendingWrite]:
+        """Writes for a user that have not been committed yet, oldest first"""
+        with self._lock:
+            return list(self._pending.get(user_id, ()))
+
+    def has_pending(self, user_id: str) -> bool:
+        with self._lock:
+            return user_id in self._pending
+
+    def cancel(self, write: PendingWrite) -> bool:
+        """Take a write back out of the queue, unless a commit already picked it up"""
+        with self._lock:
+            writes = self._pending.get(write.user_id, [])
+            if write.taken or write not in writes:
+                return False
+            writes.remove(write)
+            if not writes:
+                del self._pending[write.user_id]
+            return True
+
+    def flush(self) -> int:
+        """Group-commit everything queued so far; returns the number of entries written"""
+        with self._lock:
+            user_ids = list(self._pending)
+
+        written = 0
+        for user_id in user_ids:
+            with self.backend.lock_user(user_id):
+                with self._lock:
+                    batch = list(self._pending.get(user_id, ()))
+                    for write in batch:
+                        write.taken = True
+                if not batch:
+                    continue
+
+                try:
+                    if self.rebase:
+                        writes, summary_state = self.rebase(user_id, batch)
+                    else:
+                        writes = [(write.log_entry, write.user_profile) for write in batch]
+                        summary_state = batch[-1].summary_state
+                    self.backend.append_logs(user_id, writes, fsync=True, summary_state=summary_state)
+                except Exception:
+                    with self._lock:
+                        for write in batch:
+                            write.taken = False
+                    raise
+
+                with self._lock:
+                    remaining = [write for write in self._pending[user_id] if not write.taken]
+                    if remaining:
+                        self._pending[user_id] = remaining
+                    else:
+                        del self._pending[user_id]
+                    self.committed += len(batch)
+                    self.batches += 1
+
+            for write in batch:
+                write._committed.set()
+            written += len(batch)
+        return written
+
+    def close(self):
+        """Stop accepting writes and drain everything still queued"""
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+        self._has_work.set()
+        self._flusher.join()
+
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"❌ Memory write-behind drain failed, {self.stats()['pending']} entries not saved: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": sum(len(writes) for writes in self._pending.values()),
+                "enqueued": self.enqueued,
+                "committed": self.committed,
+                "batches": self.batches,
+                "failures": self.failures,
+                "flush_interval_ms": self.flush_interval * 1000
+            }
+
+    def _run(self):
+        while True:
+            self._has_work.wait()
+            if self._closing:
+                return  # close() performs the final drain
+
+            # Give concurrent requests a moment to join this batch
+            time.sleep(self.flush_interval)
+            self._has_work.clear()
+            if self._closing:
+                return  # close() may have set the event we just cleared
+
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️  Memory write-behind flush failed, retrying: {e}")
+                with self._lock:
+                    self.failures += 1
+                self._has_work.set()
+                time.sleep(FLUSH_RETRY_DELAY)
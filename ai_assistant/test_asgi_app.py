@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import asyncio
+import contextlib
+import threading
+import time
+
+from starlette.testclient import TestClient
+
+import asgi_app
+from agents.async_client import AsyncLocalAIClient
+from test_serving import record_priorities, time_out_queued_generations
+from test_streaming import TOKENS, serving
+
+ANSWER = "".join(TOKENS)
+
+@contextlib.contextmanager
+def asgi_serving(delay=0.0):
+    """The ASGI app on a stand-in Ollama, with a fresh async client wrapping the stand-in's client"""
+    with serving(asgi_app, delay) as (server, client):
+        saved = asgi_app.ai
+        asgi_app.ai = AsyncLocalAIClient(client)
+        try:
+            with TestClient(asgi_app.app) as http:  # Runs the lifespan, so the app closes its own clients
+                yield server, client, http
+        finally:
+            asgi_app.ai = saved
+
+def test_monitor():
+    with asgi_serving() as (server, client, http):
+        response = http.post("/monitor", json={"symptoms": ["severe headache"], "text": "blurred vision since morning"})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["check"]["status"] == "alert" and body["escalation"]["escalated"]
+        assert server.generations == 0
+
+def test_guidance_and_history():
+    with asgi_serving() as (server, client, http):
+        for week in (21, 22):
+            response = http.post("/guidance", json={"user_id": "a1", "week": week,
+                                                    "daily_log": {"mood": "good", "symptoms": []}})
+            assert response.status_code == 200
+            body = response.json()
+            assert body["guidance"] == ANSWER and body["source"] == "AI-powered (ollama)" and not body["degraded"]
+        assert body["has_memory"] and body["symptom_analysis"]["status"] == "normal"
+
+        response = http.get("/history/a1")
+        assert response.status_code == 200
+        assert response.json()["total_logs"] == 2
+        assert [log["week"] for log in response.json()["logs"]] == [21, 22]
+
+def test_voice_guidance():
+    with asgi_serving() as (server, client, http):
+        response = http.post("/voice-guidance", json={"user_id": "a2", "week": 30,
+                                                      "transcript": "heavy bleeding since morning"})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["guidance"] == ANSWER and body["symptom_analysis"]["status"] == "alert"
+        assert body["escalation"]["escalated"]
+
+        assert http.post("/voice-guidance", json={"user_id": "a2"}).status_code == 400
+
+        # Only a voice log with an alert jumps the generation queue
+        priorities = record_priorities(client.scheduler)
+        http.post("/voice-guidance", json={"user_id": "a2", "transcript": "I feel happy and slept 8 hours"})
+        http.post("/voice-guidance", json={"user_id": "a2", "transcript": "severe headache and blurred vision"})
+        assert priorities == ["interactive", "urgent"]
+
+def test_rejection_after_save_answers_degraded():
+    with asgi_serving() as (server, client, http):
+        time_out_queued_generations(client.scheduler)
+        response = http.post("/guidance", json={"user_id": "a7", "week": 22, "daily_log": {"mood": "ok"}})
+        assert response.status_code == 200 and response.json()["degraded"]
+        response = http.post("/voice-guidance", json={"user_id": "a7", "transcript": "I feel tired"})
+        assert response.status_code == 200 and response.json()["degraded"]
+        assert http.get("/history/a7").json()["total_logs"] == 2
+
+        assert http.post("/chat", json={"user_id": "a7", "message": "Hi"}).status_code == 503
+
+def test_chat():
+    with asgi_serving() as (server, client, http):
+        response = http.post("/chat", json={"user_id": "a3", "message": "How should I sleep?"})
+        assert response.status_code == 200
+        assert response.json()["guidance"] == ANSWER and response.json()["user_id"] == "a3"
+        assert http.post("/chat", json={"user_id": "a3", "message": "  "}).status_code == 400
+
+        # Ollama failing: the rule-based answer, still a 200
+        server.failing = True
+        response = http.post("/chat", json={"user_id": "a4", "message": "How should I sleep?"})
+        assert response.status_code == 200 and response.json()["guidance"]
+
+def test_generate_reminders():
+    with asgi_serving() as (server, client, http):
+        response = http.post("/generate-reminders", json={
+            "user_id": "a5", "user_profile": {"pregnancy_week": 24},
+            "voice_logs": [{"transcript": "I feel tired", "symptoms": ["fatigue"]}]
+        })
+        assert response.status_code == 200
+        body = response.json()
+        assert isinstance(body["reminders"], list) and body["based_on_logs"] == 1
+        assert server.generations == 1
+
+        assert http.post("/generate-reminders", json={"user_id": "a5"}).status_code == 400
+
+def test_stats():
+    with asgi_serving() as (server, client, http):
+        http.post("/chat", json={"user_id": "a6", "message": "Hi"})
+        response = http.get("/stats")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["single_flight"]["executions"] == 1
+        assert body["generation_queue"]["active"] == 0
+
+def test_async_and_sync_share_cache_and_single_flight():
+    with serving(asgi_app, delay=0.3) as (server, client):
+        ai = AsyncLocalAIClient(client)
+
+        # A cached answer from the sync client serves the async one
+        assert client.generate_response("Cached?", "You are kind.", use_cache=True) == ANSWER
+        assert asyncio.run(ai.generate_response("Cached?", "You are kind.", use_cache=True)) == ANSWER
+        assert server.generations == 1 and client.response_cache.stats()["hits"] == 1
+
+        # Sync leader, async follower
+        answers = []
+        leader = threading.Thread(target=lambda: answers.append(client.generate_response("Shared?", "You are kind.")))
+        leader.start()
+        time.sleep(0.1)
+        answers.append(asyncio.run(ai.generate_response("Shared?", "You are kind.")))
+        leader.join()
+
+        # Async leader, sync follower
+        async def async_leader():
+            generation = asyncio.ensure_future(ai.generate_response("Again?", "You are kind."))
+            await asyncio.sleep(0.1)
+            follower = await asyncio.to_thread(client.generate_response, "Again?", "You are kind.")
+            return [await generation, follower]
+
+        async def run():
+            try:
+                return await async_leader()
+            finally:
+                await ai.aclose()
+
+        answers += asyncio.run(run())
+        assert answers == [ANSWER] * 4
+        assert server.generations == 3
+        stats = client.single_flight.stats()
+        assert stats["deduplicated"] == 2 and stats["in_flight"] == 0
+
+if __name__ == "__main__":
+    test_monitor()
+    test_guidance_and_history()
+    test_voice_guidance()
+    test_rejection_after_save_answers_degraded()
+    test_chat()
+    test_generate_reminders()
+    test_stats()
+    test_async_and_sync_share_cache_and_single_flight()
+    print("✅ ASGI app tests passed")
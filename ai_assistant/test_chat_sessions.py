@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agents.chat_sessions import ChatSessionStore, ChatTurn
+from agents.pregnancy_assistant import LocalAIClient
+from services.pregnancy_memory import PregnancyMemory
+
+HISTORY = "User Profile: week 20\nRecent Pregnancy Journey:\nWeek 20: mood good"
+
+def test_resume_stale_and_invalidate():
+    store = ChatSessionStore()
+    session = store.start("u1", "fp-a")
+    assert not session.resumed
+    store.save(session, [1, 2, 3], "http://node-1")
+
+    session = store.start("u1", "fp-a")
+    assert session.resumed and session.tokens.tolist() == [1, 2, 3]
+    assert session.host == "http://node-1" and session.turns == 1
+
+    # A different history, system prompt, language or model starts over
+    assert not store.start("u1", "fp-b").resumed
+    assert store.get("u1") is None
+
+    store.save(store.start("u1", "fp-a"), [4])
+    store.invalidate("u1")
+    store.invalidate("u1")  # Nothing left to drop
+    stats = store.stats()
+    assert stats["hits"] == 1 and stats["stale"] == 1 and stats["invalidations"] == 1 and stats["sessions"] == 0
+
+def test_bounded_by_count_tokens_and_idle_time():
+    store = ChatSessionStore(max_sessions=2, max_tokens=5, idle_timeout=0.05)
+    for user in ("u1", "u2", "u3"):
+        store.save(store.start(user, "fp"), [1, 2])
+    assert store.get("u1") is None and store.stats()["evictions"] == 1
+
+    # A conversation that outgrows the context window is dropped
+    store.save(store.start("u2", "fp"), [1, 2, 3, 4, 5, 6])
+    assert store.get("u2") is None and store.stats()["overflows"] == 1
+
+    time.sleep(0.1)
+    assert not store.start("u3", "fp").resumed
+    assert store.stats()["expirations"] == 1
+
+def test_save_log_invalidates_session():
+    store = ChatSessionStore()
+    with tempfile.TemporaryDirectory() as data_dir:
+        memory = PregnancyMemory(data_dir, backend="jsonl")
+        memory.add_save_listener(store.invalidate)
+        store.save(store.start("u1", "fp"), [1, 2, 3])
+        memory.save_log("u1", 21, {"mood": "tired"})
+        assert store.get("u1") is None
+        memory.close()
+
+def start_stand_in_ollama():
+    """Ollama look-alike that records generate payloads and grows the context by one token per turn"""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def reply(self, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self.reply({"models": []})
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if "prompt" not in payload:
+                return self.reply({"done": True})
+            self.server.payloads.append(payload)
+            context = payload.get("context", []) + [len(self.server.payloads)]
+            self.reply({"response": "answer", "done": True, "context": context})
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.payloads = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def test_follow_up_sends_only_the_message():
+    server = start_stand_in_ollama()
+    client = LocalAIClient(hosts=[f"127.0.0.1:{server.server_address[1]}"])
+    try:
+        assert client.ready.wait(5) and client.model_loaded
+        first = f"{HISTORY}\n\nUser's question: Is back pain normal?"
+        client.generate_response(first, "You are kind.", task="chat",
+                                 chat_turn=ChatTurn("u1", "Is back pain normal?", HISTORY))
+        assert server.payloads[-1]["prompt"].startswith("System: You are kind.")
+        assert "context" not in server.payloads[-1]
+
+        client.generate_response(f"{HISTORY}\n\nUser's question: And sleep?", "You are kind.", task="chat",
+                                 chat_turn=ChatTurn("u1", "And sleep?", HISTORY))
+        assert server.payloads[-1]["prompt"] == "User: And sleep?\n\nAssistant:"
+        assert server.payloads[-1]["context"] == [1]
+
+        # Streaming continues the same conversation
+        answer = "".join(client.stream_response("unused", "You are kind.", task="chat",
+                                                chat_turn=ChatTurn("u1", "Thanks!", HISTORY)))
+        assert answer == "answer" and server.payloads[-1]["context"] == [1, 2]
+        assert client.chat_sessions.get("u1").turns == 3
+
+        # Another user asking the same thing starts a conversation of their own
+        client.generate_response(first, "You are kind.", task="chat",
+                                 chat_turn=ChatTurn("u2", "Is back pain normal?", HISTORY))
+        assert "context" not in server.payloads[-1]
+
+        # A new log in the history sends the full prompt again
+        changed = HISTORY + "\nWeek 21: mood tired"
+        client.generate_response(f"{changed}\n\nUser's question: And sleep?", "You are kind.", task="chat",
+                                 chat_turn=ChatTurn("u1", "And sleep?", changed))
+        assert "context" not in server.payloads[-1] and "Week 21" in server.payloads[-1]["prompt"]
+        assert client.chat_sessions.stats()["stale"] == 1
+    finally:
+        client.close()
+        client.session.close()
+        server.shutdown()
+
+if __name__ == "__main__":
+    test_resume_stale_and_invalidate()
+    test_bounded_by_count_tokens_and_idle_time()
+    test_save_log_invalidates_session()
+    test_follow_up_sends_only_the_message()
+    print("✅ Chat session tests passed")
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+
+from services import memory_backends
+from services.pregnancy_memory import PregnancyMemory, build_journey_summary
+
+def _sample_logs():
+    return [
+        {"week": 8, "daily_log": {"mood": "tired", "symptoms": ["nausea"], "concerns": ["morning sickness"]}},
+        {"week": 12, "daily_log": {"mood": "better", "symptoms": [], "concerns": []}},
+        {"week": 16, "daily_log": {"mood": "excited", "symptoms": [], "concerns": ["when will I feel movement?"]}},
+    ]
+
+def test_jsonl_matches_legacy_json():
+    """Both layouts return the same logs, profile and journey summary"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        legacy = PregnancyMemory(os.path.join(data_dir, "json"), backend="json")
+        appendonly = PregnancyMemory(os.path.join(data_dir, "jsonl"), backend="jsonl")
+
+        for log in _sample_logs():
+            for memory in (legacy, appendonly):
+                memory.save_log("u1", log["week"], log["daily_log"], {"age": 28, "first_pregnancy": True})
+
+        for memory in (legacy, appendonly):
+            assert [log["week"] for log in memory.get_recent_logs("u1", limit=2)] == [12, 16]
+            assert memory.get_user_profile("u1") == {"age": 28, "first_pregnancy": True}
+
+        # The summary only carries the date part of each timestamp
+        assert legacy.get_pregnancy_journey_summary("u1") == appendonly.get_pregnancy_journey_summary("u1")
+
+        # One line per log, and an unchanged profile is only recorded once
+        with open(appendonly.backend.get_log_file("u1"), encoding="utf-8") as f:
+            assert len(f.readlines()) == 3
+        with open(appendonly.backend.get_profile_file("u1"), encoding="utf-8") as f:
+            assert len(f.readlines()) == 1
+
+def test_json_stays_the_default_and_jsonl_needs_migration():
+    """An upgrade never changes the layout of existing data on its own"""
+    saved = {name: os.environ.pop(name, None) for name in ("MEMORY_BACKEND", "MEMORY_AUTO_MIGRATE")}
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            memory = PregnancyMemory(data_dir)
+            assert memory.backend.name == "json"
+            memory.save_log("u1", 10, {"mood": "ok"})
+
+            try:
+                PregnancyMemory(data_dir, backend="jsonl")
+                assert False, "expected jsonl to refuse unmigrated legacy files"
+            except RuntimeError as e:
+                assert "python -m services.pregnancy_memory" in str(e)
+            assert os.path.exists(memory.backend.get_user_file("u1"))  # Untouched
+    finally:
+        for name, value in saved.items():
+            if value is not None:
+                os.environ[name] = value
+
+def test_legacy_file_is_migrated():
+    """With auto_migrate, a user_<id>.json document is converted on first access"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        legacy = PregnancyMemory(data_dir, backend="json")
+        for log in _sample_logs():
+            legacy.save_log("u2", log["week"], log["daily_log"], {"age": 31})
+
+        memory = PregnancyMemory(data_dir, backend=memory_backends.JSONLFileBackend(data_dir, auto_migrate=True))
+        memory.save_log("u2", 20, {"mood": "happy"}, {"first_pregnancy": False})
+
+        assert not os.path.exists(memory.backend.get_user_file("u2"))
+        assert os.path.exists(memory.backend.get_user_file("u2") + ".migrated")
+        assert [log["week"] for log in memory.get_recent_logs("u2", limit=10)] == [8, 12, 16, 20]
+        assert memory.get_user_profile("u2") == {"age": 31, "first_pregnancy": False}
+
+def test_migrate_all():
+    with tempfile.TemporaryDirectory() as data_dir:
+        legacy = PregnancyMemory(data_dir, backend="json")
+        legacy.save_log("a", 10, {"mood": "ok"})
+        legacy.save_log("b", 11, {"mood": "ok"})
+
+        backend = memory_backends.JSONLFileBackend(data_dir, auto_migrate=True)
+        assert backend.legacy_users() == ["a", "b"]
+        assert backend.migrate_all() == 2
+        assert backend.migrate_all() == 0
+        with open(backend.get_log_file("a"), encoding="utf-8") as f:
+            assert json.loads(f.readline())["week"] == 10
+
+        # Once migrated, jsonl opens without auto_migrate
+        memory = PregnancyMemory(data_dir, backend="jsonl")
+        assert [log["week"] for log in memory.get_recent_logs("b")] == [11]
+
+def test_corrupt_legacy_file_is_quarantined():
+    """An unreadable user_<id>.json is moved aside instead of failing every access"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        memory = PregnancyMemory(data_dir, backend=memory_backends.JSONLFileBackend(data_dir, auto_migrate=True))
+        legacy_path = memory.backend.get_user_file("u3")
+        with open(legacy_path, "w", encoding="utf-8") as f:
+            f.write('{"logs": [{"week": 8')
+
+        assert memory.get_recent_logs("u3") == []
+        assert not os.path.exists(legacy_path)
+        assert [name for name in os.listdir(data_dir) if name.startswith("user_u3.json.corrupt-")]
+
+        memory.save_log("u3", 9, {"mood": "ok"})
+        assert [log["week"] for log in memory.get_recent_logs("u3")] == [9]
+        assert memory.backend.migrate_all() == 0
+
+def test_stale_temp_files_are_removed():
+    """Temp files of every atomically written file are cleaned up once stale, fresh ones kept"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        stale = ["user_u4.json.abc123.tmp", "user_u4.profile.jsonl.def456.tmp", "summary_u4.json.ghi789.tmp"]
+        fresh = "summary_u5.json.jkl012.tmp"
+        old = os.path.getmtime(data_dir) - memory_backends.STALE_TEMP_FILE_SECONDS - 10
+        for name in stale + [fresh, "notes.tmp"]:
+            with open(os.path.join(data_dir, name), "w", encoding="utf-8") as f:
+                f.write("partial")
+            if name != fresh:
+                os.utime(os.path.join(data_dir, name), (old, old))
+
+        PregnancyMemory(data_dir, backend="jsonl").close()
+        assert sorted(name for name in os.listdir(data_dir) if name.endswith(".tmp")) == ["notes.tmp", fresh]
+
+def test_tail_reader_spans_blocks():
+    """Recent logs come from the end of the file even across many small blocks"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        memory = PregnancyMemory(data_dir, backend="jsonl")
+        for week in range(1, 41):
+            memory.save_log("u3", week, {"mood": "मिश्रित", "concerns": ["x" * week]})
+
+        # Simulate a writer that crashed halfway through a line
+        with open(memory.backend.get_log_file("u3"), "a", encoding="utf-8") as f:
+            f.write('{"timestamp": "2025-')
+
+        block_size = memory_backends.TAIL_BLOCK_SIZE
+        memory_backends.TAIL_BLOCK_SIZE = 64
+        try:
+            assert [log["week"] for log in memory.get_recent_logs("u3", limit=5)] == [36, 37, 38, 39, 40]
+            assert len(memory.get_recent_logs("u3", limit=100)) == 40
+            assert memory.get_recent_logs("u3", limit=1)[0]["daily_log"]["mood"] == "मिश्रित"
+        finally:
+            memory_backends.TAIL_BLOCK_SIZE = block_size
+
+def test_snapshot_from_save_log():
+    """save_log returns the updated snapshot, matching a fresh load in both layouts"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        for backend in ("json", "jsonl", "sqlite"):
+            memory = PregnancyMemory(os.path.join(data_dir, backend), backend=backend)
+            for log in _sample_logs():
+                snapshot = memory.save_log("u4", log["week"], log["daily_log"], {"age": 28})
+
+            loaded = memory.load_snapshot("u4")
+            assert snapshot.get_recent_logs(limit=10) == loaded.get_recent_logs(limit=10)
+            assert snapshot.get_user_profile() == loaded.get_user_profile() == {"age": 28}
+            assert snapshot.get_pregnancy_journey_summary() == memory.get_pregnancy_journey_summary("u4")
+            assert memory.load_snapshot("nobody").get_pregnancy_journey_summary() == "This is the user's first log entry."
+            memory.close()
+
+def test_snapshot_cache():
+    """Repeated reads are served from the cache until another writer touches the file"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        memory = PregnancyMemory(data_dir, backend="jsonl", cache_size=2)
+        memory.save_log("u5", 10, {"mood": "ok"}, {"age": 30})
+        memory.get_pregnancy_journey_summary("u5")
+        memory.get_recent_logs("u5", limit=3)
+        assert memory.cache_stats()["hits"] == 2
+
+        # A second worker appends through its own PregnancyMemory instance
+        other_worker = PregnancyMemory(data_dir, backend="jsonl")
+        other_worker.save_log("u5", 11, {"mood": "tired"})
+        misses = memory.cache_stats()["misses"]
+        assert [log["week"] for log in memory.get_recent_logs("u5")] == [10, 11]
+        assert memory.cache_stats()["misses"] == misses + 1
+
+        memory.load_snapshot("u6")
+        memory.load_snapshot("u7")
+        stats = memory.cache_stats()
+        assert stats["size"] == 2
+        assert stats["evictions"] == 1
+
+def test_sqlite_backend():
+    """SQLite keeps the same API and adds cross-user queries"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        memory = PregnancyMemory(data_dir, backend="sqlite", cache_size=0)
+        for log in _sample_logs():
+            memory.save_log("u8", log["week"], log["daily_log"], {"age": 25})
+        memory.save_log("u9", 12, {"mood": "calm"}, {"age": 33})
+
+        assert [log["week"] for log in memory.get_recent_logs("u8", limit=2)] == [12, 16]
+        assert len(memory.get_recent_logs("u8", limit=50)) == 3
+        assert memory.get_user_profile("u9") == {"age": 33}
+        assert memory.get_recent_logs("u8", limit=1)[0]["daily_log"]["concerns"] == ["when will I feel movement?"]
+        assert sorted(log["user_id"] for log in memory.backend.find_logs(week=12)) == ["u8", "u9"]
+
+        journal_mode = memory.backend._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        assert journal_mode == "wal"
+        memory.close()
+
+def _write_from_worker(data_dir, backend, worker, count):
+    memory = PregnancyMemory(data_dir, backend=backend)
+    for i in range(count):
+        memory.save_log("shared", 20, {"mood": f"worker {worker} entry {i}"}, {f"worker_{worker}": True})
+
+def test_concurrent_writers_do_not_lose_entries():
+    """Threads and separate processes writing the same user keep every entry"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        for backend in ("json", "jsonl"):
+            backend_dir = os.path.join(data_dir, backend)
+            PregnancyMemory(backend_dir, backend=backend)
+
+            workers = [multiprocessing.Process(target=_write_from_worker, args=(backend_dir, backend, w, 15)) for w in range(3)]
+            workers += [threading.Thread(target=_write_from_worker, args=(backend_dir, backend, w, 15)) for w in range(3, 5)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+            memory = PregnancyMemory(backend_dir, backend=backend)
+            logs = memory.get_recent_logs("shared", limit=1000)
+            assert len(logs) == 75, backend
+            assert len({log["daily_log"]["mood"] for log in logs}) == 75
+            assert memory.get_user_profile("shared") == {f"worker_{w}": True for w in range(5)}
+
+def test_torn_append_is_repaired():
+    """A partial line from a crashed writer is dropped before the next append"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        memory = PregnancyMemory(data_dir, backend="jsonl")
+        memory.save_log("u10", 10, {"mood": "ok"})
+        with open(memory.backend.get_log_file("u10"), "a", encoding="utf-8") as f:
+            f.write('{"timestamp": "2025-01-01T00:00:00", "week": 1')
+
+        memory.save_log("u10", 11, {"mood": "fine"})
+        with open(memory.backend.get_log_file("u10"), encoding="utf-8") as f:
+            assert [json.loads(line)["week"] for line in f] == [10, 11]
+
+def test_write_behind_queue():
+    """Queued writes are visible immediately, group-committed and drained on close"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        memory = PregnancyMemory(data_dir, backend="jsonl", cache_size=0,
+                                 write_behind=True, durability="async")
+        memory.write_queue.flush_interval = 0.2  # Long enough to observe queued entries
+
+        threads = [threading.Thread(target=memory.save_log, args=("u11", week, {"mood": "ok"}, {"age": 29}))
+                   for week in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Nothing is on disk yet, but reads in this process see every write
+        assert not os.path.exists(memory.backend.get_log_file("u11"))
+        assert len(memory.get_recent_logs("u11", limit=10)) == 8
+        assert memory.get_user_profile("u11") == {"age": 29}
+
+        memory.save_log("u11", 9, {"mood": "calm"}, durability="sync")
+        stats = memory.write_queue_stats()
+        assert stats["pending"] == 0 and stats["committed"] == 9
+        assert stats["batches"] < 9
+
+        memory.save_log("u11", 10, {"mood": "last"})
+        memory.close()
+        reopened = PregnancyMemory(data_dir, backend="jsonl")
+        assert [log["week"] for log in reopened.get_recent_logs("u11", limit=2)] == [9, 10]
+        assert len(reopened.get_recent_logs("u11", limit=20)) == 10
+
+def test_write_behind_with_another_writer():
+    """A queued entry is re-merged on commit with what another worker saved meanwhile"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        queued = PregnancyMemory(data_dir, backend="jsonl", cache_size=0, write_behind=True, durability="async")
+        queued.write_queue.flush_interval = 0.5
+        direct = PregnancyMemory(data_dir, backend="jsonl", cache_size=0)
+
+        queued.save_log("u14", 10, {"mood": "ok"}, {"age": 30})
+        direct.save_log("u14", 11, {"mood": "calm"}, {"city": "Pune"})
+        queued.close()
+
+        reopened = PregnancyMemory(data_dir, backend="jsonl", cache_size=0)
+        assert reopened.get_user_profile("u14") == {"age": 30, "city": "Pune"}
+        logs = reopened.get_recent_logs("u14", limit=5)
+        assert [log["week"] for log in logs] == [11, 10]  # Commit order
+        assert logs[0]["timestamp"] < logs[1]["timestamp"]
+        summary = reopened.get_pregnancy_journey_summary("u14")
+        assert "Week 11" in summary and "Week 10" in summary
+        assert reopened.backend.read_summary("u14")["through"] == logs[1]["timestamp"]  # Stored, not rebuilt
+
+def test_sync_save_does_not_wait_for_stuck_flusher():
+    with tempfile.TemporaryDirectory() as data_dir:
+        memory = PregnancyMemory(data_dir, backend="jsonl", cache_size=0, write_behind=True, durability="sync")
+        memory.write_queue.flush_interval = 1.0  # Slower than the sync timeout
+        memory.sync_timeout = 0.05
+
+        memory.save_log("u15", 12, {"mood": "ok"})
+        assert memory.write_queue_stats()["pending"] == 0
+        assert [log["week"] for log in memory.backend.read_recent_logs("u15", 5)] == [12]
+        memory.write_queue.flush()  # Nothing left to write twice
+        assert len(memory.backend.read_recent_logs("u15", 5)) == 1
+
+def test_materialized_summary_matches_rebuild():
+    """The rolling summary stored by save_log equals a from-scratch rebuild"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        for backend in ("json", "jsonl", "sqlite"):
+            memory = PregnancyMemory(os.path.join(data_dir, backend), backend=backend)
+            for week in range(1, 16):
+                profile = {"age": 28, "first_pregnancy": week < 8}
+                daily_log = {"mood": "ok", "energy_level": "low", "symptoms": ["nausea"] if week % 2 else []}
+                snapshot = memory.save_log("u12", week, daily_log, profile)
+
+            reopened = PregnancyMemory(os.path.join(data_dir, backend), backend=backend)
+            expected = build_journey_summary(reopened.backend.read_recent_logs("u12", 10), reopened.get_user_profile("u12"))
+            assert snapshot.get_pregnancy_journey_summary() == expected
+            assert reopened.get_pregnancy_journey_summary("u12") == expected
+            assert reopened.backend.read_summary("u12")["text"] == expected
+            memory.close()
+            reopened.close()
+
+def test_stale_summary_is_rebuilt():
+    """A summary that does not cover the newest log is ignored"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        memory = PregnancyMemory(data_dir, backend="jsonl", cache_size=0)
+        memory.save_log("u13", 10, {"mood": "ok"})
+        # A log appended without its summary, as if the writer died in between
+        memory.backend.append_logs("u13", [({"timestamp": "2099-01-01T00:00:00", "week": 11, "daily_log": {"mood": "new"}}, None)])
+
+        summary = memory.get_pregnancy_journey_summary("u13")
+        assert "Week 11 (2099-01-01): Mood: new" in summary
+
+if __name__ == "__main__":
+    test_jsonl_matches_legacy_json()
+    test_json_stays_the_default_and_jsonl_needs_migration()
+    test_legacy_file_is_migrated()
+    test_migrate_all()
+    test_corrupt_legacy_file_is_quarantined()
+    test_stale_temp_files_are_removed()
+    test_tail_reader_spans_blocks()
+    test_snapshot_from_save_log()
+    test_snapshot_cache()
+    test_sqlite_backend()
+    test_concurrent_writers_do_not_lose_entries()
+    test_torn_append_is_repaired()
+    test_write_behind_queue()
+    test_write_behind_with_another_writer()
+    test_sync_save_does_not_wait_for_stuck_flusher()
+    test_materialized_summary_matches_rebuild()
+    test_stale_summary_is_rebuilt()
+    print("✅ Memory storage tests passed")
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agents.ollama_health import CircuitBreaker, OllamaHealthMonitor
+from agents.ollama_pool import OllamaPool
+from agents.pregnancy_assistant import LocalAIClient, build_task_routes, OLLAMA_MODEL, TURN_STOPS
+from agents.response_cache import ResponseCache, make_cache_key
+from agents.scheduler import GenerationScheduler, QueueFullError, QueueTimeoutError, DeadlineExceeded
+from agents.single_flight import SingleFlight
+
+def test_circuit_breaker_transitions():
+    """closed -> open after repeated failures -> half_open after the timeout -> closed on success"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    time.sleep(0.15)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()  # The single trial request
+    assert not breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.15)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["times_opened"] == 2
+
+def test_health_probe_recovers_breaker():
+    """A healthy probe closes an open breaker without waiting for the reset timeout"""
+    healthy = [False]
+    recoveries = []
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    monitor = OllamaHealthMonitor(lambda: healthy[0], breaker, interval=0.05,
+                                  on_recover=lambda: recoveries.append(time.time()))
+
+    assert not monitor.check_once()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    monitor.start()
+    healthy[0] = True
+    time.sleep(0.2)
+    monitor.stop()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert monitor.last_healthy is not None
+    assert len(recoveries) == 1  # Only the unhealthy -> healthy transition, not every probe
+
+def test_response_cache():
+    """Keys ignore whitespace differences; entries are evicted by LRU and expire after the TTL"""
+    options = {"temperature": 0.7}
+    key = make_cache_key("Week 20\n    tips", "system", "english", "llama3.2", options)
+    assert key == make_cache_key("  Week 20 tips ", "system", "english", "llama3.2", options)
+    assert key != make_cache_key("Week 20 tips", "system", "hindi", "llama3.2", options)
+    assert key != make_cache_key("Week 20 tips", "system", "english", "llama3.2", {"temperature": 0.2})
+
+    cache = ResponseCache(max_size=2, ttl=0.1)
+    cache.put("a", "answer a")
+    cache.put("b", "answer b")
+    assert cache.get("a") == "answer a"
+    cache.put("c", "answer c")  # Evicts "b", the least recently used
+    assert cache.get("b") is None
+    assert cache.get("c") == "answer c"
+
+    time.sleep(0.15)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["evictions"] == 1 and stats["expirations"] == 1
+
+def test_single_flight_shares_result():
+    """Concurrent calls with one key run the function once; errors reach every caller"""
+    flight = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def slow_generation():
+        runs.append(1)
+        release.wait(2)
+        return "shared answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", slow_generation))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()["deduplicated"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["shared answer"] * 4
+    assert len(runs) == 1
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "deduplicated": 3}
+
+    def failing_generation():
+        raise RuntimeError("model crashed")
+    try:
+        flight.do("key", failing_generation)
+        assert False, "expected the error to propagate"
+    except RuntimeError:
+        pass
+
+def test_single_flight_released_on_interrupt():
+    """A leader stopped by a BaseException still releases the key and wakes its followers"""
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def interrupted():
+        started.set()
+        release.wait(2)
+        raise KeyboardInterrupt
+
+    def leader():
+        try:
+            flight.do("key", interrupted)
+        except KeyboardInterrupt:
+            pass
+
+    errors = []
+
+    def follower():
+        try:
+            flight.do("key", lambda: "not run", timeout=2)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=leader)]
+    threads[0].start()
+    started.wait(1)
+    threads.append(threading.Thread(target=follower))
+    threads[1].start()
+    while flight.stats()["deduplicated"] < 1:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 1 and isinstance(errors[0], RuntimeError) and "interrupted" in str(errors[0])
+    assert flight.stats()["in_flight"] == 0
+    assert flight.do("key", lambda: "runs again") == "runs again"
+
+def test_single_flight_followers_keep_own_deadline():
+    """A follower whose leader ran out of budget runs the call again instead of failing with it"""
+    flight = SingleFlight()
+    started = threading.Event()
+    runs = []
+
+    def short_budget():
+        runs.append("leader")
+        started.set()
+        time.sleep(0.1)
+        raise DeadlineExceeded("leader out of budget")
+
+    def retry(error):
+        return isinstance(error, DeadlineExceeded)
+
+    outcomes = {}
+
+    def leader():
+        try:
+            flight.do("key", short_budget)
+        except DeadlineExceeded as e:
+            outcomes["leader"] = e
+
+    def follower(name, retry_if):
+        try:
+            outcomes[name] = flight.do("key", lambda: runs.append(name) or "answer", timeout=2, retry_if=retry_if)
+        except DeadlineExceeded as e:
+            outcomes[name] = e
+
+    threads = [threading.Thread(target=leader)]
+    threads[0].start()
+    started.wait(1)
+    threads += [threading.Thread(target=follower, args=("patient", retry)),
+                threading.Thread(target=follower, args=("expired", lambda error: False))]
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert isinstance(outcomes["leader"], DeadlineExceeded) and isinstance(outcomes["expired"], DeadlineExceeded)
+    assert outcomes["patient"] == "answer" and runs == ["leader", "patient"]
+
+    # The same for coroutines
+    async def leading():
+        await asyncio.sleep(0.1)
+        raise DeadlineExceeded("leader out of budget")
+
+    async def answering():
+        return "answer"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do_async("key", leading))
+        await asyncio.sleep(0.01)
+        second = flight.do_async("key", answering, timeout=2, retry_if=retry)
+        return await asyncio.gather(first, second, return_exceptions=True)
+
+    first, second = asyncio.run(run())
+    assert isinstance(first, DeadlineExceeded) and second == "answer"
+
+def test_scheduler_priorities_and_rejection():
+    """Waiters are served by class, a full queue sheds lower classes first, and waits time out"""
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=2, queue_timeout=2)
+    holder = scheduler.acquire("interactive")
+    served, rejected = [], []
+
+    def request(priority):
+        try:
+            admitted_at = scheduler.acquire(priority)
+        except QueueFullError:
+            rejected.append(priority)
+            return
+        served.append(priority)
+        scheduler.release(admitted_at)
+
+    threads = []
+    for priority in ["background", "interactive", "urgent"]:
+        thread = threading.Thread(target=request, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        while scheduler.stats()["queue_depth"] + len(rejected) < len(threads):
+            time.sleep(0.01)
+
+    # The urgent request displaced the background one instead of being turned away
+    assert rejected == ["background"]
+    scheduler.release(holder)
+    for thread in threads:
+        thread.join()
+    assert served == ["urgent", "interactive"]
+
+    holder = scheduler.acquire()
+    scheduler.queue_timeout = 0.05
+    try:
+        scheduler.acquire()
+        assert False, "expected the wait to time out"
+    except QueueTimeoutError as e:
+        assert e.retry_after >= 1
+
+    # A caller's deadline shorter than the queue timeout ends the wait as DeadlineExceeded
+    scheduler.queue_timeout = 2
+    started = time.monotonic()
+    try:
+        scheduler.acquire(timeout=0.05)
+        assert False, "expected the deadline to expire"
+    except DeadlineExceeded:
+        assert time.monotonic() - started < 1
+    scheduler.release(holder)
+
+    stats = scheduler.stats()
+    assert stats["rejected"] == 1 and stats["timed_out"] == 2 and stats["active"] == 0
+
+def test_task_routes():
+    """Each task gets its own options; OLLAMA_MODEL_<TASK> moves a single task to another model"""
+    os.environ["OLLAMA_MODEL_EXTRACTION"] = "qwen2.5:0.5b"
+    try:
+        routes = build_task_routes()
+    finally:
+        del os.environ["OLLAMA_MODEL_EXTRACTION"]
+
+    assert routes["extraction"]["model"] == "qwen2.5:0.5b"
+    assert routes["chat"]["model"] == routes["guidance"]["model"] == OLLAMA_MODEL
+    assert routes["extraction"]["options"]["temperature"] < routes["chat"]["options"]["temperature"]
+    assert routes["guidance"]["options"]["num_predict"] == 200  # Sized with LATENCY_BUDGET_GUIDANCE
+    assert routes["guidance"]["options"]["num_predict"] > routes["reminders"]["options"]["num_predict"]
+    assert routes["chat"]["options"]["stop"] == TURN_STOPS
+    assert routes["chat"]["options"]["top_p"] == 0.9  # Shared defaults still apply
+
+def start_stand_in_ollama(answer, delay=0.0):
+    """Minimal Ollama look-alike on a free local port; set server.failing to answer 500.
+    Speaks keep-alive HTTP/1.1 and counts the connections it accepts in server.connections"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            self.server.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def reply(self, payload):
+            status = 500 if self.server.failing else 200
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self.reply({"models": []})
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if "prompt" in payload:
+                self.server.generations += 1
+                time.sleep(delay)
+            self.reply({"response": answer, "done": True})
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.failing = False
+    server.generations = 0
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def test_pool_least_outstanding_and_ejection():
+    """Requests go to the least busy node; an ejected node is skipped until it recovers"""
+    healthy = {"a": True, "b": True}
+    pool = OllamaPool(["a", "b"], lambda host: healthy[host], failure_threshold=1, reset_timeout=60)
+
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first.host, second.host} == {"a", "b"}  # One each while both are busy
+    pool.release(first)
+    assert pool.acquire() is first  # Now the less loaded one
+    pool.release(first)
+    pool.release(second)
+
+    node_b = pool.nodes[1]
+    node_b.breaker.record_failure()
+    assert [pool.acquire().host for _ in range(3)] == ["a", "a", "a"]
+    for _ in range(3):
+        pool.release(pool.nodes[0])
+
+    assert node_b.monitor.check_once()  # A healthy probe re-admits it
+    assert pool.acquire() is node_b
+
+    healthy["a"] = healthy["b"] = False
+    for node in pool.nodes:
+        node.monitor.check_once()
+    assert not pool.available and pool.acquire() is None
+
+def test_client_spreads_over_stand_in_servers():
+    """Generations are spread over several servers, and a failing one is routed around"""
+    servers = [start_stand_in_ollama("answer from node", delay=0.05) for _ in range(2)]
+    hosts = [f"127.0.0.1:{server.server_address[1]}" for server in servers]
+    client = LocalAIClient(hosts=hosts)
+    try:
+        assert client.ready.wait(5) and client.model_loaded
+
+        threads = [threading.Thread(target=client.generate_response, args=(f"question {i}",)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert [server.generations for server in servers] == [4, 4]
+
+        # Requests that hit the failing node fall back to mock answers until it is ejected
+        servers[1].failing = True
+        answers = [client.generate_response(f"follow-up {i}") for i in range(10)]
+        threshold = client.pool.nodes[1].breaker.failure_threshold
+        assert answers.count("answer from node") == 10 - threshold
+        assert answers[-4:] == ["answer from node"] * 4
+        assert servers[1].generations == 4 + threshold
+        assert client.health_stats()["nodes"][1]["state"] == CircuitBreaker.OPEN
+    finally:
+        client.close()
+        client.session.close()
+        for server in servers:
+            server.shutdown()
+
+def test_calls_reuse_one_connection():
+    """Sequential calls to a node share one keep-alive connection, and connection_stats says so"""
+    server = start_stand_in_ollama("answer from node")
+    client = LocalAIClient(hosts=[f"127.0.0.1:{server.server_address[1]}"])
+    try:
+        assert client.ready.wait(5) and client.model_loaded
+        for i in range(10):
+            assert client.generate_response(f"question {i}") == "answer from node"
+
+        assert server.connections == 1
+        stats = client.connection_stats()
+        assert stats["connections_opened"] == 1 and stats["requests"] >= 10
+        assert stats["connections_reused"] == stats["requests"] - 1
+        assert stats["reuse_rate"] >= 0.9
+    finally:
+        client.close()
+        client.session.close()
+        server.shutdown()
+
+def test_follower_outlives_leader_deadline():
+    """An identical request with more budget left gets the answer after the leader's deadline passed"""
+    server = start_stand_in_ollama("answer from node", delay=0.3)
+    client = LocalAIClient(hosts=[f"127.0.0.1:{server.server_address[1]}"])
+    try:
+        assert client.ready.wait(5) and client.model_loaded
+        outcomes = {}
+
+        def ask(name, budget):
+            try:
+                outcomes[name] = client.generate_response("Same question", deadline=time.monotonic() + budget)
+            except DeadlineExceeded as e:
+                outcomes[name] = e
+
+        leader = threading.Thread(target=ask, args=("leader", 0.1))
+        leader.start()
+        time.sleep(0.05)
+        follower = threading.Thread(target=ask, args=("follower", 3))
+        follower.start()
+        leader.join()
+        follower.join()
+
+        assert isinstance(outcomes["leader"], DeadlineExceeded)
+        assert outcomes["follower"] == "answer from node"
+        assert server.generations == 2 and client.single_flight.stats()["deduplicated"] == 1
+    finally:
+        client.close()
+        client.session.close()
+        server.shutdown()
+
+if __name__ == "__main__":
+    test_circuit_breaker_transitions()
+    test_health_probe_recovers_breaker()
+    test_response_cache()
+    test_single_flight_shares_result()
+    test_single_flight_released_on_interrupt()
+    test_single_flight_followers_keep_own_deadline()
+    test_scheduler_priorities_and_rejection()
+    test_task_routes()
+    test_pool_least_outstanding_and_ejection()
+    test_client_spreads_over_stand_in_servers()
+    test_calls_reuse_one_connection()
+    test_follower_outlives_leader_deadline()
+    print("✅ Ollama client tests passed")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import app as flask_app
+from agents.pregnancy_assistant import LocalAIClient
+from agents.prompt_builder import PromptBuilder, clean_text, estimate_tokens
+
+SUMMARY = "\n".join(
+    ["PREGNANCY JOURNEY SUMMARY (10 weeks tracked):", "Total logs: 10"]
+    + [f"Week {week}: mood good, symptoms back pain" for week in range(11, 21)]
+)
+
+def test_clean_text_and_estimate():
+    template = """
+        A user at week 24 of pregnancy reports:
+
+
+        - Symptoms: back pain
+        """
+    assert clean_text(template) == "A user at week 24 of pregnancy reports:\n\n- Symptoms: back pain"
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("पीठ दर्द") > estimate_tokens("back pain")  # Indic text costs more per character
+
+def test_duplicate_context_is_dropped():
+    prompt = f"Give guidance.\n\n{SUMMARY}\n\nBe supportive."
+    built = PromptBuilder(2048).add_history(SUMMARY, "CONTEXT:").add(prompt, "CURRENT QUERY:").build()
+    assert built.duplicate_sections == 1
+    assert "CONTEXT:" not in built.text and built.text.count("Week 11:") == 1
+
+def test_query_inside_history_is_kept():
+    """Only history is dropped as a duplicate, never the question itself"""
+    history = "Week 8: Symptoms: nausea\nWeek 9: mood tired"
+    built = PromptBuilder(1000).add_history(history, "CONTEXT:").add("nausea", "CURRENT QUERY:").build()
+    assert built.duplicate_sections == 0
+    assert built.text == f"CONTEXT:\n{history}\n\nCURRENT QUERY:\nnausea"
+
+    # The same history twice is sent once
+    built = PromptBuilder(1000).add_history(history).add_history(history).add("nausea").build()
+    assert built.duplicate_sections == 1 and built.text.count("Week 8:") == 1
+
+    client = LocalAIClient(hosts=["127.0.0.1:9"])
+    try:
+        prompt, _, _, _ = client._prepare_prompt("nausea", "You are kind.", history, "english", client.route("chat"))
+        assert prompt.endswith("CURRENT QUERY:\nnausea")
+    finally:
+        client.close()
+        client.session.close()
+
+def test_oldest_history_trimmed_after_header():
+    builder = PromptBuilder(60).add("Give guidance for week 21.").add_history(SUMMARY, header_lines=2)
+    built = builder.build()
+    assert built.tokens <= built.budget and built.trimmed_lines > 0
+    assert built.text.startswith("Give guidance for week 21.\n\nPREGNANCY JOURNEY SUMMARY")
+    assert "Week 20:" in built.text and "Week 11:" not in built.text  # Newest entries kept
+
+    # Building again starts from the untrimmed sections
+    assert PromptBuilder(4096).add_history(SUMMARY).build().trimmed_lines == 0
+    assert builder.build() == built
+
+    # A history section that cannot fit even its header goes entirely
+    built = PromptBuilder(10).add("Give guidance for week 21.").add_history(SUMMARY, header_lines=2).build()
+    assert built.text == "Give guidance for week 21." and built.trimmed_lines == 12
+
+def test_client_prompts_within_task_budget():
+    client = LocalAIClient(hosts=["127.0.0.1:9"])
+    try:
+        route = client.route("chat")
+        prompt, system, language, _ = client._prepare_prompt(f"How am I doing?\n{SUMMARY}", "    You are kind.\n",
+                                                             SUMMARY, "english", route)
+        assert system == "You are kind."
+        assert "CONTEXT" not in prompt and prompt.count("Week 11:") == 1
+
+        route = dict(route, prompt_budget=40)
+        prompt, _, _, _ = client._prepare_prompt("How am I doing?", "You are kind.", SUMMARY, "english", route)
+        assert prompt.endswith("CURRENT QUERY:\nHow am I doing?") and "Week 11:" not in prompt
+
+        stats = client.prompt_stats()["chat"]
+        assert stats["prompts"] == 2 and stats["duplicate_sections"] == 1 and stats["trimmed_lines"] > 0
+    finally:
+        client.close()
+        client.session.close()
+
+def test_budget_counts_instruction_for_non_english_users():
+    """The instruction to answer in the user's language is part of the budget"""
+    long_summary = "\n".join(
+        ["PREGNANCY JOURNEY SUMMARY (100 weeks tracked):", "Total logs: 100"]
+        + [f"Week {week}: मूड अच्छा, पीठ दर्द" for week in range(100)]
+    )
+    client = LocalAIClient(hosts=["127.0.0.1:9"])
+    try:
+        route = dict(client.route("chat"), prompt_budget=300)
+        prompt, system, language, _ = client._prepare_prompt("मुझे नींद नहीं आती", "You are kind.", long_summary,
+                                                             None, route)
+        assert language == "hindi" and "हिंदी" in system and system == client.system_prompt_for("You are kind.", "hindi")
+        assert estimate_tokens(prompt) + estimate_tokens(system) <= 300
+        assert "Week 99:" in prompt and "Week 0:" not in prompt
+    finally:
+        client.close()
+        client.session.close()
+
+    # Prompts the app builds leave room for the same instruction, whether the language is given or detected
+    budget = flask_app.local_ai.route("chat")["prompt_budget"]
+    for language in ("hindi", None):
+        prompt, system = flask_app.build_chat_prompt("मुझे नींद नहीं आती, क्या करूँ?", long_summary * 3, [], language)
+        detected = language or flask_app.local_ai.detect_language(prompt)
+        assert detected == "hindi"
+        sent_system = flask_app.local_ai.system_prompt_for(system, detected)
+        assert estimate_tokens(prompt) + estimate_tokens(sent_system) <= budget
+        assert estimate_tokens(prompt) + estimate_tokens(sent_system) > budget - 60  # Still fills the budget
+
+if __name__ == "__main__":
+    test_clean_text_and_estimate()
+    test_duplicate_context_is_dropped()
+    test_query_inside_history_is_kept()
+    test_oldest_history_trimmed_after_header()
+    test_client_prompts_within_task_budget()
+    test_budget_counts_instruction_for_non_english_users()
+    print("✅ Prompt builder tests passed")
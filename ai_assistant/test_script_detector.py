@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+from agents.pregnancy_assistant import LocalAIClient
+from agents.script_detector import SCRIPT_LANGUAGES, detect_script, detect_language
+
+def test_languages_by_script():
+    assert detect_language("Hello, I am 20 weeks pregnant") == "english"
+    assert detect_language("मैं 25 सप्ताह की गर्भवती हूं और चिंतित हूं।") == "hindi"
+    assert detect_language("आज मला खूप छान वाटतंय आणि झोप चांगली झाली") == "marathi"
+    assert detect_language("આજે હું ખુશ છું") == "gujarati"
+    assert detect_language("আমি আজ ভালো আছি") == "bengali"
+    assert detect_language("私は妊娠20週です") == "japanese"  # Kanji and kana
+    assert detect_language("我怀孕二十周了") == "chinese"
+    assert detect_language("임신 20주입니다") == "korean"
+    assert detect_language("") == "english"
+
+def test_user_text_inside_english_template():
+    profile = detect_script("Please answer the user: मुझे पीठ में दर्द है। Context: week 8, nausea.")
+    assert profile.language == "hindi"
+    assert profile.confidence == 1.0
+    assert profile.histogram["latin"] > profile.histogram["devanagari"]
+
+def test_histogram_confidence_and_early_exit():
+    # The Devanagari tail cannot overtake the Gujarati text, so it is never scanned
+    text = "ગુજરાતી લખાણ " * 20 + "थोड़ा हिंदी"
+    profile = detect_script(text)
+    assert profile.script == "gujarati"
+    assert profile.scanned < len(text)
+    assert profile.histogram == {"gujarati": profile.scanned}
+
+    mixed = "ગુજરાતી हिंदी " * 3 + "ગુજરાતી"
+    profile = detect_script(mixed)
+    assert profile.script == "gujarati"
+    assert set(profile.histogram) == {"gujarati", "devanagari"}
+    assert 0.5 < profile.confidence < 1.0
+    assert profile.scanned == len(mixed)
+
+def test_fallback_answers_every_detected_language():
+    """Each language the detector returns gets a rule-based answer; Marathi reads the Hindi one"""
+    client = LocalAIClient(hosts=["127.0.0.1:9"])
+    try:
+        for language in set(SCRIPT_LANGUAGES.values()) | {"marathi"}:
+            for prompt in ("week 30", "back pain", "nausea", "anxious", "hello"):
+                assert client.fallback_response(prompt, language), (language, prompt)
+        for prompt in ("week 30", "back pain", "hello"):
+            answer = client.fallback_response(prompt, "marathi")
+            assert answer == client.fallback_response(prompt, "hindi")
+            assert detect_language(answer) in ("hindi", "marathi")
+        assert client.fallback_response("hello", "gujarati") == client.fallback_response("hello", "english")
+    finally:
+        client.close()
+        client.session.close()
+
+if __name__ == "__main__":
+    test_languages_by_script()
+    test_user_text_inside_english_template()
+    test_histogram_confidence_and_early_exit()
+    test_fallback_answers_every_detected_language()
+    print("✅ Script detector tests passed")
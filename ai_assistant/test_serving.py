@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import os
+import signal
+
+import app as flask_app
+import serve
+from agents.scheduler import QueueTimeoutError
+from test_streaming import parse_events, serving
+
+SERVE_ENV = {"HOST": "127.0.0.1", "PORT": "6001", "WEB_CONCURRENCY": "3", "WORKER_THREADS": "4",
+             "GRACEFUL_TIMEOUT": "30", "WORKER_TIMEOUT": "45"}
+
+def record_priorities(scheduler):
+    """List that collects the priority class of every generation the scheduler admits"""
+    priorities = []
+
+    def recording(method):
+        def wrapper(priority, *args, **kwargs):
+            priorities.append(priority)
+            return method(priority, *args, **kwargs)
+        return wrapper
+
+    # slot() goes through acquire() as well
+    scheduler.acquire, scheduler.acquire_async = recording(scheduler.acquire), recording(scheduler.acquire_async)
+    return priorities
+
+def time_out_queued_generations(scheduler):
+    """Admission checks pass, but every generation then times out in the queue"""
+    def timed_out(*args, **kwargs):
+        raise QueueTimeoutError("Timed out waiting for a generation slot", 3)
+
+    async def timed_out_async(*args, **kwargs):
+        timed_out()
+
+    scheduler.acquire, scheduler.acquire_async = timed_out, timed_out_async
+
+def test_healthz():
+    with serving():
+        response = flask_app.app.test_client().get("/healthz")
+        assert response.status_code == 200
+        assert response.get_json()["status"] == "ok" and response.get_json()["uptime_seconds"] >= 0
+
+def test_readyz_ready_and_not_ready():
+    with serving() as (server, client):
+        http = flask_app.app.test_client()
+        response = http.get("/readyz")
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body["ready"] and not body["draining"] and body["model_loaded"] and body["provider"] == "ollama"
+
+        # Still starting up (model loading)
+        client.ready.clear()
+        response = http.get("/readyz")
+        assert response.status_code == 503 and not response.get_json()["ready"]
+        client.ready.set()
+
+def test_readyz_503_while_draining():
+    with serving():
+        http = flask_app.app.test_client()
+        flask_app.SERVER_STATE["draining"] = True
+        try:
+            response = http.get("/readyz")
+            assert response.status_code == 503
+            assert response.get_json()["draining"] and not response.get_json()["ready"]
+            assert http.get("/healthz").status_code == 200  # Still alive while finishing in-flight requests
+        finally:
+            flask_app.SERVER_STATE["draining"] = False
+        assert http.get("/readyz").status_code == 200
+
+def test_server_options_from_env():
+    saved = {name: os.environ.pop(name, None) for name in SERVE_ENV}
+    try:
+        options = serve.server_options()
+        assert options["bind"] == "0.0.0.0:5002" and options["workers"] == 2 and options["threads"] == 8
+        assert options["graceful_timeout"] == serve.DEFAULT_GRACEFUL_TIMEOUT
+        assert options["timeout"] == serve.DEFAULT_WORKER_TIMEOUT
+
+        os.environ.update(SERVE_ENV)
+        options = serve.server_options()
+        assert options["bind"] == "127.0.0.1:6001" and options["workers"] == 3 and options["threads"] == 4
+        assert options["graceful_timeout"] == 30 and options["timeout"] == 45
+        assert options["worker_class"] == "gthread" and options["preload_app"] is False
+
+        # gunicorn accepts every option
+        cfg = serve.PregnancyAssistantServer(options).cfg
+        assert cfg.bind == ["127.0.0.1:6001"] and cfg.workers == 3 and cfg.threads == 4
+        assert cfg.graceful_timeout == 30 and cfg.timeout == 45 and not cfg.preload_app
+    finally:
+        for name, value in saved.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+
+def test_sigterm_marks_worker_draining():
+    class Worker:
+        pid = os.getpid()
+        exits = []
+
+        def handle_exit(self, sig, frame):
+            self.exits.append(sig)
+
+    previous = signal.getsignal(signal.SIGTERM)
+    worker = Worker()
+    try:
+        serve.post_worker_init(worker)
+        signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+        assert flask_app.SERVER_STATE["draining"] and worker.exits == [signal.SIGTERM]
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+        flask_app.SERVER_STATE["draining"] = False
+
+def test_voice_logs_urgent_only_with_alert():
+    with serving() as (server, client):
+        http = flask_app.app.test_client()
+        priorities = record_priorities(client.scheduler)
+        for url in ("/voice-guidance", "/voice-guidance/stream"):
+            http.post(url, json={"user_id": "p1", "transcript": "I feel happy and slept 8 hours"}).get_data()
+            http.post(url, json={"user_id": "p1", "transcript": "heavy bleeding since morning"}).get_data()
+        assert priorities == ["interactive", "urgent"] * 2
+
+def test_rejection_after_save_answers_degraded():
+    """Once the log is saved, a queue timeout gives the rule-based answer, not a 503 to retry"""
+    with serving() as (server, client):
+        http = flask_app.app.test_client()
+        time_out_queued_generations(client.scheduler)
+
+        response = http.post("/guidance", json={"user_id": "r1", "week": 22, "daily_log": {"mood": "ok"}})
+        assert response.status_code == 200
+        assert response.get_json()["degraded"] and response.get_json()["guidance"]
+        response = http.post("/voice-guidance", json={"user_id": "r1", "transcript": "I feel tired"})
+        assert response.status_code == 200 and response.get_json()["degraded"]
+
+        events = parse_events(http.post("/guidance/stream", json={"user_id": "r1", "daily_log": {"mood": "ok"}})
+                              .get_data(as_text=True))
+        assert events[-1][0] == "done" and events[-1][1]["degraded"] and events[-1][1]["guidance"]
+
+        assert len(flask_app.memory.get_recent_logs("r1", limit=10)) == 3  # Each saved once
+        assert server.generations == 0
+
+        # Chat saves nothing, so it still answers 503 with Retry-After
+        response = http.post("/chat", json={"user_id": "r1", "message": "Hi"})
+        assert response.status_code == 503 and response.headers["Retry-After"] == "3"
+
+if __name__ == "__main__":
+    test_healthz()
+    test_readyz_ready_and_not_ready()
+    test_readyz_503_while_draining()
+    test_server_options_from_env()
+    test_sigterm_marks_worker_draining()
+    test_voice_logs_urgent_only_with_alert()
+    test_rejection_after_save_answers_degraded()
+    print("✅ Serving tests passed")
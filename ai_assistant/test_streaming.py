@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+import contextlib
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import app as flask_app
+from agents.pregnancy_assistant import LocalAIClient
+from services.pregnancy_memory import PregnancyMemory
+
+TOKENS = ["Stay ", "hydrated ", "and ", "rest."]
+
+def start_streaming_ollama(tokens=TOKENS, delay=0.0):
+    """Ollama look-alike streaming NDJSON tokens; set server.failing to answer 500,
+    server.break_after to send a broken line after that many tokens"""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def reply(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self.reply({"models": []})
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if "prompt" not in payload:
+                return self.reply({"done": True})  # Model warm-up
+            self.server.generations += 1
+            if self.server.failing:
+                return self.reply({"error": "model crashed"}, status=500)
+            if not payload.get("stream"):
+                time.sleep(self.server.delay)
+                return self.reply({"response": "".join(tokens), "done": True})
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()  # HTTP/1.0: the body ends when the connection closes
+            try:
+                for index, token in enumerate(tokens):
+                    if index == self.server.break_after:
+                        self.wfile.write(b"{\"response\": \"cut\n")
+                        return
+                    self.wfile.write(json.dumps({"response": token, "done": False}).encode() + b"\n")
+                    self.wfile.flush()
+                    time.sleep(self.server.delay)
+                self.wfile.write(json.dumps({"response": "", "done": True, "prompt_eval_count": 40}).encode() + b"\n")
+            except OSError:
+                self.server.disconnects += 1  # The client went away mid-stream
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.failing = False
+    server.break_after = None
+    server.delay = delay
+    server.generations = 0
+    server.disconnects = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+@contextlib.contextmanager
+def serving(module=flask_app, delay=0.0):
+    """Point the app module at a fresh client on a stand-in Ollama and a temporary memory"""
+    server = start_streaming_ollama(delay=delay)
+    client = LocalAIClient(hosts=[f"127.0.0.1:{server.server_address[1]}"])
+    saved = module.local_ai, module.memory
+    with tempfile.TemporaryDirectory() as data_dir:
+        module.local_ai, module.memory = client, PregnancyMemory(data_dir, backend="jsonl")
+        try:
+            assert client.ready.wait(5) and client.model_loaded
+            yield server, client
+        finally:
+            module.memory.close()
+            module.local_ai, module.memory = saved
+            client.close()
+            client.session.close()
+            server.shutdown()
+
+def parse_events(body):
+    """[(event name or None, data)] from a server-sent events body"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        name = None
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                name = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((name, json.loads(line[len("data: "):])))
+    return events
+
+STREAM_REQUESTS = [
+    ("/chat/stream", {"user_id": "s1", "message": "How should I sleep?"}),
+    ("/guidance/stream", {"user_id": "s1", "week": 22, "daily_log": {"mood": "ok", "symptoms": []}}),
+    ("/voice-guidance/stream", {"user_id": "s1", "week": 22, "transcript": "I feel happy and slept 8 hours"})
+]
+
+def test_event_framing_and_done():
+    with serving() as (server, client):
+        http = flask_app.app.test_client()
+        for url, body in STREAM_REQUESTS:
+            response = http.post(url, json=body)
+            assert response.status_code == 200 and response.mimetype == "text/event-stream"
+            assert response.headers["Cache-Control"] == "no-cache"
+
+            events = parse_events(response.get_data(as_text=True))
+            assert events[0][0] == "meta"
+            assert [data["token"] for name, data in events[1:-1]] == TOKENS
+            assert all(name is None for name, _ in events[1:-1])
+            name, done = events[-1]
+            assert name == "done" and done["guidance"] == "".join(TOKENS).strip()
+            assert done["time_to_first_token_ms"] is not None
+
+        assert server.generations == 3
+        assert client.stream_stats()["completed"] == 3
+
+def test_voice_meta_carries_symptom_analysis():
+    with serving():
+        response = flask_app.app.test_client().post(
+            "/voice-guidance/stream", json={"user_id": "s2", "transcript": "heavy bleeding since morning"})
+        name, meta = parse_events(response.get_data(as_text=True))[0]
+        assert name == "meta" and meta["symptom_analysis"]["status"] == "alert"
+        assert meta["escalation"]["escalated"]
+
+def test_disconnect_releases_scheduler_slot():
+    with serving(delay=0.05) as (server, client):
+        response = flask_app.app.test_client().post("/chat/stream", json={"user_id": "s3", "message": "Hi"},
+                                                    buffered=False)
+        chunks = response.iter_encoded()
+        assert b"event: meta" in next(chunks)
+        assert b"token" in next(chunks)
+        assert client.scheduler.stats()["active"] == 1
+
+        response.close()  # The client disconnects mid-answer
+        assert client.scheduler.stats()["active"] == 0
+        assert client.stream_stats()["cancelled"] == 1
+        assert client.pool.nodes[0].outstanding == 0
+
+def test_upstream_failure():
+    with serving() as (server, client):
+        http = flask_app.app.test_client()
+
+        # Broken off after some tokens: an error event, not a "done" with half an answer
+        server.break_after = 2
+        events = parse_events(http.post("/chat/stream", json={"user_id": "s4", "message": "Hi"}).get_data(as_text=True))
+        assert [data["token"] for name, data in events[1:-1]] == TOKENS[:2]
+        assert events[-1][0] == "error" and "broke off" in events[-1][1]["message"]
+
+        # Failing before the first token: the rule-based answer is streamed instead
+        server.break_after = None
+        server.failing = True
+        events = parse_events(http.post("/chat/stream", json={"user_id": "s4", "message": "Hi"}).get_data(as_text=True))
+        assert events[-1][0] == "done" and events[-1][1]["guidance"]
+        assert client.scheduler.stats()["active"] == 0
+
+if __name__ == "__main__":
+    test_event_framing_and_done()
+    test_voice_meta_carries_symptom_analysis()
+    test_disconnect_releases_scheduler_slot()
+    test_upstream_failure()
+    print("✅ Streaming endpoint tests passed")
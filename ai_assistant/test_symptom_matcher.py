@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+from services.emergency_escalator import escalate
+from services.symptom_checker import check_symptoms
+from services.symptom_matcher import SymptomMatcher, find_symptoms, normalize
+
+def symptom_names(*texts):
+    return [match.symptom for match in find_symptoms(*texts)]
+
+def test_longest_phrase_and_word_boundaries():
+    assert symptom_names("severe abdominal pain and a high fever since morning") == [
+        "severe abdominal pain", "high fever"]
+    assert symptom_names("she was bleeding heavily") == ["heavy bleeding"]
+    assert symptom_names("feverish prebleeding") == []  # Inside other words
+    assert symptom_names("Bleeding, and later LOTS OF BLOOD") == ["heavy bleeding"]  # Refines "bleeding"
+
+def test_multilingual_synonyms_and_negation():
+    assert symptom_names("No bleeding or cramps. I have no appetite and heavy bleeding") == ["heavy bleeding"]
+    assert symptom_names("खून नहीं आया लेकिन पेट में तेज़ दर्द है") == ["severe abdominal pain"]
+    assert symptom_names("आज ताप नाही, पण डोके खूप दुखत आहे") == ["severe headache"]
+    assert symptom_names("તાવ નથી, ચહેરા પર સોજો છે") == ["facial swelling"]
+    assert symptom_names("my baby isn’t moving") == ["reduced fetal movement"]  # Curly apostrophe
+    assert normalize("ज़्यादा  खून") == normalize("ज्यादा खून")
+
+EMERGENCIES_WITH_NEGATIVES = [
+    ("i am not feeling well heavy bleeding since morning", "heavy bleeding"),
+    ("I can not see clearly blurred vision", "blurred vision"),
+    ("बहुत खून रुक नहीं रहा", "heavy bleeding"),
+    ("ખૂબ લોહી બંધ નથી થતું", "heavy bleeding"),
+    ("जास्त रक्तस्त्राव थांबत नाही", "heavy bleeding")
+]
+
+def test_negatives_elsewhere_do_not_hide_emergencies():
+    """A negative that isn't attached to the phrase, or that goes with "stop", still alerts"""
+    for text, symptom in EMERGENCIES_WITH_NEGATIVES:
+        check = check_symptoms([], text)
+        assert check["status"] == "alert", text
+        assert check["symptoms"] == [symptom], text
+
+    assert symptom_names("the bleeding won't stop") == ["bleeding"]
+    assert symptom_names("no heavy bleeding") == []  # Directly negated
+    assert symptom_names("no fever, cramps or swelling") == []  # Carried through the list
+    assert symptom_names("no cramps or heavy bleeding") == ["heavy bleeding"]  # Not for red flags
+
+VERB_SEPARATED_NEGATIONS = [
+    "I don't have a headache",
+    "I did not feel any nausea",
+    "I don't have fever today",
+    "I have not had any bleeding"
+]
+
+def test_negation_through_have_feel_get():
+    """Common English negations with a verb between the cue and the symptom"""
+    for text in VERB_SEPARATED_NEGATIONS:
+        assert symptom_names(text) == [], text
+        assert check_symptoms([], text)["detected"] == [], text
+
+    assert symptom_names("I haven't got any cramps but my head hurts") == ["headache"]
+    assert symptom_names("not feeling well, nausea since morning") == ["nausea"]  # Not attached
+    assert symptom_names("I don't have heavy bleeding") == ["heavy bleeding"]  # Red flags keep the strict rule
+
+def test_check_symptoms_screens_free_text():
+    check = check_symptoms([], "I'm fine, just some blurry vision since yesterday")
+    assert check["status"] == "alert"
+    assert check["symptoms"] == ["blurred vision"]
+    assert escalate(check)["escalated"]
+
+    check = check_symptoms(["back pain", "nausea"])
+    assert check["status"] == "normal"
+    assert check["detected"] == ["back pain", "nausea"]
+    assert not escalate(check)["escalated"]
+
+    # Exact red-flag names still alert, as before
+    assert check_symptoms(["Heavy Bleeding"])["symptoms"] == ["heavy bleeding"]
+    assert check_symptoms([])["status"] == "normal"
+
+def test_custom_lexicon():
+    matcher = SymptomMatcher({"itching": {"severity": 2, "synonyms": ["itch", "itchy", "खुजली"]}})
+    matches = matcher.scan("Itchy skin, खुजली हो रही है")
+    assert [(match.symptom, match.phrase) for match in matches] == [("itching", "itchy"), ("itching", "खुजली")]
+
+if __name__ == "__main__":
+    test_longest_phrase_and_word_boundaries()
+    test_multilingual_synonyms_and_negation()
+    test_negatives_elsewhere_do_not_hide_emergencies()
+    test_negation_through_have_feel_get()
+    test_check_symptoms_screens_free_text()
+    test_custom_lexicon()
+    print("✅ Symptom matcher tests passed")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+from services.symptom_checker import check_symptoms
+from services.transcript_extractor import (
+    extract_daily_log, low_confidence_fields, merge_llm_fields, EXPLICIT, UNSUPPORTED_SCRIPT
+)
+
+def test_english_transcript():
+    daily_log, confidence = extract_daily_log(
+        "I feel happy today, slept 7 hours, drank 8 glasses of water and walked for 30 minutes. "
+        "No bleeding or cramps. Is it normal to feel tired?"
+    )
+    assert daily_log["mood"] == "happy"
+    assert daily_log["sleep_hours"] == 7.0
+    assert daily_log["water_intake"] == "8 glasses"
+    assert daily_log["exercise"] == "walking (30 minutes)"
+    assert daily_log["symptoms"] == []  # Negated
+    assert daily_log["concerns"] == ["Is it normal to feel tired?"]
+    assert confidence["sleep_hours"] == EXPLICIT
+
+def test_indic_transcripts():
+    hindi, _ = extract_daily_log("आज मैं बहुत थकी हुई हूँ, 6 घंटे सोई, सिर दर्द है। क्या यह सामान्य है?")
+    assert hindi["mood"] == "tired"
+    assert hindi["sleep_hours"] == 6.0
+    assert hindi["symptoms"] == ["headache"]
+    assert hindi["concerns"] == ["क्या यह सामान्य है?"]
+
+    marathi, _ = extract_daily_log("आज मला छान वाटतंय, 8 तास झोपले, 2 लिटर पाणी प्यायले")
+    assert marathi["mood"] == "happy"
+    assert marathi["sleep_hours"] == 8.0
+    assert marathi["water_intake"] == "2 liters"
+
+    gujarati, _ = extract_daily_log("આજે હું ખુશ છું, 7 કલાક ઊંઘી, ચાલવા ગઈ 20 મિનિટ")
+    assert gujarati["mood"] == "happy"
+    assert gujarati["sleep_hours"] == 7.0
+    assert gujarati["exercise"] == "walking (20 minutes)"
+
+def test_red_flags_reach_symptom_checker():
+    """Symptom names match the checker's red flags, and negation only covers its own clause"""
+    daily_log, _ = extract_daily_log("I have no appetite and heavy bleeding")
+    assert daily_log["symptoms"] == ["heavy bleeding"]
+    assert check_symptoms(daily_log["symptoms"])["status"] == "alert"
+
+def test_unattached_negatives_keep_red_flags():
+    """A negative elsewhere in an unpunctuated transcript doesn't drop a red flag from the saved log"""
+    for transcript, symptom in [
+        ("i am not feeling well heavy bleeding since morning", "heavy bleeding"),
+        ("I can not see clearly blurred vision", "blurred vision"),
+        ("बहुत खून रुक नहीं रहा", "heavy bleeding"),
+        ("ખૂબ લોહી બંધ નથી થતું", "heavy bleeding"),
+        ("जास्त रक्तस्त्राव थांबत नाही", "heavy bleeding")
+    ]:
+        daily_log, _ = extract_daily_log(transcript)
+        assert daily_log["symptoms"] == [symptom], transcript
+        assert check_symptoms(daily_log["symptoms"])["status"] == "alert"
+
+    daily_log, _ = extract_daily_log("i did not walk today i am not feeling well")
+    assert daily_log["exercise"] == "none"
+
+def test_verb_separated_negations_save_nothing():
+    """"don't have a ..." and "did not feel any ..." are not saved as symptoms"""
+    for transcript in ["I don't have a headache", "I did not feel any nausea today",
+                       "I don't have fever and I haven't got any cramps", "I have not had any bleeding"]:
+        daily_log, _ = extract_daily_log(transcript)
+        assert daily_log["symptoms"] == [], transcript
+
+    daily_log, _ = extract_daily_log("I don't have a headache but my back hurts")
+    assert daily_log["symptoms"] == ["back pain"]
+
+def test_low_confidence_fields():
+    daily_log, confidence = extract_daily_log("I slept badly and need more water")
+    assert daily_log["sleep_hours"] is None
+    assert set(low_confidence_fields(confidence)) >= {"sleep_hours"}
+    assert "mood" not in low_confidence_fields(confidence)  # Not mentioned at all
+
+    _, confidence = extract_daily_log("আমি আজ ভালো আছি")  # Bengali is not covered
+    assert set(confidence.values()) == {UNSUPPORTED_SCRIPT}
+    assert len(low_confidence_fields(confidence)) == len(confidence)
+
+def test_merge_llm_fields():
+    daily_log, _ = extract_daily_log("I slept badly")
+    response = 'Here you go: {"sleep_hours": "5", "mood": "tired", "exercise": "not mentioned"}'
+    merged = merge_llm_fields(daily_log, response, ["sleep_hours", "exercise"])
+    assert merged["sleep_hours"] == 5.0
+    assert merged["exercise"] == daily_log["exercise"]
+    assert merged["mood"] == daily_log["mood"]  # Not asked for
+    assert merge_llm_fields(daily_log, "no JSON here", ["sleep_hours"]) == daily_log
+
+if __name__ == "__main__":
+    test_english_transcript()
+    test_indic_transcripts()
+    test_red_flags_reach_symptom_checker()
+    test_unattached_negatives_keep_red_flags()
+    test_verb_separated_negations_save_nothing()
+    test_low_confidence_fields()
+    test_merge_llm_fields()
+    print("✅ Transcript extractor tests passed")